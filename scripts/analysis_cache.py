@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+Persistent engine-analysis cache keyed by normalized FEN.
+
+Engine-backed stages (solution verification, difficulty tagging, benchmark
+suites) analyse the same positions on every build. This SQLite cache stores
+each position's deepest analysis so repeat builds only pay engine time for
+positions they have not seen.
+
+Keys are the first four FEN fields (placement, side to move, castling,
+en passant), as SimpleBotService._fenBookKey uses, so move counters never
+split a position; an en passant square no pawn can capture on is dropped
+(the X-FEN rule), so a FEN written after a double push and the same position
+reached by playing moves share a key. Positions after moves are always
+replayed with python-chess, which is required for them.
+
+Entries are stored per (position, engine, MultiPV width), each keeping its
+deepest result, so a deeper but narrower search never hides a wider one.
+Lookups ask for "this engine, at least depth N and at least M lines". Each
+hit refreshes the entry's last-used stamp so prune() can cap the cache size
+by evicting the least recently used entries.
+
+Usage:
+  python scripts/analysis_cache.py stats CACHE.sqlite
+  python scripts/analysis_cache.py export CACHE.sqlite OUT.jsonl
+  python scripts/analysis_cache.py import CACHE.sqlite IN.jsonl
+  python scripts/analysis_cache.py prune CACHE.sqlite --max-entries N
+"""
+
+import argparse
+import json
+import sqlite3
+import sys
+import time
+
+try:
+    import chess
+except ImportError:
+    chess = None
+
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analysis (
+    key TEXT NOT NULL,
+    engine TEXT NOT NULL,
+    multipv INTEGER NOT NULL,
+    depth INTEGER NOT NULL,
+    nodes INTEGER NOT NULL,
+    bestmove TEXT,
+    lines TEXT NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (key, engine, multipv)
+);
+CREATE INDEX IF NOT EXISTS analysis_last_used ON analysis (last_used);
+"""
+
+FILES = 'abcdefgh'
+
+
+def _piece_at(placement, file, rank):
+    """Piece letter on a square of a FEN placement field, or None."""
+    rows = placement.split('/')
+    if len(rows) != 8:
+        return None
+    col = 0
+    for char in rows[8 - rank]:
+        if char.isdigit():
+            col += int(char)
+        else:
+            if col == file:
+                return char
+            col += 1
+        if col > file:
+            return None
+    return None
+
+
+def _has_ep_capture(placement, turn, ep):
+    """True if a pawn of the side to move could capture en passant on `ep`."""
+    if len(ep) != 2 or ep[0] not in FILES:
+        return False
+    pawn, ep_rank, from_rank = ('P', '6', 5) if turn == 'w' else ('p', '3', 4)
+    if ep[1] != ep_rank:
+        return False
+    file = FILES.index(ep[0])
+    if _piece_at(placement, file, int(ep_rank)) is not None:
+        return False
+    return any(_piece_at(placement, f, from_rank) == pawn
+               for f in (file - 1, file + 1) if 0 <= f < 8)
+
+
+def fen_key(fen):
+    """
+    Normalize a FEN to its first four fields, keeping the en passant square
+    only if a pawn can capture on it (python-chess's en_passant='xfen').
+    """
+    parts = fen.split()
+    if len(parts) < 4:
+        return fen.strip()
+    placement, turn, castling, ep = parts[:4]
+    if ep != '-' and not _has_ep_capture(placement, turn, ep):
+        ep = '-'
+    return ' '.join((placement, turn, castling, ep))
+
+
+def position_key(fen, moves=()):
+    """
+    Cache key for the position reached by playing `moves` from `fen`.
+
+    The moves are applied with python-chess, so transpositions share an
+    entry.
+
+    Raises:
+        RuntimeError: If moves are given and python-chess is not installed
+    """
+    if not moves:
+        return fen_key(fen)
+    if chess is None:
+        raise RuntimeError('Cache keys for positions after moves need '
+                           'python-chess: pip install chess')
+    board = chess.Board(fen)
+    for move in moves:
+        board.push_uci(move)
+    return fen_key(board.fen(en_passant='xfen'))
+
+
+class AnalysisCache:
+    """
+    SQLite-backed analysis store.
+
+    Args:
+        path: Database file (created if missing)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=60)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.hits = 0
+        self.misses = 0
+        if self._version() < SCHEMA_VERSION:
+            self._migrate()
+
+    def _version(self):
+        return self.conn.execute('PRAGMA user_version').fetchone()[0]
+
+    def _migrate(self):
+        """Create the schema, re-keying entries of a version 1 cache."""
+        with self.conn:
+            # Pool workers open the cache together; only one migrates
+            self.conn.execute('BEGIN IMMEDIATE')
+            if self._version() >= SCHEMA_VERSION:
+                return
+            old = []
+            if self.conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' "
+                    "AND name = 'analysis'").fetchone():
+                old = self.conn.execute(
+                    'SELECT key, depth, multipv, nodes, bestmove, lines, '
+                    'engine FROM analysis').fetchall()
+                self.conn.execute('DROP TABLE analysis')
+            for statement in SCHEMA.split(';'):
+                if statement.strip():
+                    self.conn.execute(statement)
+
+            entries = []
+            for key, depth, multipv, nodes, bestmove, lines, engine in old:
+                # Version 1 keyed positions after moves as "FEN moves ..."
+                # when python-chess was missing
+                fen, _, moves = key.partition(' moves ')
+                try:
+                    key = position_key(fen, moves.split())
+                except (RuntimeError, ValueError):
+                    continue
+                entries.append((key, {'depth': depth, 'nodes': nodes,
+                                      'bestmove': bestmove,
+                                      'lines': json.loads(lines)},
+                                multipv, engine))
+            self._upsert(entries)
+            self.conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+    def get(self, key, min_depth=0, min_multipv=1, engine=None):
+        """
+        Look up an analysis by `engine` at least `min_depth` deep with at
+        least `min_multipv` lines.
+
+        Returns:
+            Analysis dict (bestmove, depth, nodes, lines) or None
+        """
+        row = self.conn.execute(
+            'SELECT multipv, depth, nodes, bestmove, lines FROM analysis '
+            'WHERE key = ? AND engine = ? AND depth >= ? AND multipv >= ? '
+            'ORDER BY depth DESC, multipv LIMIT 1',
+            (key, engine or '', min_depth, min_multipv)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        multipv, depth, nodes, bestmove, lines = row
+        with self.conn:
+            self.conn.execute(
+                'UPDATE analysis SET last_used = ? '
+                'WHERE key = ? AND engine = ? AND multipv = ?',
+                (time.time(), key, engine or '', multipv))
+        return {
+            'bestmove': bestmove,
+            'depth': depth,
+            'nodes': nodes,
+            'lines': json.loads(lines)[:max(min_multipv, 1)],
+        }
+
+    def put(self, key, analysis, multipv, engine=None):
+        """
+        Store an analysis unless one at least as deep is already cached for
+        the same engine and MultiPV width.
+        """
+        self.put_many([(key, analysis, multipv, engine)])
+
+    def put_many(self, entries):
+        """Store several (key, analysis, multipv, engine) tuples at once."""
+        with self.conn:
+            self._upsert(entries)
+
+    def _upsert(self, entries):
+        now = time.time()
+        self.conn.executemany(
+            'INSERT INTO analysis '
+            '(key, engine, multipv, depth, nodes, bestmove, lines, last_used) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT(key, engine, multipv) DO UPDATE SET '
+            'depth = excluded.depth, nodes = excluded.nodes, '
+            'bestmove = excluded.bestmove, lines = excluded.lines, '
+            'last_used = excluded.last_used '
+            'WHERE excluded.depth > analysis.depth',
+            [(key, engine or '', multipv, analysis['depth'],
+              analysis.get('nodes', 0), analysis.get('bestmove'),
+              json.dumps(analysis['lines'], separators=(',', ':')), now)
+             for key, analysis, multipv, engine in entries])
+
+    def prune(self, max_entries):
+        """
+        Evict least recently used entries beyond max_entries.
+
+        Returns:
+            Number of entries removed
+        """
+        with self.conn:
+            cursor = self.conn.execute(
+                'DELETE FROM analysis WHERE rowid IN ('
+                'SELECT rowid FROM analysis ORDER BY last_used DESC '
+                'LIMIT -1 OFFSET ?)', (max_entries,))
+        return cursor.rowcount
+
+    def count(self):
+        return self.conn.execute('SELECT COUNT(*) FROM analysis').fetchone()[0]
+
+    def export_jsonl(self, output_file):
+        """Write every entry as one JSON object per line. Returns the count."""
+        count = 0
+        with open(output_file, 'w', encoding='utf-8') as f:
+            for row in self.conn.execute(
+                    'SELECT key, depth, multipv, nodes, bestmove, lines, engine '
+                    'FROM analysis ORDER BY key, engine, multipv'):
+                key, depth, multipv, nodes, bestmove, lines, engine = row
+                f.write(json.dumps({
+                    'key': key, 'depth': depth, 'multipv': multipv,
+                    'nodes': nodes, 'bestmove': bestmove,
+                    'lines': json.loads(lines), 'engine': engine or None,
+                }, separators=(',', ':')))
+                f.write('\n')
+                count += 1
+        return count
+
+    def import_jsonl(self, input_file, batch_size=10000):
+        """Merge entries from export_jsonl() output. Returns the count read."""
+        count = 0
+        batch = []
+        with open(input_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                batch.append((entry['key'], entry, entry['multipv'],
+                              entry.get('engine')))
+                count += 1
+                if len(batch) >= batch_size:
+                    self.put_many(batch)
+                    batch = []
+        if batch:
+            self.put_many(batch)
+        return count
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Inspect and maintain the engine-analysis cache')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('stats', help='print entry counts')
+    p.add_argument('cache')
+
+    p = sub.add_parser('export', help='dump entries to JSONL')
+    p.add_argument('cache')
+    p.add_argument('output')
+
+    p = sub.add_parser('import', help='merge entries from JSONL')
+    p.add_argument('cache')
+    p.add_argument('input')
+
+    p = sub.add_parser('prune', help='cap size by evicting LRU entries')
+    p.add_argument('cache')
+    p.add_argument('--max-entries', type=int, required=True)
+
+    args = parser.parse_args()
+
+    with AnalysisCache(args.cache) as cache:
+        if args.command == 'stats':
+            print(f"Entries: {cache.count()}")
+            for depth, count in cache.conn.execute(
+                    'SELECT depth, COUNT(*) FROM analysis '
+                    'GROUP BY depth ORDER BY depth'):
+                print(f"  depth {depth}: {count}")
+        elif args.command == 'export':
+            count = cache.export_jsonl(args.output)
+            print(f"✓ Exported {count} entries to {args.output}")
+        elif args.command == 'import':
+            count = cache.import_jsonl(args.input)
+            print(f"✓ Imported {count} entries ({cache.count()} cached)")
+        elif args.command == 'prune':
+            removed = cache.prune(args.max_entries)
+            print(f"✓ Removed {removed} entries ({cache.count()} cached)")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
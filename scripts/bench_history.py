@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+Collect Dart micro-benchmark results and flag regressions.
+
+lib/bench.dart and test/benchmarks/*.dart print timings in their own ad-hoc
+formats ("Old parse: 412 ms", "Baseline: 5310 us", "Optimized
+implementation: 38ms") and nothing is kept between runs. This parses that
+output into a JSONL history, one sample per line:
+
+  {"bench": "fen_parsing", "metric": "New parse", "ms": 35.0,
+   "commit": "1b41b4c", "dirty": false, "machine": "ci-runner-x86_64",
+   "time": "2026-01-05T12:00:00", "run": 3}
+
+and compares commits on the same machine. For each metric the report shows
+the median of both sides with a 95% distribution-free confidence interval
+(order statistics), the MAD, and a Mann-Whitney U test. A metric is a
+regression when it is significantly slower (p < --alpha) and the median
+moved by more than --threshold. compare exits with 1 when there is any
+regression, so it can gate CI.
+
+Samples recorded with uncommitted changes ("dirty") don't measure their
+commit, so compare leaves them out unless --include-dirty is given. Commits
+match when either hash is a prefix of the other, so short and full hashes
+can be mixed.
+
+Any "<label>: <number> <ms|us|µs|s>" line counts as a timing; ratios such
+as "Speedup: 2.1x" or "Improvement: 12%" are derived and ignored.
+
+Usage:
+  # Run a benchmark command several times and record every run
+  python scripts/bench_history.py run --bench fen_parsing --repeat 10 -- \\
+      flutter test test/benchmarks/fen_parsing_benchmark.dart
+
+  # Record output captured elsewhere (files or stdin)
+  python scripts/bench_history.py record --bench bench_dart out1.txt out2.txt
+
+  # Compare the current commit with the previous one in the history
+  python scripts/bench_history.py compare [--baseline REV] [--current REV]
+                                          [--include-dirty]
+"""
+
+import argparse
+import datetime
+import json
+import math
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+HISTORY_FILE = 'build/bench_history.jsonl'
+DEFAULT_ALPHA = 0.01
+DEFAULT_THRESHOLD = 0.05
+
+TIMING_LINE = re.compile(
+    r'^\s*([A-Za-z][\w ()/.,+-]*?)\s*:\s*([0-9]+(?:\.[0-9]+)?)\s*'
+    r'(ms|us|µs|s)\s*$')
+UNIT_MS = {'ms': 1.0, 'us': 0.001, 'µs': 0.001, 's': 1000.0}
+
+
+def parse_output(text):
+    """
+    Extract timings from benchmark output.
+
+    Returns:
+        List of (metric, milliseconds) in output order
+    """
+    timings = []
+    for line in text.splitlines():
+        match = TIMING_LINE.match(line)
+        if match:
+            label, value, unit = match.groups()
+            timings.append((label.strip(), float(value) * UNIT_MS[unit]))
+    return timings
+
+
+def git_commit():
+    """Return (short commit hash, dirty flag), or ('unknown', False)."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                                capture_output=True, text=True,
+                                check=True).stdout.strip()
+        status = subprocess.run(['git', 'status', '--porcelain',
+                                 '--untracked-files=no'],
+                                capture_output=True, text=True,
+                                check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown', False
+    return commit, bool(status.strip())
+
+
+def machine_id():
+    return f'{platform.node()}-{platform.machine()}'
+
+
+def make_samples(bench, outputs, commit, dirty, machine):
+    """Turn each run's output into history records."""
+    now = datetime.datetime.now().isoformat(timespec='seconds')
+    samples = []
+    for run, text in enumerate(outputs, start=1):
+        for metric, ms in parse_output(text):
+            samples.append({'bench': bench, 'metric': metric, 'ms': ms,
+                            'commit': commit, 'dirty': dirty,
+                            'machine': machine, 'time': now, 'run': run})
+    return samples
+
+
+def append_history(samples, path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'a', encoding='utf-8') as f:
+        for sample in samples:
+            f.write(json.dumps(sample, ensure_ascii=False))
+            f.write('\n')
+
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def mad(values):
+    """Median absolute deviation, scaled to estimate the standard deviation."""
+    center = statistics.median(values)
+    return 1.4826 * statistics.median(abs(v - center) for v in values)
+
+
+def median_ci(values, confidence=0.95):
+    """
+    Distribution-free confidence interval for the median.
+
+    Uses the binomial order-statistic bounds; with fewer than about 8
+    samples the interval is the full range.
+    """
+    ordered = sorted(values)
+    n = len(ordered)
+    z = statistics.NormalDist().inv_cdf(0.5 + confidence / 2)
+    half = z * math.sqrt(n) / 2
+    low = max(0, math.floor(n / 2 - half))
+    high = min(n - 1, math.ceil(n / 2 + half) - 1)
+    return ordered[low], ordered[high]
+
+
+def mann_whitney(a, b):
+    """
+    Two-sided Mann-Whitney U test, normal approximation with tie correction.
+
+    Returns:
+        p-value (1.0 when either side has fewer than 2 samples)
+    """
+    n1, n2 = len(a), len(b)
+    if n1 < 2 or n2 < 2:
+        return 1.0
+    combined = sorted([(v, 0) for v in a] + [(v, 1) for v in b])
+    ranks = [0.0] * len(combined)
+    ties = 0.0
+    i = 0
+    while i < len(combined):
+        j = i
+        while j + 1 < len(combined) and combined[j + 1][0] == combined[i][0]:
+            j += 1
+        rank = (i + j) / 2 + 1
+        for k in range(i, j + 1):
+            ranks[k] = rank
+        t = j - i + 1
+        ties += t ** 3 - t
+        i = j + 1
+
+    rank_sum = sum(r for r, (_, side) in zip(ranks, combined) if side == 0)
+    u = rank_sum - n1 * (n1 + 1) / 2
+    n = n1 + n2
+    variance = n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1)))
+    if variance <= 0:
+        return 1.0
+    z = (abs(u - n1 * n2 / 2) - 0.5) / math.sqrt(variance)
+    return 2 * (1 - statistics.NormalDist().cdf(max(z, 0.0)))
+
+
+def same_commit(a, b):
+    """True if two commit hashes name the same commit (one prefixes the other)."""
+    return bool(a and b) and (a.startswith(b) or b.startswith(a))
+
+
+def _usable(sample, machine, include_dirty):
+    return (sample['machine'] == machine
+            and (include_dirty or not sample.get('dirty', False)))
+
+
+def group_samples(history, machine, commit, include_dirty=False):
+    """Return {(bench, metric): [ms, ...]} for one commit on one machine."""
+    groups = defaultdict(list)
+    for sample in history:
+        if (_usable(sample, machine, include_dirty)
+                and same_commit(sample['commit'], commit)):
+            groups[(sample['bench'], sample['metric'])].append(sample['ms'])
+    return groups
+
+
+def previous_commit(history, machine, current, include_dirty=False):
+    """Most recently recorded commit on `machine` other than `current`."""
+    for sample in reversed(history):
+        if (_usable(sample, machine, include_dirty)
+                and not same_commit(sample['commit'], current)):
+            return sample['commit']
+    return None
+
+
+def compare(base, current, alpha=DEFAULT_ALPHA, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare two {(bench, metric): samples} groups.
+
+    Returns:
+        List of row dicts, one per metric present on both sides
+    """
+    rows = []
+    for key in sorted(set(base) & set(current)):
+        a, b = base[key], current[key]
+        base_median = statistics.median(a)
+        median = statistics.median(b)
+        change = (median - base_median) / base_median if base_median else 0.0
+        p = mann_whitney(a, b)
+        if p < alpha and change > threshold:
+            verdict = 'REGRESSION'
+        elif p < alpha and change < -threshold:
+            verdict = 'improved'
+        else:
+            verdict = ''
+        rows.append({
+            'bench': key[0], 'metric': key[1],
+            'base_n': len(a), 'base_median': base_median,
+            'n': len(b), 'median': median, 'ci': median_ci(b),
+            'mad': mad(b), 'change': change, 'p': p, 'verdict': verdict,
+        })
+    return rows
+
+
+def print_table(rows):
+    header = (f"{'benchmark':<34} {'base':>10} {'current':>10} "
+              f"{'95% CI':>19} {'MAD':>8} {'change':>8} {'p':>7}  verdict")
+    print(header)
+    print('-' * len(header))
+    for row in rows:
+        name = f"{row['bench']}/{row['metric']}"[:34]
+        ci = f"{row['ci'][0]:.2f}-{row['ci'][1]:.2f}"
+        print(f"{name:<34} {row['base_median']:>10.2f} {row['median']:>10.2f} "
+              f"{ci:>19} {row['mad']:>8.2f} {row['change']:>+8.1%} "
+              f"{row['p']:>7.3f}  {row['verdict']}")
+
+
+def cmd_run(args):
+    if not args.command:
+        print("ERROR: No benchmark command given (put it after --)")
+        return 1
+    outputs = []
+    for i in range(args.repeat):
+        print(f"  Run {i + 1}/{args.repeat}: {' '.join(args.command)}",
+              end='\r')
+        result = subprocess.run(args.command, capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"\nERROR: Benchmark failed with exit code "
+                  f"{result.returncode}")
+            print(result.stdout[-2000:] + result.stderr[-2000:])
+            return 1
+        outputs.append(result.stdout)
+    print()
+    return record(args, outputs)
+
+
+def cmd_record(args):
+    if args.files:
+        outputs = []
+        for path in args.files:
+            with open(path, 'r', encoding='utf-8') as f:
+                outputs.append(f.read())
+    else:
+        outputs = [sys.stdin.read()]
+    return record(args, outputs)
+
+
+def record(args, outputs):
+    commit, dirty = git_commit()
+    samples = make_samples(args.bench, outputs, args.commit or commit,
+                           dirty, args.machine or machine_id())
+    if not samples:
+        print("ERROR: No timings found in the benchmark output")
+        return 1
+    append_history(samples, args.history)
+    metrics = sorted({s['metric'] for s in samples})
+    print(f"✓ Recorded {len(samples)} samples of {len(metrics)} metrics "
+          f"({', '.join(metrics)}) for {samples[0]['commit']}"
+          f"{' (dirty)' if dirty else ''} -> {args.history}")
+    return 0
+
+
+def cmd_compare(args):
+    history = load_history(args.history)
+    machine = args.machine or machine_id()
+    current = args.current or git_commit()[0]
+    baseline = args.baseline or previous_commit(history, machine, current,
+                                                args.include_dirty)
+    if baseline is None:
+        print(f"ERROR: No other commit recorded on {machine} to compare with")
+        return 1
+
+    base = group_samples(history, machine, baseline, args.include_dirty)
+    now = group_samples(history, machine, current, args.include_dirty)
+    rows = compare(base, now, alpha=args.alpha, threshold=args.threshold)
+    if not rows:
+        print(f"ERROR: No metrics recorded for both {baseline} and {current} "
+              f"on {machine}")
+        if not args.include_dirty:
+            print("  (dirty samples are skipped; use --include-dirty to "
+                  "compare them)")
+        return 1
+
+    print(f"{baseline} -> {current} on {machine} "
+          f"(alpha {args.alpha}, threshold {args.threshold:.0%})\n")
+    print_table(rows)
+    regressions = [r for r in rows if r['verdict'] == 'REGRESSION']
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s)")
+        return 1
+    print(f"\n✓ No regressions in {len(rows)} metrics")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Record Dart benchmark timings and detect regressions')
+    parser.add_argument('--history', default=HISTORY_FILE,
+                        help=f'JSONL history (default: {HISTORY_FILE})')
+    parser.add_argument('--machine', default=None,
+                        help='machine key (default: hostname-arch)')
+    sub = parser.add_subparsers(dest='subcommand', required=True)
+
+    p = sub.add_parser('run', help='run a benchmark command and record it')
+    p.add_argument('--bench', required=True, help='benchmark name')
+    p.add_argument('--repeat', type=int, default=10,
+                   help='number of runs (default: 10)')
+    p.add_argument('--commit', default=None,
+                   help='commit to record (default: git HEAD)')
+    p.add_argument('command', nargs=argparse.REMAINDER,
+                   help='benchmark command, after --')
+    p.set_defaults(func=cmd_run)
+
+    p = sub.add_parser('record', help='record saved benchmark output')
+    p.add_argument('--bench', required=True, help='benchmark name')
+    p.add_argument('--commit', default=None,
+                   help='commit to record (default: git HEAD)')
+    p.add_argument('files', nargs='*',
+                   help='output files, one per run (default: stdin)')
+    p.set_defaults(func=cmd_record)
+
+    p = sub.add_parser('compare', help='compare two commits')
+    p.add_argument('--baseline', default=None,
+                   help='baseline commit (default: previous in history)')
+    p.add_argument('--current', default=None,
+                   help='current commit (default: git HEAD)')
+    p.add_argument('--alpha', type=float, default=DEFAULT_ALPHA,
+                   help=f'significance level (default: {DEFAULT_ALPHA})')
+    p.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                   help=f'minimum relative change (default: {DEFAULT_THRESHOLD})')
+    p.add_argument('--include-dirty', action='store_true',
+                   help='also use samples recorded with uncommitted changes')
+    p.set_defaults(func=cmd_compare)
+
+    args = parser.parse_args()
+    if getattr(args, 'command', None) and args.command[0] == '--':
+        args.command = args.command[1:]
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Generate large deterministic FEN and PGN corpora for the Dart benchmarks.
+
+test/benchmarks/fen_parsing_benchmark.dart, pgn_parsing_benchmark.dart and
+lib/bench.dart time a single starting position or a tiny inline game. This
+writes seeded corpora of realistic inputs so parser changes are measured on
+representative data:
+
+  positions_<N>.fen  one FEN per line: half puzzle positions (the puzzle
+                     FEN and the position after the setup move), half
+                     positions sampled from random playouts, shuffled
+  games_<N>.pgn      playout games in Lichess export style: full header
+                     set, [%clk]/[%eval] and text comments, NAGs and
+                     side variations
+  manifest.json      seed, counts and SHA-256 of every file
+
+Playouts are biased towards captures, promotions and castling so they look
+less like random walks, and run on a process pool. Every game is derived
+from (seed, game number) alone, so the output does not depend on the number
+of workers. Puzzle positions are the lowest-hash sample of the input
+(see build_bench_suites.stable_hash), so the same input and seed always
+give the same corpus.
+
+Requires python-chess (pip install chess).
+
+Usage:
+  python scripts/build_bench_corpus.py [--fens 10000] [--games 10000]
+      [--puzzles FILE_OR_DUMP] [--seed N] [--workers N]
+      [--output-dir build/bench_corpus]
+"""
+
+import argparse
+import datetime
+import hashlib
+import heapq
+import json
+import os
+import random
+import sys
+import time
+from multiprocessing import Pool
+
+try:
+    import chess
+    import chess.pgn
+except ImportError:
+    chess = None
+
+from build_bench_suites import iter_input, stable_hash
+
+INPUT_FILE = 'assets/puzzles/puzzles.json'
+OUTPUT_DIR = 'build/bench_corpus'
+DEFAULT_FENS = 10000
+DEFAULT_GAMES = 10000
+
+# Share of the FEN corpus taken from puzzles rather than playouts
+PUZZLE_SHARE = 0.5
+FENS_PER_GAME = 4
+GAMES_PER_TASK = 100
+
+MIN_PLIES = 20
+MAX_PLIES = 140
+TIME_CONTROLS = [(60, 0), (180, 0), (180, 2), (300, 0), (300, 3), (600, 0),
+                 (600, 5), (900, 10), (1800, 0)]
+TERMINATIONS = ['Normal', 'Time forfeit']
+TEXT_COMMENTS = ['Inaccuracy.', 'Mistake.', 'Blunder.', 'Best move.',
+                 'Only move.', 'The critical test.', 'Forced.']
+NAGS = [1, 2, 3, 4, 5, 6, 10, 13, 14, 15, 16, 17, 18, 19]
+PIECE_VALUES = {chess.PAWN: 1, chess.KNIGHT: 3, chess.BISHOP: 3,
+                chess.ROOK: 5, chess.QUEEN: 9, chess.KING: 0} if chess else {}
+
+COMMENT_RATE = 0.08
+NAG_RATE = 0.05
+VARIATION_RATE = 0.04
+EVAL_RATE = 0.5
+
+
+def game_rng(seed, index):
+    """Independent generator for one game, whatever process plays it."""
+    digest = hashlib.sha1(f'{seed}:game:{index}'.encode()).digest()
+    return random.Random(int.from_bytes(digest[:8], 'big'))
+
+
+def pick_move(board, rng):
+    """Choose a legal move, favouring captures, promotions and castling."""
+    moves = list(board.legal_moves)
+    weights = []
+    for move in moves:
+        weight = 1.0
+        captured = board.piece_type_at(move.to_square)
+        if captured:
+            weight += 2 * PIECE_VALUES[captured]
+        elif board.is_en_passant(move):
+            weight += 2
+        if move.promotion:
+            weight += 8
+        if board.is_castling(move):
+            weight += 6
+        weights.append(weight)
+    return rng.choices(moves, weights)[0]
+
+
+def add_variation(node, rng):
+    """Attach a short side line replacing the move that led to `node`."""
+    parent = node.parent
+    board = parent.board()
+    alternatives = [m for m in board.legal_moves if m != node.move]
+    if not alternatives:
+        return
+    line = parent.add_variation(rng.choice(alternatives))
+    board.push(line.move)
+    for _ in range(rng.randint(0, 4)):
+        if board.is_game_over():
+            break
+        move = pick_move(board, rng)
+        line = line.add_variation(move)
+        board.push(move)
+    if rng.random() < 0.5:
+        line.comment = rng.choice(TEXT_COMMENTS)
+
+
+def format_clock(seconds):
+    seconds = max(0, int(seconds))
+    return f'{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}'
+
+
+def play_game(seed, index):
+    """
+    Play one seeded game.
+
+    Returns:
+        (PGN text, list of sampled FENs)
+    """
+    rng = game_rng(seed, index)
+    base, increment = rng.choice(TIME_CONTROLS)
+    white_elo = rng.randint(800, 2800)
+    black_elo = max(600, white_elo + rng.randint(-300, 300))
+    date = datetime.date(2020, 1, 1) + datetime.timedelta(days=rng.randint(0, 2000))
+
+    game = chess.pgn.Game()
+    game.headers['Event'] = f'Rated {"Blitz" if base < 600 else "Rapid"} game'
+    game.headers['Site'] = 'https://lichess.org/' + ''.join(
+        rng.choice('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789')
+        for _ in range(8))
+    game.headers['Date'] = date.strftime('%Y.%m.%d')
+    game.headers['White'] = f'player{rng.randint(1, 99999)}'
+    game.headers['Black'] = f'player{rng.randint(1, 99999)}'
+    game.headers['WhiteElo'] = str(white_elo)
+    game.headers['BlackElo'] = str(black_elo)
+    game.headers['TimeControl'] = f'{base}+{increment}'
+    game.headers['UTCTime'] = (f'{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}'
+                               f':{rng.randint(0, 59):02d}')
+
+    board = chess.Board()
+    node = game
+    clocks = [base, base]
+    plies = rng.randint(MIN_PLIES, MAX_PLIES)
+    # FENs are only rendered for the sampled plies; board.fen() is slow
+    sample_plies = set(rng.sample(range(1, plies + 1), FENS_PER_GAME))
+    fens = []
+    with_evals = rng.random() < EVAL_RATE
+    evaluation = 0.2
+
+    for ply in range(1, plies + 1):
+        if board.is_game_over():
+            break
+        move = pick_move(board, rng)
+        board.push(move)
+        node = node.add_variation(move)
+
+        side = ply % 2
+        clocks[side] = max(0, clocks[side] - rng.expovariate(1 / 6) + increment)
+        parts = []
+        if with_evals:
+            evaluation += rng.gauss(0, 0.4)
+            parts.append(f'[%eval {evaluation:.2f}]')
+        parts.append(f'[%clk {format_clock(clocks[side])}]')
+        if rng.random() < COMMENT_RATE:
+            parts.append(rng.choice(TEXT_COMMENTS))
+        node.comment = ' '.join(parts)
+        if rng.random() < NAG_RATE:
+            node.nags.add(rng.choice(NAGS))
+        if ply > 1 and rng.random() < VARIATION_RATE:
+            add_variation(node, rng)
+        if ply in sample_plies:
+            fens.append(board.fen())
+
+    outcome = board.outcome()
+    if outcome is not None:
+        result = outcome.result()
+        termination = 'Normal'
+    else:
+        # Unfinished playouts end as resignations or flags
+        result = rng.choice(['1-0', '0-1', '1/2-1/2'])
+        termination = rng.choice(TERMINATIONS)
+    game.headers['Result'] = result
+    game.headers['Termination'] = termination
+    if len(fens) < FENS_PER_GAME and board.ply() not in sample_plies:
+        # The game ended before some sampled plies
+        fens.append(board.fen())
+    return str(game), fens
+
+
+def play_games(args):
+    """Pool worker: play games [start, end)."""
+    seed, start, end = args
+    return [play_game(seed, index) for index in range(start, end)]
+
+
+def puzzle_positions(source, count, seed):
+    """
+    Sample puzzle positions: the lowest-hash `count` puzzles' FENs and the
+    positions after their setup moves, alternating.
+
+    Returns:
+        List of up to 2 * count FENs
+    """
+    sample = heapq.nsmallest(
+        count, ((stable_hash(seed, p), p.get('lichess_id') or str(p.get('id')), p)
+                for p in iter_input(source)),
+        key=lambda item: item[:2])
+    fens = []
+    for _, _, puzzle in sample:
+        fens.append(puzzle['fen'])
+        try:
+            board = chess.Board(puzzle['fen'])
+            board.push_uci(puzzle['moves'].split()[0])
+        except (ValueError, IndexError):
+            continue
+        fens.append(board.fen())
+    return fens
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Generate seeded FEN/PGN corpora for the Dart benchmarks')
+    parser.add_argument('--fens', type=int, default=DEFAULT_FENS,
+                        help=f'FENs to write (default: {DEFAULT_FENS})')
+    parser.add_argument('--games', type=int, default=DEFAULT_GAMES,
+                        help=f'PGN games to write (default: {DEFAULT_GAMES})')
+    parser.add_argument('--puzzles', default=INPUT_FILE,
+                        help=f'puzzles JSON or dump source for puzzle '
+                             f'positions (default: {INPUT_FILE})')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='corpus seed (default: 0)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='worker processes (default: all cores)')
+    parser.add_argument('--output-dir', default=OUTPUT_DIR,
+                        help=f'output directory (default: {OUTPUT_DIR})')
+    args = parser.parse_args()
+
+    if chess is None:
+        print("python-chess library NOT found.")
+        print("Please run: pip install chess")
+        return 1
+    if not args.puzzles.startswith(('http://', 'https://')) \
+            and not os.path.exists(args.puzzles):
+        print(f"ERROR: File not found: {args.puzzles}")
+        return 1
+
+    start = time.perf_counter()
+    puzzle_fens = puzzle_positions(args.puzzles,
+                                   -(-int(args.fens * PUZZLE_SHARE) // 2),
+                                   args.seed)
+    puzzle_fens = puzzle_fens[:int(args.fens * PUZZLE_SHARE)]
+    print(f"Sampled {len(puzzle_fens)} puzzle positions from {args.puzzles}")
+
+    # Playouts supply the PGN corpus and the rest of the FENs
+    playout_fens_needed = args.fens - len(puzzle_fens)
+    total_games = max(args.games, -(-playout_fens_needed // FENS_PER_GAME))
+    workers = args.workers or os.cpu_count() or 1
+    print(f"Playing {total_games} games on {workers} processes...")
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    pgn_file = os.path.join(args.output_dir, f'games_{args.games}.pgn')
+    fen_file = os.path.join(args.output_dir, f'positions_{args.fens}.fen')
+    playout_fens = []
+    played = 0
+    with Pool(workers) as pool, open(pgn_file, 'w', encoding='utf-8') as out:
+        # Games that end early yield fewer FENs, so play more if needed.
+        # imap keeps task order, so the files do not depend on scheduling.
+        while played < total_games:
+            tasks = [(args.seed, s, min(s + GAMES_PER_TASK, total_games))
+                     for s in range(played, total_games, GAMES_PER_TASK)]
+            for results in pool.imap(play_games, tasks):
+                for pgn, fens in results:
+                    if played < args.games:
+                        out.write(pgn)
+                        out.write('\n\n')
+                    missing = playout_fens_needed - len(playout_fens)
+                    playout_fens.extend(fens[:max(missing, 0)])
+                    played += 1
+                print(f"  {played}/{total_games} games...", end='\r')
+            missing = playout_fens_needed - len(playout_fens)
+            if missing > 0:
+                total_games += -(-missing // FENS_PER_GAME)
+    print()
+
+    fens = puzzle_fens + playout_fens
+    random.Random(f'{args.seed}:fens').shuffle(fens)
+    with open(fen_file, 'w', encoding='utf-8') as f:
+        for fen in fens:
+            f.write(fen)
+            f.write('\n')
+
+    manifest = {
+        'seed': args.seed,
+        'puzzles': args.puzzles,
+        'files': {
+            os.path.basename(pgn_file): {'games': min(args.games, played),
+                                         'sha256': file_sha256(pgn_file)},
+            os.path.basename(fen_file): {'fens': len(fens),
+                                         'from_puzzles': len(puzzle_fens),
+                                         'sha256': file_sha256(fen_file)},
+        },
+    }
+    with open(os.path.join(args.output_dir, 'manifest.json'), 'w',
+              encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+    elapsed = time.perf_counter() - start
+    print(f"✓ Wrote {min(args.games, played)} games to {pgn_file} "
+          f"({os.path.getsize(pgn_file) / 1e6:.1f} MB)")
+    print(f"✓ Wrote {len(fens)} FENs to {fen_file} "
+          f"({len(puzzle_fens)} from puzzles) in {elapsed:.1f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Build deterministic EPD benchmark suites from the puzzle set.
+
+lib/bench.dart, lib/main_sweep.dart and lib/main_verify_nodes.dart each
+measure one hard-coded position or game. This builds fixed-size EPD suites
+(50 / 500 / 5000 positions by default) stratified by game phase and rating
+band, spreading tactical motifs within each stratum, so engine speed and
+accuracy sweeps run over something representative and stable.
+
+Each EPD record is the puzzle position after the opponent's setup move, with
+the first solver move as the best move:
+
+  <fen> bm Qf7+; id "puzzle-190420187"; c0 "rating 600 phase endgame theme mate"; c1 "f2f7";
+
+Selection is a deterministic hash order (seeded), so the same input always
+gives the same suites. Input is puzzles.json or any dump source accepted by
+lichess_dump.py; dump rows are reduced to a bounded per-stratum sample while
+streaming.
+
+Requires python-chess (pip install chess) to apply setup moves and write SAN.
+
+Usage:
+  python scripts/build_bench_suites.py [--input FILE_OR_DUMP]
+      [--sizes 50,500,5000] [--output-dir DIR] [--seed N]
+"""
+
+import argparse
+import hashlib
+import heapq
+import json
+import os
+import sys
+from collections import defaultdict
+
+try:
+    import chess
+except ImportError:
+    chess = None
+
+from build_puzzle_tables import primary_motif, split_themes
+from lichess_dump import iter_dump_puzzles, lichess_numeric_id
+
+INPUT_FILE = 'assets/puzzles/puzzles.json'
+OUTPUT_DIR = 'build/bench_suites'
+DEFAULT_SIZES = [50, 500, 5000]
+
+PHASES = ['opening', 'middlegame', 'endgame']
+RATING_BANDS = [(0, 1200), (1200, 1600), (1600, 2000), (2000, 2400),
+                (2400, 4000)]
+
+
+def phase_of(puzzle):
+    """
+    Game phase of a puzzle: the Lichess phase theme if present, otherwise a
+    guess from the FEN's piece count and move number.
+    """
+    themes = set(split_themes(puzzle['themes']))
+    for phase in PHASES:
+        if phase in themes:
+            return phase
+
+    fields = puzzle['fen'].split()
+    pieces = sum(1 for ch in fields[0] if ch in 'nbrqNBRQ')
+    if pieces <= 6:
+        return 'endgame'
+    if len(fields) > 5 and fields[5].isdigit() and int(fields[5]) <= 12:
+        return 'opening'
+    return 'middlegame'
+
+
+def rating_band(rating):
+    for i, (low, high) in enumerate(RATING_BANDS):
+        if low <= rating < high:
+            return i
+    return len(RATING_BANDS) - 1
+
+
+def stable_hash(seed, puzzle):
+    """Deterministic per-puzzle sort key."""
+    ident = puzzle.get('lichess_id') or str(puzzle.get('id'))
+    digest = hashlib.sha1(f'{seed}:{ident}'.encode()).digest()
+    return int.from_bytes(digest[:8], 'big')
+
+
+def sample_strata(puzzles, per_stratum, seed):
+    """
+    Keep the `per_stratum` lowest-hash puzzles of each (phase, band) stratum.
+
+    Memory stays bounded by strata * per_stratum however long the stream is.
+
+    Returns:
+        Dict of stratum -> puzzles sorted by hash
+    """
+    heaps = defaultdict(list)
+    for seq, puzzle in enumerate(puzzles):
+        if len(puzzle['moves'].split()) < 2:
+            continue
+        stratum = (phase_of(puzzle), rating_band(puzzle['rating']))
+        # Max-heap on hash via negation; seq breaks ties before the dict
+        item = (-stable_hash(seed, puzzle), -seq, puzzle)
+        heap = heaps[stratum]
+        if len(heap) < per_stratum:
+            heapq.heappush(heap, item)
+        elif item[:2] > heap[0][:2]:
+            heapq.heapreplace(heap, item)
+
+    return {stratum: [item[2] for item in sorted(heap, key=lambda i: i[:2],
+                                                 reverse=True)]
+            for stratum, heap in heaps.items()}
+
+
+def allocate(sizes_available, total):
+    """
+    Split `total` slots as evenly as possible across strata, never giving a
+    stratum more than it holds.
+
+    Returns:
+        Dict of stratum -> slot count
+    """
+    allocation = {stratum: 0 for stratum in sizes_available}
+    remaining = total
+    open_strata = sorted(s for s, n in sizes_available.items() if n > 0)
+    while remaining > 0 and open_strata:
+        share = max(1, remaining // len(open_strata))
+        for stratum in list(open_strata):
+            if remaining == 0:
+                break
+            take = min(share, sizes_available[stratum] - allocation[stratum],
+                       remaining)
+            allocation[stratum] += take
+            remaining -= take
+            if allocation[stratum] >= sizes_available[stratum]:
+                open_strata.remove(stratum)
+    return allocation
+
+
+def spread_motifs(puzzles):
+    """Reorder puzzles round-robin by primary motif, keeping hash order within each."""
+    by_motif = defaultdict(list)
+    order = []
+    for puzzle in puzzles:
+        motif = primary_motif(puzzle['themes'])
+        if motif not in by_motif:
+            order.append(motif)
+        by_motif[motif].append(puzzle)
+
+    result = []
+    depth = 0
+    while len(result) < len(puzzles):
+        for motif in order:
+            if depth < len(by_motif[motif]):
+                result.append(by_motif[motif][depth])
+        depth += 1
+    return result
+
+
+def to_epd(puzzle):
+    """
+    Convert a puzzle to an EPD record, or None if its moves are illegal.
+    """
+    moves = puzzle['moves'].split()
+    try:
+        board = chess.Board(puzzle['fen'])
+        board.push_uci(moves[0])
+        best = chess.Move.from_uci(moves[1])
+        if best not in board.legal_moves:
+            return None
+    except ValueError:
+        return None
+
+    puzzle_id = puzzle.get('id')
+    if puzzle_id is None:
+        puzzle_id = lichess_numeric_id(puzzle['lichess_id'])
+    comment = (f"rating {puzzle['rating']} phase {phase_of(puzzle)} "
+               f"theme {primary_motif(puzzle['themes']) or 'none'}")
+    return board.epd(bm=[best], id=f'puzzle-{puzzle_id}', c0=comment,
+                     c1=moves[1])
+
+
+def build_suite(strata, size):
+    """
+    Pick `size` puzzles across strata.
+
+    Returns:
+        List of EPD lines
+    """
+    available = {stratum: len(puzzles) for stratum, puzzles in strata.items()}
+    allocation = allocate(available, size)
+
+    lines = []
+    for stratum in sorted(strata):
+        picked = 0
+        for puzzle in spread_motifs(strata[stratum]):
+            if picked >= allocation[stratum]:
+                break
+            epd = to_epd(puzzle)
+            if epd is not None:
+                lines.append(epd)
+                picked += 1
+    return lines
+
+
+def iter_input(path):
+    if path.endswith('.json'):
+        with open(path, 'r', encoding='utf-8') as f:
+            yield from json.load(f)
+    else:
+        yield from iter_dump_puzzles(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Build stratified EPD benchmark suites from puzzles')
+    parser.add_argument('--input', default=INPUT_FILE,
+                        help=f'puzzles JSON or dump source (default: {INPUT_FILE})')
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='comma-separated suite sizes (default: 50,500,5000)')
+    parser.add_argument('--output-dir', default=OUTPUT_DIR,
+                        help=f'directory for the suites (default: {OUTPUT_DIR})')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='selection seed (default: 0)')
+    args = parser.parse_args()
+
+    if chess is None:
+        print("python-chess library NOT found.")
+        print("Please run: pip install chess")
+        return 1
+
+    sizes = sorted(int(s) for s in args.sizes.split(',') if s.strip())
+    strata_count = len(PHASES) * len(RATING_BANDS)
+    # Oversample so illegal records and motif spreading never starve a stratum
+    per_stratum = max(sizes) * 2 // strata_count + 50
+
+    print(f"Sampling {args.input} into {strata_count} strata...")
+    strata = sample_strata(iter_input(args.input), per_stratum, args.seed)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    for size in sizes:
+        lines = build_suite(strata, size)
+        output_file = os.path.join(args.output_dir, f'suite_{size}.epd')
+        with open(output_file, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        print(f"✓ {output_file}: {len(lines)} positions")
+        if len(lines) < size:
+            print(f"  (only {len(lines)} usable positions for size {size})")
+
+    print("\nStrata (phase, rating band): available")
+    for phase, band in sorted(strata):
+        low, high = RATING_BANDS[band]
+        print(f"  {phase:<10} {low}-{high - 1}: {len(strata[(phase, band)])}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
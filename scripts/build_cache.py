@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache for puzzle pipeline stage outputs.
+
+Every stage of build_pipeline.py (selection, legality screening, feature
+columns, pack writing, indexes) is a pure function of its inputs: the dump
+contents, the stage's own settings, the keys of the stages it reads from
+and the pipeline version. stage_key() hashes exactly those into a key, and
+the stage's output files are stored under it:
+
+  CACHE_DIR/objects/ab/abcdef.../manifest.json
+  CACHE_DIR/objects/ab/abcdef.../<output files>
+
+A stage whose key is already in the cache is skipped and its files are
+reused. Keys chain, so changing one stage's settings rebuilds that stage and
+the stages that read its output, and nothing upstream or alongside it.
+
+The dump checksum is a SHA-256 of the file. Hashing a full dump takes a few
+seconds, so checksums are remembered in checksums.json by path, size and
+mtime. For a URL the server's ETag (or Last-Modified) stands in for the
+checksum.
+
+Usage:
+  python scripts/build_cache.py stats [--cache-dir DIR]
+  python scripts/build_cache.py clear [--cache-dir DIR] [--stage NAME]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+try:
+    import requests
+except ImportError:
+    requests = None
+
+CACHE_DIR = 'build/cache'
+MANIFEST = 'manifest.json'
+
+
+def file_checksum(path, chunk_size=1 << 20):
+    """SHA-256 hex digest of a file."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def stage_key(stage, version, **inputs):
+    """
+    Hash a stage's name, the pipeline version and its inputs into a key.
+
+    Args:
+        stage: Stage name
+        version: Pipeline version; bump it to invalidate every stage
+        **inputs: JSON-serializable settings, checksums and upstream keys
+    """
+    payload = json.dumps({'stage': stage, 'version': version,
+                          'inputs': inputs}, sort_keys=True,
+                         separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class BuildCache:
+    """
+    Directory of stage outputs keyed by stage_key().
+
+    Args:
+        root: Cache directory (created on first store)
+    """
+
+    def __init__(self, root=CACHE_DIR):
+        self.root = root
+
+    def _entry_dir(self, key):
+        return os.path.join(self.root, 'objects', key[:2], key)
+
+    def source_checksum(self, source):
+        """
+        Checksum identifying the contents of a dump file or URL.
+
+        Local files are hashed once per (size, mtime) and remembered.
+        """
+        if source.startswith(('http://', 'https://')):
+            if requests is None:
+                raise RuntimeError('Checking a dump URL needs requests: '
+                                   'pip install requests')
+            response = requests.head(source, allow_redirects=True)
+            response.raise_for_status()
+            tag = (response.headers.get('ETag')
+                   or response.headers.get('Last-Modified'))
+            if not tag:
+                raise RuntimeError(f'{source} has no ETag or Last-Modified '
+                                   f'header to key the cache on')
+            return f'url:{tag}'
+
+        path = os.path.abspath(source)
+        stat = os.stat(path)
+        stamp = [stat.st_size, stat.st_mtime_ns]
+        checksums_file = os.path.join(self.root, 'checksums.json')
+        checksums = {}
+        if os.path.exists(checksums_file):
+            with open(checksums_file, 'r', encoding='utf-8') as f:
+                checksums = json.load(f)
+        known = checksums.get(path)
+        if known and known['stamp'] == stamp:
+            return known['sha256']
+
+        checksum = file_checksum(path)
+        checksums[path] = {'stamp': stamp, 'sha256': checksum}
+        os.makedirs(self.root, exist_ok=True)
+        with open(checksums_file, 'w', encoding='utf-8') as f:
+            json.dump(checksums, f, indent=2)
+        return checksum
+
+    def lookup(self, key):
+        """
+        Return the directory holding a stage's outputs, or None on a miss.
+
+        An entry only counts if its manifest exists and every listed file
+        has the recorded size.
+        """
+        entry = self._entry_dir(key)
+        manifest_file = os.path.join(entry, MANIFEST)
+        if not os.path.exists(manifest_file):
+            return None
+        with open(manifest_file, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        for name, info in manifest['files'].items():
+            path = os.path.join(entry, name)
+            if not os.path.exists(path) or os.path.getsize(path) != info['size']:
+                return None
+        return entry
+
+    def build(self, key, stage, produce):
+        """
+        Run `produce(directory)` to write a stage's outputs and store them.
+
+        The outputs are written to a temporary directory and moved into
+        place in one rename, so an interrupted stage never leaves a
+        half-written entry behind.
+
+        Returns:
+            The entry directory
+        """
+        objects = os.path.join(self.root, 'objects')
+        os.makedirs(objects, exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix=f'.{stage}-', dir=objects)
+        try:
+            produce(tmp)
+            files = {}
+            for name in sorted(os.listdir(tmp)):
+                path = os.path.join(tmp, name)
+                files[name] = {'size': os.path.getsize(path),
+                               'sha256': file_checksum(path)}
+            with open(os.path.join(tmp, MANIFEST), 'w', encoding='utf-8') as f:
+                json.dump({'stage': stage, 'key': key, 'created': time.time(),
+                           'files': files}, f, indent=2)
+            entry = self._entry_dir(key)
+            os.makedirs(os.path.dirname(entry), exist_ok=True)
+            if os.path.exists(entry):
+                # A stale entry that failed lookup()
+                shutil.rmtree(entry)
+            os.replace(tmp, entry)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        return entry
+
+    def get_or_build(self, key, stage, produce):
+        """
+        Return (entry directory, True if it was a cache hit).
+        """
+        entry = self.lookup(key)
+        if entry is not None:
+            return entry, True
+        return self.build(key, stage, produce), False
+
+    def entries(self):
+        """Yield the manifest of every cache entry."""
+        objects = os.path.join(self.root, 'objects')
+        if not os.path.isdir(objects):
+            return
+        for prefix in sorted(os.listdir(objects)):
+            prefix_dir = os.path.join(objects, prefix)
+            if prefix.startswith('.') or not os.path.isdir(prefix_dir):
+                continue
+            for key in sorted(os.listdir(prefix_dir)):
+                manifest_file = os.path.join(prefix_dir, key, MANIFEST)
+                if os.path.exists(manifest_file):
+                    with open(manifest_file, 'r', encoding='utf-8') as f:
+                        yield json.load(f)
+
+    def remove(self, key):
+        shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+
+
+def cmd_stats(cache):
+    stages = {}
+    for manifest in cache.entries():
+        count, size = stages.get(manifest['stage'], (0, 0))
+        stages[manifest['stage']] = (
+            count + 1, size + sum(f['size'] for f in manifest['files'].values()))
+    if not stages:
+        print(f"{cache.root}: empty")
+        return 0
+    print(f"{cache.root}:")
+    for stage, (count, size) in sorted(stages.items()):
+        print(f"  {stage}: {count} entries, {size / 1e6:.1f} MB")
+    return 0
+
+
+def cmd_clear(cache, stage=None):
+    removed = 0
+    for manifest in list(cache.entries()):
+        if stage is None or manifest['stage'] == stage:
+            cache.remove(manifest['key'])
+            removed += 1
+    print(f"✓ Removed {removed} entries from {cache.root}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Inspect or clear the pipeline build cache')
+    parser.add_argument('command', choices=['stats', 'clear'])
+    parser.add_argument('--cache-dir', default=CACHE_DIR,
+                        help=f'cache directory (default: {CACHE_DIR})')
+    parser.add_argument('--stage', default=None,
+                        help='clear only this stage')
+    args = parser.parse_args()
+
+    cache = BuildCache(args.cache_dir)
+    if args.command == 'stats':
+        return cmd_stats(cache)
+    return cmd_clear(cache, args.stage)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
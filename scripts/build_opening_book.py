@@ -0,0 +1,491 @@
+#!/usr/bin/env python3
+"""
+Build a Polyglot opening book from local PGN game collections.
+
+SimpleBotService only knows a handful of hand-written book positions. This
+streams large .pgn or .pgn.zst files, replays the first --max-ply moves of
+every game on a process pool and counts (position, move) pairs by Polyglot
+Zobrist key. Pairs that pass the --min-games / --min-weight thresholds are
+written as a standard Polyglot book: 16-byte big-endian entries sorted by
+key, so any position is found with a binary search.
+
+Weights follow the usual Polyglot convention of 2 per win and 1 per draw for
+the side that played the move (--weight games counts games instead), scaled
+down per position to fit 16 bits.
+
+Most pairs are seen once, so the counts outgrow memory long before the
+thresholds can be applied. Once they pass --max-memory they are spilled to a
+sorted run file, and the runs are merged (summing each pair) while the book
+is written.
+
+Requires python-chess (pip install chess); .zst input also needs zstandard.
+
+Usage:
+  python scripts/build_opening_book.py build GAMES.pgn[.zst] [MORE.pgn ...]
+      [--output book.bin] [--max-ply 24] [--min-games 5] [--min-weight 1]
+      [--min-elo 1800] [--weight score|games] [--workers N]
+      [--max-memory 1G] [--tmp-dir DIR]
+
+  python scripts/build_opening_book.py probe book.bin "FEN"
+"""
+
+import argparse
+import heapq
+import io
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from itertools import groupby
+from multiprocessing import Pool
+
+try:
+    import chess
+    import chess.pgn
+    import chess.polyglot
+except ImportError:
+    chess = None
+
+try:
+    import zstandard as zstd
+except ImportError:
+    zstd = None
+
+from external_sort import parse_memory
+
+OUTPUT_FILE = 'build/opening_book.bin'
+
+ENTRY = struct.Struct('>QHHI')
+
+# Spilled counts: key, move, games, points
+RUN_ENTRY = struct.Struct('>QHQQ')
+
+# Approximate bytes per (key, move) pair held in the counts dict
+PAIR_OVERHEAD = 250
+DEFAULT_MAX_MEMORY = '1G'
+
+DEFAULT_MAX_PLY = 24
+DEFAULT_MIN_GAMES = 5
+GAMES_PER_CHUNK = 2000
+
+# Points for the side that played the move, by game result
+RESULT_POINTS = {
+    '1-0': (2, 0),
+    '0-1': (0, 2),
+    '1/2-1/2': (1, 1),
+}
+
+
+def polyglot_move(board, move):
+    """
+    Encode a move in Polyglot's 16-bit format.
+
+    Castling is stored as the king capturing its own rook (e1h1, e1a1, ...).
+    """
+    to_square = move.to_square
+    if board.is_castling(move):
+        kingside = move.to_square > move.from_square
+        to_square = chess.square(7 if kingside else 0,
+                                 chess.square_rank(move.from_square))
+
+    promotion = 0
+    if move.promotion:
+        promotion = move.promotion - 1  # knight=1 ... queen=4
+
+    return (chess.square_file(to_square)
+            | chess.square_rank(to_square) << 3
+            | chess.square_file(move.from_square) << 6
+            | chess.square_rank(move.from_square) << 9
+            | promotion << 12)
+
+
+class _StopParsing(ValueError):
+    """Raised from parse_san once max_ply is reached to skip the rest."""
+
+
+if chess is not None:
+    class BookVisitor(chess.pgn.BaseVisitor):
+        """
+        Collect (zobrist key, polyglot move) pairs from a game's mainline.
+
+        SAN parsing stops at max_ply and variations are skipped, so long
+        games cost no more than short ones.
+        """
+
+        def __init__(self, max_ply, min_elo):
+            self.max_ply = max_ply
+            self.min_elo = min_elo
+
+        def begin_game(self):
+            self.headers = {}
+            self.pairs = []
+            self.skipped = False
+
+        def visit_header(self, tagname, tagvalue):
+            self.headers[tagname] = tagvalue
+
+        def end_headers(self):
+            if self.headers.get('Result') not in RESULT_POINTS:
+                self.skipped = True
+                return chess.pgn.SKIP
+            if self.min_elo:
+                for tag in ('WhiteElo', 'BlackElo'):
+                    try:
+                        if int(self.headers.get(tag, 0)) < self.min_elo:
+                            self.skipped = True
+                            return chess.pgn.SKIP
+                    except ValueError:
+                        self.skipped = True
+                        return chess.pgn.SKIP
+            return None
+
+        def begin_variation(self):
+            return chess.pgn.SKIP
+
+        def parse_san(self, board, san):
+            if len(self.pairs) >= self.max_ply:
+                raise _StopParsing()
+            return board.parse_san(san)
+
+        def visit_move(self, board, move):
+            self.pairs.append((chess.polyglot.zobrist_hash(board),
+                               polyglot_move(board, move),
+                               board.turn))
+
+        def handle_error(self, error):
+            # Illegal or unparsable moves end the game's contribution
+            pass
+
+        def result(self):
+            if self.skipped:
+                return None, []
+            return self.headers.get('Result'), self.pairs
+
+
+def count_chunk(args):
+    """
+    Pool worker: count book pairs in a chunk of PGN text.
+
+    Returns:
+        (games used, {(key, move): [games, points]})
+    """
+    text, max_ply, min_elo = args
+    counts = defaultdict(lambda: [0, 0])
+    games = 0
+    handle = io.StringIO(text)
+    while True:
+        result = chess.pgn.read_game(
+            handle, Visitor=lambda: BookVisitor(max_ply, min_elo))
+        if result is None:
+            break
+        outcome, pairs = result
+        if outcome is None:
+            continue
+        white_points, black_points = RESULT_POINTS[outcome]
+        games += 1
+        for key, move, turn in pairs:
+            entry = counts[(key, move)]
+            entry[0] += 1
+            entry[1] += white_points if turn == chess.WHITE else black_points
+    return games, dict(counts)
+
+
+def open_pgn(path):
+    """Open a .pgn or .pgn.zst file as text."""
+    if path.endswith('.zst'):
+        if zstd is None:
+            raise RuntimeError('Reading .zst files needs zstandard: '
+                               'pip install zstandard')
+        raw = zstd.ZstdDecompressor().stream_reader(open(path, 'rb'),
+                                                    closefd=True)
+        return io.TextIOWrapper(raw, encoding='utf-8', errors='replace')
+    return open(path, 'r', encoding='utf-8', errors='replace')
+
+
+def iter_game_chunks(paths, games_per_chunk=GAMES_PER_CHUNK):
+    """
+    Split PGN files into text chunks of whole games without parsing them.
+
+    A header line that follows movetext starts a new game.
+    """
+    for path in paths:
+        with open_pgn(path) as f:
+            lines = []
+            games = 0
+            in_moves = False
+            for line in f:
+                if line.startswith('['):
+                    if in_moves:
+                        games += 1
+                        in_moves = False
+                        if games >= games_per_chunk:
+                            yield ''.join(lines)
+                            lines = []
+                            games = 0
+                elif line.strip():
+                    in_moves = True
+                lines.append(line)
+            if lines:
+                yield ''.join(lines)
+
+
+def spill_counts(counts, tmp_dir):
+    """Write counts sorted by (key, move) to a run file and return its path."""
+    fd, path = tempfile.mkstemp(prefix='run_', suffix='.bin', dir=tmp_dir)
+    with os.fdopen(fd, 'wb') as f:
+        for (key, move), (games, points) in sorted(counts.items()):
+            f.write(RUN_ENTRY.pack(key, move, games, points))
+    return path
+
+
+def _read_run(path):
+    """Yield ((key, move), (games, points)) from a run file."""
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(RUN_ENTRY.size * 4096)
+            if not block:
+                break
+            for key, move, games, points in RUN_ENTRY.iter_unpack(block):
+                yield (key, move), (games, points)
+
+
+def merge_counts(runs, counts):
+    """
+    Merge run files and the counts still in memory.
+
+    Yields:
+        ((key, move), (games, points)) in (key, move) order, one per pair
+    """
+    merged = heapq.merge(*(_read_run(path) for path in runs),
+                         sorted(counts.items()), key=lambda item: item[0])
+    for pair, items in groupby(merged, key=lambda item: item[0]):
+        games = points = 0
+        for _, (n, p) in items:
+            games += n
+            points += p
+        yield pair, (games, points)
+
+
+def iter_entries(pairs, min_games=DEFAULT_MIN_GAMES, min_weight=1,
+                 weighting='score'):
+    """
+    Turn counted pairs sorted by key into Polyglot entries.
+
+    Args:
+        pairs: Iterable of ((key, move), (games, points)) sorted by key
+
+    Yields:
+        (key, move, weight, learn) by key, then weight descending
+    """
+    for key, items in groupby(pairs, key=lambda item: item[0][0]):
+        moves = []
+        for (_, move), (games, points) in items:
+            if games < min_games:
+                continue
+            weight = points if weighting == 'score' else games
+            if weight < min_weight:
+                continue
+            moves.append((move, weight))
+        if not moves:
+            continue
+        top = max(weight for _, weight in moves)
+        scale = 65535 / top if top > 65535 else 1
+        for move, weight in sorted(moves, key=lambda m: (-m[1], m[0])):
+            yield key, move, max(1, int(weight * scale)), 0
+
+
+def build_entries(counts, min_games=DEFAULT_MIN_GAMES, min_weight=1,
+                  weighting='score'):
+    """
+    Turn raw counts into Polyglot entries.
+
+    Returns:
+        List of (key, move, weight, learn) sorted by key, then weight
+        descending
+    """
+    return list(iter_entries(sorted(counts.items()), min_games=min_games,
+                             min_weight=min_weight, weighting=weighting))
+
+
+def write_book(entries, output_file):
+    """
+    Write entries sorted by key to a book file.
+
+    Returns:
+        (entries written, distinct positions)
+    """
+    written = positions = 0
+    last_key = None
+    with open(output_file, 'wb') as f:
+        for entry in entries:
+            f.write(ENTRY.pack(*entry))
+            written += 1
+            if entry[0] != last_key:
+                positions += 1
+                last_key = entry[0]
+    return written, positions
+
+
+def probe_book(path, fen):
+    """
+    Look up a position in a Polyglot book with a binary search.
+
+    Returns:
+        List of (uci move, weight), best first
+    """
+    board = chess.Board(fen)
+    key = chess.polyglot.zobrist_hash(board)
+    results = []
+    with open(path, 'rb') as f:
+        if os.path.getsize(path) == 0:
+            return results
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as book:
+            lo, hi = 0, len(book) // ENTRY.size
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if ENTRY.unpack_from(book, mid * ENTRY.size)[0] < key:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            i = lo
+            while i * ENTRY.size < len(book):
+                entry_key, raw, weight, _ = ENTRY.unpack_from(book, i * ENTRY.size)
+                if entry_key != key:
+                    break
+                results.append((raw, weight))
+                i += 1
+
+    return [(_decode_move(board, raw), weight) for raw, weight in results]
+
+
+def _decode_move(board, raw):
+    """Decode a Polyglot move for `board` into UCI notation."""
+    to_square = raw & 0x3f
+    from_square = (raw >> 6) & 0x3f
+    promotion = (raw >> 12) & 0x7
+    move = chess.Move(from_square, to_square,
+                      promotion + 1 if promotion else None)
+    # King-takes-rook castling back to the standard encoding
+    if board.piece_type_at(from_square) == chess.KING:
+        for castle in board.generate_castling_moves():
+            if castle.from_square == from_square and \
+                    polyglot_move(board, castle) == raw:
+                return castle.uci()
+    return move.uci()
+
+
+def cmd_build(args):
+    missing = [p for p in args.pgn if not os.path.exists(p)]
+    if missing:
+        print(f"ERROR: File not found: {', '.join(missing)}")
+        return 1
+
+    try:
+        max_pairs = max(1, parse_memory(args.max_memory) // PAIR_OVERHEAD)
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        return 1
+
+    workers = args.workers or os.cpu_count() or 1
+    print(f"Counting book moves in {len(args.pgn)} file(s) "
+          f"on {workers} processes (max ply {args.max_ply})...")
+
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory(prefix='book_counts_',
+                                     dir=args.tmp_dir) as work_dir:
+        counts = defaultdict(lambda: [0, 0])
+        runs = []
+        games = 0
+        with Pool(workers) as pool:
+            tasks = ((chunk, args.max_ply, args.min_elo)
+                     for chunk in iter_game_chunks(args.pgn))
+            for chunk_games, chunk_counts in pool.imap_unordered(count_chunk,
+                                                                 tasks):
+                games += chunk_games
+                for pair, (n, points) in chunk_counts.items():
+                    entry = counts[pair]
+                    entry[0] += n
+                    entry[1] += points
+                if len(counts) >= max_pairs:
+                    runs.append(spill_counts(counts, work_dir))
+                    counts = defaultdict(lambda: [0, 0])
+                print(f"  {games} games, {len(counts)} position/move pairs, "
+                      f"{len(runs)} runs spilled...", end='\r')
+        elapsed = time.perf_counter() - start
+        print(f"\n  Counted {games} games in {elapsed:.1f}s "
+              f"({games / max(elapsed, 1e-9):.0f} games/s)")
+
+        if runs:
+            print(f"  Merging {len(runs)} spilled runs...")
+        entries = iter_entries(merge_counts(runs, counts),
+                               min_games=args.min_games,
+                               min_weight=args.min_weight,
+                               weighting=args.weight)
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        written, positions = write_book(entries, args.output)
+
+    print(f"✓ Wrote {written} entries for {positions} positions "
+          f"to {args.output} ({written * ENTRY.size} bytes)")
+    return 0
+
+
+def cmd_probe(args):
+    moves = probe_book(args.book, args.fen)
+    if not moves:
+        print("Position not in book")
+        return 1
+    total = sum(weight for _, weight in moves)
+    for move, weight in moves:
+        print(f"  {move}\t{weight}\t{100 * weight / total:.1f}%")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Build a Polyglot opening book from PGN collections')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('build', help='count games and write a book')
+    p.add_argument('pgn', nargs='+', help='.pgn or .pgn.zst files')
+    p.add_argument('--output', default=OUTPUT_FILE,
+                   help=f'book file (default: {OUTPUT_FILE})')
+    p.add_argument('--max-ply', type=int, default=DEFAULT_MAX_PLY,
+                   help=f'plies per game to record (default: {DEFAULT_MAX_PLY})')
+    p.add_argument('--min-games', type=int, default=DEFAULT_MIN_GAMES,
+                   help=f'games a move needs to enter the book '
+                        f'(default: {DEFAULT_MIN_GAMES})')
+    p.add_argument('--min-weight', type=int, default=1,
+                   help='minimum weight a move needs to enter the book')
+    p.add_argument('--min-elo', type=int, default=0,
+                   help='skip games where either player is rated lower')
+    p.add_argument('--weight', choices=['score', 'games'], default='score',
+                   help='weight by 2*wins+draws (score) or by games')
+    p.add_argument('--workers', type=int, default=None,
+                   help='worker processes (default: all cores)')
+    p.add_argument('--max-memory', default=DEFAULT_MAX_MEMORY,
+                   help=f'budget for counts before spilling a run to disk '
+                        f'(default: {DEFAULT_MAX_MEMORY})')
+    p.add_argument('--tmp-dir', default=None,
+                   help='directory for run files (default: system temp dir)')
+    p.set_defaults(func=cmd_build)
+
+    p = sub.add_parser('probe', help='look up a position in a book')
+    p.add_argument('book')
+    p.add_argument('fen')
+    p.set_defaults(func=cmd_probe)
+
+    args = parser.parse_args()
+
+    if chess is None:
+        print("python-chess library NOT found.")
+        print("Please run: pip install chess")
+        return 1
+
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Cached end-to-end puzzle build: dump -> selected -> validated -> packs.
+
+Runs the pipeline stages in order, caching every stage's output in a
+build_cache.BuildCache so a re-run with unchanged inputs does no work:
+
+  select    one dump scan feeding every tier's PuzzleSelector
+            (build_puzzle_tiers.py) -> selected_<tier>.jsonl
+  validate  bitboard legality screen (legality_screen.py)
+            -> validated_<tier>.jsonl, legality_<tier>.json
+  features  feature columns (puzzle_features.py) -> features_<tier>.npz
+  write     the pack in --format json (puzzles_<tier>.json) or pack
+            (puzzles_<tier>.pack, build_puzzle_pack.py)
+  index     opening index and selection tables (opening_index.py,
+            build_puzzle_tables.py) -> openings_<tier>.json,
+            tables_<tier>.json
+
+select is keyed by the dump checksum and the tier settings. The per-tier
+stages are keyed by the checksum of the file they read plus their own
+settings, so e.g. switching --format only reruns write, and a select rerun
+that keeps the same puzzles for a tier leaves that tier's later stages
+cached. Bump PIPELINE_VERSION (or a stage's STAGE_VERSIONS entry) when a
+stage's code changes its output.
+
+--workers spreads validate and features over processes fed through shared
+memory (shared_columns.py). Their output does not depend on it, so it is
+not part of any cache key.
+
+Final outputs are copied to --output-dir, after removing the pack a tier
+had in the other --format.
+
+Usage:
+  python scripts/build_pipeline.py [--source URL_OR_FILE]
+      [--tiers lite,standard,full] [--format json|pack] [--limit ROWS]
+      [--seed N] [--start YYYY-MM-DD]
+      [--output-dir build/pipeline] [--cache-dir build/cache] [--workers N]
+"""
+
+import argparse
+import datetime
+import json
+import os
+import shutil
+import sys
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from build_cache import CACHE_DIR, BuildCache, stage_key
+from build_puzzle_pack import DEFAULT_LEVEL, PACK_VERSION, build_pack
+from build_puzzle_tables import (DEFAULT_START_DATE, TABLES_VERSION,
+                                 build_tables)
+from build_puzzle_tiers import TIERS, make_selectors, scan
+from external_sort import iter_input
+from legality_screen import OK, STATUS_NAMES, screen_puzzles
+from lichess_dump import LICHESS_DB_URL, to_app_record
+from opening_index import (INDEX_VERSION, build_opening_ids, build_postings,
+                           save_index)
+from puzzle_features import FEATURES_VERSION, extract_features, save_npz
+from puzzle_record import write_app_json
+
+OUTPUT_DIR = 'build/pipeline'
+PIPELINE_VERSION = 1
+
+# Per-stage code versions, hashed into that stage's key only
+STAGE_VERSIONS = {
+    'select': 1,
+    'validate': 1,
+    'features': FEATURES_VERSION,
+    'write': 1,
+    'index': 1,
+}
+
+FORMATS = ('json', 'pack')
+
+
+def write_jsonl(records, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, separators=(',', ':'),
+                               ensure_ascii=False))
+            f.write('\n')
+
+
+def run_select(source, tier_names, limit):
+    """Return a produce() that scans the dump once for every tier."""
+    def produce(directory):
+        selectors = make_selectors(tier_names)
+        scan(source, selectors, limit=limit)
+        for selector in selectors:
+            write_jsonl(selector.selected(),
+                        os.path.join(directory, f'selected_{selector.name}.jsonl'))
+    return produce
+
+
+def run_validate(selected_file, tier, workers):
+    def produce(directory):
+        legal = []
+        rejects = []
+
+        def collect(block, statuses):
+            for puzzle, status in zip(block, statuses):
+                if status == OK:
+                    legal.append(puzzle)
+                else:
+                    rejects.append({'lichess_id': puzzle.get('lichess_id'),
+                                    'status': STATUS_NAMES[status]})
+
+        counts, slow = screen_puzzles(iter_input(selected_file),
+                                      on_block=collect, workers=workers)
+        write_jsonl(legal, os.path.join(directory, f'validated_{tier}.jsonl'))
+        with open(os.path.join(directory, f'legality_{tier}.json'), 'w',
+                  encoding='utf-8') as f:
+            json.dump({'counts': dict(counts), 'slow_path': slow,
+                       'rejects': rejects}, f, indent=2)
+    return produce
+
+
+def run_features(validated_file, tier, workers):
+    def produce(directory):
+        columns = extract_features(iter_input(validated_file),
+                                   workers=workers)
+        save_npz(columns, os.path.join(directory, f'features_{tier}.npz'))
+    return produce
+
+
+def app_records(validated_file):
+    puzzles = list(iter_input(validated_file))
+    opening_ids = build_opening_ids(puzzles)
+    return [to_app_record(p, opening_ids) for p in puzzles], opening_ids
+
+
+def run_write(validated_file, tier, fmt):
+    def produce(directory):
+        records, _ = app_records(validated_file)
+        if fmt == 'json':
+            with open(os.path.join(directory, f'puzzles_{tier}.json'), 'w',
+                      encoding='utf-8') as f:
+                write_app_json(records, f)
+        else:
+            with open(os.path.join(directory, f'puzzles_{tier}.pack'), 'wb') as f:
+                f.write(build_pack(records))
+    return produce
+
+
+def run_index(validated_file, tier, seed, start_date):
+    def produce(directory):
+        records, opening_ids = app_records(validated_file)
+        save_index(build_postings(records, opening_ids),
+                   os.path.join(directory, f'openings_{tier}.json'))
+        tables = build_tables(records, seed=seed, start_date=start_date)
+        with open(os.path.join(directory, f'tables_{tier}.json'), 'w',
+                  encoding='utf-8') as f:
+            json.dump(tables, f, separators=(',', ':'))
+    return produce
+
+
+class Pipeline:
+    """Runs stages through the cache and reports what was reused."""
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.hits = 0
+        self.builds = 0
+
+    def stage(self, stage, label, produce, **inputs):
+        """
+        Get a stage's outputs from the cache or build them.
+
+        Returns:
+            Manifest dict of the entry plus its 'dir'
+        """
+        key = stage_key(stage, [PIPELINE_VERSION, STAGE_VERSIONS[stage]],
+                        **inputs)
+        start = time.perf_counter()
+        entry, hit = self.cache.get_or_build(key, stage, produce)
+        if hit:
+            self.hits += 1
+            print(f"  {label}: cached ({key[:12]})")
+        else:
+            self.builds += 1
+            print(f"  {label}: built in {time.perf_counter() - start:.1f}s "
+                  f"({key[:12]})")
+        with open(os.path.join(entry, 'manifest.json'), 'r',
+                  encoding='utf-8') as f:
+            manifest = json.load(f)
+        manifest['dir'] = entry
+        return manifest
+
+
+def remove_stale_outputs(output_dir, tier_names, fmt):
+    """Remove packs of the given tiers written in another format."""
+    for tier in tier_names:
+        for other in FORMATS:
+            path = os.path.join(output_dir, f'puzzles_{tier}.{other}')
+            if other != fmt and os.path.exists(path):
+                os.remove(path)
+
+
+def export(manifest, output_dir):
+    for name in manifest['files']:
+        shutil.copyfile(os.path.join(manifest['dir'], name),
+                        os.path.join(output_dir, name))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Build puzzle packs with cached pipeline stages')
+    parser.add_argument('--source', default=LICHESS_DB_URL,
+                        help='dump URL, .csv.zst or .csv file '
+                             '(default: official Lichess dump)')
+    parser.add_argument('--tiers', default=','.join(TIERS),
+                        help=f'comma-separated tiers (default: {",".join(TIERS)})')
+    parser.add_argument('--format', choices=FORMATS, default='json',
+                        help='pack format (default: json)')
+    parser.add_argument('--limit', type=int, default=None,
+                        help='stop after this many dump rows')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='seed for the selection tables (default: 0)')
+    parser.add_argument('--start', default=DEFAULT_START_DATE.isoformat(),
+                        help=f'first day of the daily schedule, YYYY-MM-DD '
+                             f'(default: {DEFAULT_START_DATE.isoformat()})')
+    parser.add_argument('--output-dir', default=OUTPUT_DIR,
+                        help=f'directory for the outputs (default: {OUTPUT_DIR})')
+    parser.add_argument('--cache-dir', default=CACHE_DIR,
+                        help=f'stage cache directory (default: {CACHE_DIR})')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='processes for validate and features '
+                             '(default: 1)')
+    args = parser.parse_args()
+
+    if np is None:
+        print("numpy library NOT found.")
+        print("Please run: pip install numpy")
+        return 1
+
+    tier_names = [t.strip() for t in args.tiers.split(',') if t.strip()]
+    unknown = [t for t in tier_names if t not in TIERS]
+    if unknown:
+        print(f"ERROR: Unknown tier(s): {', '.join(unknown)}")
+        print(f"Available tiers: {', '.join(TIERS)}")
+        return 1
+
+    try:
+        start_date = datetime.date.fromisoformat(args.start)
+    except ValueError:
+        print(f"ERROR: Invalid --start date: {args.start}")
+        return 1
+
+    cache = BuildCache(args.cache_dir)
+    pipeline = Pipeline(cache)
+    begin = time.perf_counter()
+
+    try:
+        checksum = cache.source_checksum(args.source)
+        print(f"Building {', '.join(tier_names)} from {args.source} "
+              f"({checksum[:12]})")
+        selected = pipeline.stage(
+            'select', 'select', run_select(args.source, tier_names, args.limit),
+            dump=checksum, limit=args.limit,
+            tiers={name: TIERS[name] for name in tier_names})
+
+        outputs = []
+        for tier in tier_names:
+            name = f'selected_{tier}.jsonl'
+            validated = pipeline.stage(
+                'validate', f'{tier}/validate',
+                run_validate(os.path.join(selected['dir'], name), tier,
+                             args.workers),
+                selected=selected['files'][name]['sha256'])
+
+            name = f'validated_{tier}.jsonl'
+            validated_file = os.path.join(validated['dir'], name)
+            validated_sum = validated['files'][name]['sha256']
+            outputs.append(validated)
+            outputs.append(pipeline.stage(
+                'features', f'{tier}/features',
+                run_features(validated_file, tier, args.workers),
+                validated=validated_sum))
+            writer = {'format': args.format}
+            if args.format == 'pack':
+                writer.update(pack_version=PACK_VERSION, level=DEFAULT_LEVEL)
+            outputs.append(pipeline.stage(
+                'write', f'{tier}/write',
+                run_write(validated_file, tier, args.format),
+                validated=validated_sum, writer=writer))
+            outputs.append(pipeline.stage(
+                'index', f'{tier}/index',
+                run_index(validated_file, tier, args.seed, start_date),
+                validated=validated_sum, seed=args.seed,
+                start=start_date.isoformat(),
+                versions=[INDEX_VERSION, TABLES_VERSION]))
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+        return 1
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    remove_stale_outputs(args.output_dir, tier_names, args.format)
+    for manifest in outputs:
+        export(manifest, args.output_dir)
+
+    print(f"\n✓ Pipeline done in {time.perf_counter() - begin:.1f}s: "
+          f"{pipeline.builds} stages built, {pipeline.hits} cached")
+    print(f"  Outputs: {args.output_dir}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
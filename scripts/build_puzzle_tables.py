@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Build precomputed puzzle selection tables for the ChessMaster app.
+
+Reads assets/puzzles/puzzles.json and writes a compact companion file with
+everything PuzzleNotifier needs to pick a puzzle without copying or filtering
+the whole list at runtime:
+
+  - by_rating / ratings: puzzle indices sorted by rating, plus the matching
+    ratings, so adaptive and ELO-range windows are two binary searches.
+  - bands: a precomputed shuffled permutation of indices per rating band.
+  - themes: a precomputed shuffled permutation of indices per theme.
+  - daily: a two-year daily-puzzle schedule with rating and theme variety.
+
+All indices refer to positions in the puzzles.json array, not puzzle IDs.
+Output is deterministic for a given input, seed and start date; the start
+date defaults to DEFAULT_START_DATE, not to the build date, and is stored in
+the table.
+
+Usage:
+  python scripts/build_puzzle_tables.py [--input FILE] [--output FILE]
+                                        [--seed N] [--start YYYY-MM-DD]
+"""
+
+import argparse
+import bisect
+import datetime
+import json
+import random
+import re
+import sys
+from collections import defaultdict, deque
+
+INPUT_FILE = 'assets/puzzles/puzzles.json'
+OUTPUT_FILE = 'assets/puzzles/puzzle_tables.json'
+TABLES_VERSION = 1
+
+BAND_WIDTH = 200
+SCHEDULE_DAYS = 730
+
+# First day of the daily schedule unless --start is given. Move it forward
+# when the shipped schedule is regenerated for a new period.
+DEFAULT_START_DATE = datetime.date(2026, 1, 1)
+
+# Target rating per weekday (Monday first): easy start of the week, hardest
+# puzzle on Saturday, a medium one on Sunday.
+DAILY_TARGET_RATINGS = [1000, 1200, 1400, 1600, 1800, 2000, 1500]
+
+# A daily puzzle's motif must not repeat within this many days
+THEME_VARIETY_WINDOW = 7
+
+# How far into a band's permutation to look for a fresh motif
+THEME_SCAN_LIMIT = 64
+
+# Lichess tags that describe length/phase/outcome rather than the tactic
+GENERIC_THEMES = {
+    'short', 'long', 'veryLong', 'oneMove',
+    'opening', 'middlegame', 'endgame',
+    'advantage', 'crushing', 'equality', 'mate',
+    'master', 'masterVsMaster', 'superGM',
+}
+
+
+def split_themes(themes):
+    """Split a themes string the same way Puzzle.fromJson does."""
+    return [t for t in re.split(r'[,\s]+', themes or '') if t]
+
+
+def primary_motif(themes):
+    """Return the first tactical theme of a puzzle, or '' if it has none."""
+    for theme in split_themes(themes):
+        if theme not in GENERIC_THEMES:
+            return theme
+    return ''
+
+
+def build_rating_index(puzzles):
+    """
+    Sort puzzle indices by rating.
+
+    Returns:
+        (by_rating, ratings) where ratings[i] is the rating of
+        puzzles[by_rating[i]], ready for binary search.
+    """
+    by_rating = sorted(range(len(puzzles)),
+                       key=lambda i: (puzzles[i]['rating'], puzzles[i]['id']))
+    ratings = [puzzles[i]['rating'] for i in by_rating]
+    return by_rating, ratings
+
+
+def build_band_permutations(puzzles, rng, band_width=BAND_WIDTH):
+    """
+    Group puzzle indices by rating band and shuffle each band.
+
+    Returns:
+        List of {'min', 'max', 'order'} sorted by band start.
+    """
+    bands = defaultdict(list)
+    for i, puzzle in enumerate(puzzles):
+        bands[(puzzle['rating'] // band_width) * band_width].append(i)
+
+    result = []
+    for band_start in sorted(bands):
+        order = bands[band_start]
+        rng.shuffle(order)
+        result.append({
+            'min': band_start,
+            'max': band_start + band_width - 1,
+            'order': order,
+        })
+    return result
+
+
+def build_theme_permutations(puzzles, rng):
+    """
+    Build a shuffled index list per (lowercased) theme.
+
+    Returns:
+        Dict of theme -> shuffled puzzle indices, with themes sorted by name.
+    """
+    themes = defaultdict(list)
+    for i, puzzle in enumerate(puzzles):
+        for theme in set(t.lower() for t in split_themes(puzzle['themes'])):
+            themes[theme].append(i)
+
+    result = {}
+    for theme in sorted(themes):
+        order = themes[theme]
+        rng.shuffle(order)
+        result[theme] = order
+    return result
+
+
+def build_daily_schedule(puzzles, ratings, rng, start_date,
+                         days=SCHEDULE_DAYS):
+    """
+    Plan one puzzle per day for `days` days starting at `start_date`.
+
+    Each weekday targets a rating from DAILY_TARGET_RATINGS. The pick comes
+    from the BAND_WIDTH rating band holding the puzzle closest to that
+    rating (or the nearest band that still has unused puzzles): the next
+    unused puzzle in the band's shuffled order whose primary motif has not
+    been used in the last THEME_VARIETY_WINDOW days, so it can be anywhere
+    in the band, e.g. 1000-1199 for a 1000 target. No puzzle repeats while
+    unused puzzles remain.
+
+    Returns:
+        List of puzzle indices, one per day.
+    """
+    # Shuffle within each rating band so ties between equally close puzzles
+    # are broken randomly but reproducibly
+    band_queues = {}
+    for band in build_band_permutations(puzzles, rng):
+        band_queues[band['min']] = deque(band['order'])
+    band_starts = sorted(band_queues)
+
+    used = set()
+    recent_motifs = deque(maxlen=THEME_VARIETY_WINDOW)
+    schedule = []
+
+    for day in range(days):
+        if len(used) == len(puzzles):
+            used.clear()
+            for band in build_band_permutations(puzzles, rng):
+                band_queues[band['min']] = deque(band['order'])
+
+        weekday = (start_date + datetime.timedelta(days=day)).weekday()
+        target = DAILY_TARGET_RATINGS[weekday]
+
+        # Start at the band holding the puzzle closest to the target rating
+        pos = min(bisect.bisect_left(ratings, target), len(ratings) - 1)
+        target_band = (ratings[pos] // BAND_WIDTH) * BAND_WIDTH
+        start = bisect.bisect_left(band_starts, target_band)
+
+        # Walk outwards from the target band until one yields a puzzle
+        order = sorted(range(len(band_starts)),
+                       key=lambda b: (abs(b - start), b))
+        pick = None
+        for b in order:
+            queue = band_queues[band_starts[b]]
+            while queue and queue[0] in used:
+                queue.popleft()
+            if not queue:
+                continue
+
+            fallback = None
+            for offset, candidate in enumerate(queue):
+                if offset >= THEME_SCAN_LIMIT:
+                    break
+                if candidate in used:
+                    continue
+                if fallback is None:
+                    fallback = candidate
+                if primary_motif(puzzles[candidate]['themes']) not in recent_motifs:
+                    pick = candidate
+                    break
+            if pick is None:
+                pick = fallback
+            if pick is not None:
+                break
+
+        used.add(pick)
+        recent_motifs.append(primary_motif(puzzles[pick]['themes']))
+        schedule.append(pick)
+
+    return schedule
+
+
+def build_tables(puzzles, seed=0, start_date=None, days=SCHEDULE_DAYS):
+    """
+    Build all selection tables for a puzzle list.
+
+    Args:
+        puzzles: List of puzzle dicts in puzzles.json order
+        seed: Seed for the shuffles and the daily schedule
+        start_date: First day of the daily schedule (datetime.date,
+            default: DEFAULT_START_DATE)
+        days: Number of scheduled days
+
+    Returns:
+        Dict ready to be serialized as the tables file
+    """
+    if start_date is None:
+        start_date = DEFAULT_START_DATE
+
+    by_rating, ratings = build_rating_index(puzzles)
+
+    # Separate generators so adding a table never reshuffles another one
+    bands = build_band_permutations(puzzles, random.Random(f'{seed}:bands'))
+    themes = build_theme_permutations(puzzles, random.Random(f'{seed}:themes'))
+    schedule = build_daily_schedule(puzzles, ratings,
+                                    random.Random(f'{seed}:daily'),
+                                    start_date, days)
+
+    return {
+        'version': TABLES_VERSION,
+        'count': len(puzzles),
+        'seed': seed,
+        'by_rating': by_rating,
+        'ratings': ratings,
+        'band_width': BAND_WIDTH,
+        'bands': bands,
+        'themes': themes,
+        'daily': {
+            'start': start_date.isoformat(),
+            'days': len(schedule),
+            'schedule': schedule,
+        },
+    }
+
+
+def save_tables(tables, output_file=OUTPUT_FILE):
+    """Save tables as compact JSON and print a short summary."""
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(tables, f, separators=(',', ':'))
+
+    print(f"✓ Saved selection tables to {output_file}")
+    print(f"  Puzzles indexed: {tables['count']}")
+    print(f"  Rating bands: {len(tables['bands'])}")
+    print(f"  Themes: {len(tables['themes'])}")
+    print(f"  Daily schedule: {tables['daily']['days']} days "
+          f"from {tables['daily']['start']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Build precomputed puzzle selection tables')
+    parser.add_argument('--input', default=INPUT_FILE,
+                        help=f'puzzles JSON (default: {INPUT_FILE})')
+    parser.add_argument('--output', default=OUTPUT_FILE,
+                        help=f'tables JSON (default: {OUTPUT_FILE})')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='seed for shuffles and the daily schedule')
+    parser.add_argument('--start', default=DEFAULT_START_DATE.isoformat(),
+                        help=f'first scheduled day, YYYY-MM-DD '
+                             f'(default: {DEFAULT_START_DATE.isoformat()})')
+    parser.add_argument('--days', type=int, default=SCHEDULE_DAYS,
+                        help=f'days to schedule (default: {SCHEDULE_DAYS})')
+    args = parser.parse_args()
+
+    try:
+        with open(args.input, 'r', encoding='utf-8') as f:
+            puzzles = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"ERROR: Could not read {args.input}: {e}")
+        return 1
+
+    if not puzzles:
+        print(f"ERROR: No puzzles in {args.input}")
+        return 1
+
+    try:
+        start_date = datetime.date.fromisoformat(args.start)
+    except ValueError:
+        print(f"ERROR: Invalid --start date: {args.start}")
+        return 1
+
+    print(f"Building selection tables for {len(puzzles)} puzzles...")
+    tables = build_tables(puzzles, seed=args.seed, start_date=start_date,
+                          days=args.days)
+    save_tables(tables, args.output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Build several puzzle packs (lite / standard / full) from one dump scan.
+
+Every other import script scans the dump once per target_count. Here a
+single streaming pass feeds every tier's PuzzleSelector, each with its own
+quota and filters, so building all tiers costs one download and one parse.
+
+Each pack puzzles_<tier>.json comes with openings_<tier>.json, the opening
+tag table and opening -> puzzle index described in opening_index.py.
+
+A full scan takes a while, so every --checkpoint-every rows the dump
+position (see lichess_dump.DumpReader) and the state of every selector are
+saved to scan.checkpoint in the output directory. After an interruption,
+--resume continues from there and writes the same packs as an
+uninterrupted run.
+
+Usage:
+  python scripts/build_puzzle_tiers.py [--source URL_OR_FILE]
+                                       [--tiers lite,standard,full]
+                                       [--output-dir DIR] [--limit ROWS]
+                                       [--checkpoint-every ROWS] [--resume]
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from lichess_dump import (LICHESS_DB_URL, DumpReader, parse_row,
+                          to_app_record)
+from opening_index import build_opening_ids, build_postings, save_index
+from puzzle_record import write_app_json
+from puzzle_selector import PuzzleSelector
+
+OUTPUT_DIR = 'build/puzzle_packs'
+CHECKPOINT_FILE = 'scan.checkpoint'
+CHECKPOINT_EVERY = 500000
+CHECKPOINT_VERSION = 1
+
+# Tier name -> PuzzleSelector settings. Smaller tiers are stricter so the
+# bundled set only carries well-tested, popular puzzles.
+TIERS = {
+    'lite': {
+        'target_count': 2000,
+        'min_popularity': 90,
+        'min_plays': 1000,
+        'max_rating_deviation': 80,
+    },
+    'standard': {
+        'target_count': 10000,
+        'min_popularity': 80,
+        'min_plays': 100,
+        'max_rating_deviation': 100,
+    },
+    'full': {
+        'target_count': 50000,
+        'min_popularity': 50,
+        'min_plays': 50,
+    },
+}
+
+
+def make_selectors(tier_names):
+    """Create one PuzzleSelector per requested tier."""
+    return [PuzzleSelector(name, **TIERS[name]) for name in tier_names]
+
+
+def scan(source, selectors, limit=None, position=None, parsed=0,
+         on_checkpoint=None, checkpoint_every=CHECKPOINT_EVERY):
+    """
+    Feed every puzzle of the dump to every selector in one pass.
+
+    Args:
+        source: Dump URL or file
+        selectors: PuzzleSelectors to feed
+        limit: Stop after this many dump rows (None for the whole dump)
+        position: DumpReader position to resume from
+        parsed: Puzzles parsed before `position`
+        on_checkpoint: Called as on_checkpoint(position, parsed) every
+            `checkpoint_every` rows
+        checkpoint_every: Rows between checkpoints
+
+    Returns:
+        Number of parsed puzzles
+    """
+    reader = DumpReader(source, position)
+    for row in reader:
+        if limit is not None and reader.rows > limit:
+            break
+        puzzle = parse_row(row)
+        if puzzle is not None:
+            parsed += 1
+            for selector in selectors:
+                selector.offer(puzzle)
+        if reader.rows % 100000 == 0:
+            print(f"  Scanned {reader.rows} rows...", end='\r')
+            sys.stdout.flush()
+        if on_checkpoint is not None and reader.rows % checkpoint_every == 0:
+            on_checkpoint(reader.position(), parsed)
+    scanned = reader.rows if limit is None else min(reader.rows, limit)
+    print(f"  Scanned {scanned} rows.      ")
+    return parsed
+
+
+def save_checkpoint(path, source, limit, selectors, position, parsed):
+    """Atomically write the scan position and every selector's state."""
+    checkpoint = {
+        'version': CHECKPOINT_VERSION,
+        'source': source,
+        'limit': limit,
+        'position': position,
+        'parsed': parsed,
+        'selectors': [selector.to_state() for selector in selectors],
+    }
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, separators=(',', ':'), ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path, source, limit, selectors):
+    """
+    Read a checkpoint, refusing one written for another dump, limit or
+    tier configuration.
+
+    Returns:
+        (restored selectors, position, parsed), or None if there is none
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        checkpoint = json.load(f)
+    configs = [state['config'] for state in checkpoint['selectors']]
+    if (checkpoint['version'] != CHECKPOINT_VERSION
+            or checkpoint['source'] != source or checkpoint['limit'] != limit
+            or configs != [selector.config() for selector in selectors]):
+        raise ValueError(f'{path} was written for another source, limit '
+                         f'or set of tiers')
+    restored = [PuzzleSelector.from_state(state)
+                for state in checkpoint['selectors']]
+    return restored, checkpoint['position'], checkpoint['parsed']
+
+
+def save_tier(selector, output_dir):
+    """
+    Write one tier as a puzzles.json-style file plus its opening index, and
+    print its summary.
+    """
+    selected = selector.selected()
+    opening_ids = build_opening_ids(selected)
+    puzzles = [to_app_record(p, opening_ids) for p in selected]
+    output_file = os.path.join(output_dir, f'puzzles_{selector.name}.json')
+
+    with open(output_file, 'w', encoding='utf-8') as f:
+        write_app_json(puzzles, f)
+    index_file = os.path.join(output_dir, f'openings_{selector.name}.json')
+    save_index(build_postings(puzzles, opening_ids), index_file)
+
+    print(f"\n✓ {selector.name}: saved {len(puzzles)} puzzles to {output_file}")
+    print(f"  {len(opening_ids)} openings indexed in {index_file}")
+    print(f"  Passed filters: {selector.accepted} of {selector.offered}")
+    for bucket, count in selector.bucket_sizes().items():
+        print(f"  {bucket}: {count}/{selector.quotas[bucket]}")
+    return output_file
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Build lite/standard/full puzzle packs in one dump scan')
+    parser.add_argument('--source', default=LICHESS_DB_URL,
+                        help='dump URL, .csv.zst or .csv file '
+                             '(default: official Lichess dump)')
+    parser.add_argument('--tiers', default=','.join(TIERS),
+                        help=f'comma-separated tiers (default: {",".join(TIERS)})')
+    parser.add_argument('--output-dir', default=OUTPUT_DIR,
+                        help=f'directory for the packs (default: {OUTPUT_DIR})')
+    parser.add_argument('--limit', type=int, default=None,
+                        help='stop after this many dump rows')
+    parser.add_argument('--checkpoint-every', type=int,
+                        default=CHECKPOINT_EVERY,
+                        help=f'rows between checkpoints, 0 to disable '
+                             f'(default: {CHECKPOINT_EVERY})')
+    parser.add_argument('--resume', action='store_true',
+                        help='continue from the checkpoint in --output-dir')
+    args = parser.parse_args()
+
+    tier_names = [t.strip() for t in args.tiers.split(',') if t.strip()]
+    unknown = [t for t in tier_names if t not in TIERS]
+    if unknown:
+        print(f"ERROR: Unknown tier(s): {', '.join(unknown)}")
+        print(f"Available tiers: {', '.join(TIERS)}")
+        return 1
+
+    selectors = make_selectors(tier_names)
+    os.makedirs(args.output_dir, exist_ok=True)
+    checkpoint_file = os.path.join(args.output_dir, CHECKPOINT_FILE)
+    position = None
+    parsed = 0
+    if args.resume:
+        try:
+            restored = load_checkpoint(checkpoint_file, args.source,
+                                       args.limit, selectors)
+        except ValueError as e:
+            print(f"ERROR: {e}")
+            return 1
+        if restored is None:
+            print(f"No checkpoint in {args.output_dir}, starting from the top")
+        else:
+            selectors, position, parsed = restored
+            print(f"Resuming after row {position['rows']} "
+                  f"({parsed} puzzles parsed so far)")
+
+    def on_checkpoint(position, parsed):
+        save_checkpoint(checkpoint_file, args.source, args.limit, selectors,
+                        position, parsed)
+
+    if args.checkpoint_every <= 0:
+        on_checkpoint = None
+
+    print(f"Scanning {args.source} for tiers: {', '.join(tier_names)}")
+
+    try:
+        parsed = scan(args.source, selectors, limit=args.limit,
+                      position=position, parsed=parsed,
+                      on_checkpoint=on_checkpoint,
+                      checkpoint_every=args.checkpoint_every)
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+        if on_checkpoint is not None and os.path.exists(checkpoint_file):
+            print(f"Run again with --resume to continue from {checkpoint_file}")
+        return 1
+
+    print(f"Parsed {parsed} puzzles in a single pass")
+
+    for selector in selectors:
+        save_tier(selector, args.output_dir)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Profile the whole Lichess puzzle dump in one streaming pass.
+
+Quotas and filter thresholds (PuzzleSelector tiers, MIN_POPULARITY, ...)
+are easier to pick with the distribution of the full dump at hand, not just
+the 10k puzzles an import keeps. This reads every row once and keeps only
+fixed-size summaries, so memory does not grow with the dump:
+
+  - rating, rating deviation and popularity: exact histograms (the values
+    are small integers, a few thousand distinct at most), hence exact
+    quantiles
+  - plays: histogram over values rounded down to three significant digits,
+    so quantiles are at most 1% low (1009 becomes 1000)
+  - themes and opening tags: exact counters (the tag vocabularies have a
+    few dozen and a few thousand entries)
+  - rating x theme: per-theme histogram over rating bands
+
+Usage:
+  python scripts/dump_stats.py [--source URL_OR_FILE] [--limit ROWS]
+      [--band-width 100] [--output build/dump_stats.json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter, defaultdict
+
+from lichess_dump import LICHESS_DB_URL, iter_dump_puzzles
+
+OUTPUT_FILE = 'build/dump_stats.json'
+BAND_WIDTH = 100
+QUANTILES = [0.01, 0.05, 0.1, 0.25, 0.5, 0.75, 0.9, 0.95, 0.99]
+
+
+def three_digits(value):
+    """Round a non-negative integer down to three significant digits."""
+    if value < 1000:
+        return value
+    scale = 10 ** (len(str(value)) - 3)
+    return value // scale * scale
+
+
+class Histogram:
+    """
+    Counts of integer values, optionally coarsened by `bucket`.
+
+    Args:
+        bucket: Function mapping a value to its bucket's lower bound
+    """
+
+    def __init__(self, bucket=None):
+        self.bucket = bucket
+        self.counts = Counter()
+        self.total = 0
+        self.sum = 0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        self.counts[self.bucket(value) if self.bucket else value] += 1
+        self.total += 1
+        self.sum += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def quantiles(self, qs=QUANTILES):
+        """Return {q: value} using the lower bound of each bucket."""
+        result = {}
+        if not self.total:
+            return result
+        targets = sorted(qs)
+        seen = 0
+        t = 0
+        for value in sorted(self.counts):
+            seen += self.counts[value]
+            while t < len(targets) and seen >= targets[t] * self.total:
+                result[targets[t]] = value
+                t += 1
+            if t == len(targets):
+                break
+        return result
+
+    def summary(self):
+        if not self.total:
+            return {'count': 0}
+        return {
+            'count': self.total,
+            'min': self.min,
+            'max': self.max,
+            'mean': round(self.sum / self.total, 2),
+            'quantiles': {f'p{round(q * 100)}': v
+                          for q, v in self.quantiles().items()},
+        }
+
+
+class DumpStats:
+    """Streaming summaries of parsed dump puzzles."""
+
+    def __init__(self, band_width=BAND_WIDTH):
+        self.band_width = band_width
+        self.rating = Histogram()
+        self.rating_deviation = Histogram()
+        self.popularity = Histogram()
+        self.nb_plays = Histogram(bucket=three_digits)
+        self.themes = Counter()
+        self.openings = Counter()
+        self.theme_bands = defaultdict(Counter)
+        self.solver_moves = Counter()
+
+    def add(self, puzzle):
+        rating = puzzle['rating']
+        self.rating.add(rating)
+        self.rating_deviation.add(puzzle['rating_deviation'])
+        self.popularity.add(puzzle['popularity'])
+        self.nb_plays.add(max(puzzle['nb_plays'], 0))
+        self.solver_moves[len(puzzle['moves'].split()) // 2] += 1
+
+        band = rating // self.band_width * self.band_width
+        themes = puzzle['themes'].split()
+        self.themes.update(themes)
+        for theme in themes:
+            self.theme_bands[theme][band] += 1
+        self.openings.update(puzzle['opening_tags'].split())
+
+    def report(self):
+        bands = sorted({band for counts in self.theme_bands.values()
+                        for band in counts})
+        return {
+            'puzzles': self.rating.total,
+            'rating': self.rating.summary(),
+            'rating_deviation': self.rating_deviation.summary(),
+            'popularity': self.popularity.summary(),
+            'nb_plays': self.nb_plays.summary(),
+            'solver_moves': dict(sorted(self.solver_moves.items())),
+            'themes': dict(self.themes.most_common()),
+            'openings': {
+                'distinct': len(self.openings),
+                'tagged': dict(self.openings.most_common()),
+            },
+            'rating_by_theme': {
+                'band_width': self.band_width,
+                'bands': bands,
+                'counts': {theme: [counts.get(band, 0) for band in bands]
+                           for theme, counts in sorted(self.theme_bands.items())},
+            },
+        }
+
+
+def print_summary(report):
+    print(f"\nPuzzles: {report['puzzles']}")
+    for field in ('rating', 'rating_deviation', 'popularity', 'nb_plays'):
+        stats = report[field]
+        if not stats['count']:
+            continue
+        q = stats['quantiles']
+        print(f"  {field}: min {stats['min']}, p10 {q['p10']}, "
+              f"p50 {q['p50']}, p90 {q['p90']}, max {stats['max']}, "
+              f"mean {stats['mean']}")
+    top = list(report['themes'].items())[:10]
+    print(f"  Themes: {len(report['themes'])} distinct, top: "
+          f"{', '.join(f'{t}({c})' for t, c in top)}")
+    print(f"  Openings: {report['openings']['distinct']} distinct tags")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Profile the Lichess puzzle dump in one streaming pass')
+    parser.add_argument('--source', default=LICHESS_DB_URL,
+                        help='dump URL, .csv.zst or .csv file '
+                             '(default: official Lichess dump)')
+    parser.add_argument('--limit', type=int, default=None,
+                        help='stop after this many dump rows')
+    parser.add_argument('--band-width', type=int, default=BAND_WIDTH,
+                        help=f'rating band width for the rating x theme '
+                             f'histogram (default: {BAND_WIDTH})')
+    parser.add_argument('--output', default=OUTPUT_FILE,
+                        help=f'JSON report (default: {OUTPUT_FILE})')
+    args = parser.parse_args()
+
+    stats = DumpStats(band_width=args.band_width)
+    print(f"Profiling {args.source}...")
+    start = time.perf_counter()
+    try:
+        for puzzle in iter_dump_puzzles(args.source, limit=args.limit):
+            stats.add(puzzle)
+    except (OSError, RuntimeError) as e:
+        print(f"ERROR: {e}")
+        return 1
+    elapsed = time.perf_counter() - start
+
+    report = stats.report()
+    report['source'] = args.source
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    print_summary(report)
+    print(f"\n✓ Profiled {report['puzzles']} puzzles in {elapsed:.1f}s "
+          f"-> {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
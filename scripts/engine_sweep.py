@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Headless engine-config sweep over EPD position suites.
+
+lib/main_sweep.dart compares depth/MultiPV/Threads settings by running one
+24-ply game through StockfishService on a device. This runs the same config
+matrix against a local UCI engine over whole suites (see
+build_bench_suites.py), spreading positions over a pool of engine processes.
+
+For each config it reports:
+
+  - wall time for the suite and mean time per position
+  - nodes searched and nodes/sec (per engine and for the whole pool)
+  - best-move and eval agreement with the reference config (the first one)
+  - how often the engine found the suite's `bm` move, when the EPD has one
+
+Each config gets its own pool of cores // threads engines, so multi-threaded
+configs are measured with the same total CPU as single-threaded ones.
+
+Usage:
+  python scripts/engine_sweep.py --engine /usr/bin/stockfish
+      [--suite build/bench_suites/suite_500.epd] [--configs d15/mpv3/t1,...]
+      [--cores N] [--hash MB] [--limit N] [--output build/engine_sweep]
+"""
+
+import argparse
+import csv
+import json
+import os
+import re
+import shlex
+import statistics
+import sys
+import time
+
+from uci_engine import EnginePool, UciError, score_value
+
+SUITE_FILE = 'build/bench_suites/suite_500.epd'
+OUTPUT_BASE = 'build/engine_sweep'
+
+# Same matrix as lib/main_sweep.dart; the first entry is the reference
+CONFIGS = [
+    ('REF d15/mpv3/t1', 15, 3, 1),  # what ships today
+    ('d15/mpv1/t1', 15, 1, 1),
+    ('d12/mpv1/t1', 12, 1, 1),
+    ('d12/mpv1/t4', 12, 1, 4),
+    ('d12/mpv2/t4', 12, 2, 4),
+    ('d10/mpv1/t4', 10, 1, 4),
+]
+
+CONFIG_PATTERN = re.compile(r'^d(\d+)/mpv(\d+)/t(\d+)$')
+
+# Mate scores are clamped before averaging eval differences
+EVAL_CLAMP = 2000
+
+CSV_FIELDS = ['config', 'depth', 'multipv', 'threads', 'workers', 'positions',
+              'errors', 'wall_s', 'mean_ms', 'nodes', 'nps_engine',
+              'nps_pool', 'bestmove_agreement', 'mean_eval_diff',
+              'bm_found']
+
+
+def parse_configs(text):
+    """
+    Parse 'd15/mpv3/t1,d12/mpv1/t4' into config tuples. The first config is
+    the reference.
+    """
+    configs = []
+    for i, part in enumerate(p.strip() for p in text.split(',') if p.strip()):
+        match = CONFIG_PATTERN.match(part)
+        if not match:
+            raise ValueError(f'Bad config {part!r}, expected dN/mpvN/tN')
+        depth, multipv, threads = map(int, match.groups())
+        configs.append(('REF ' + part if i == 0 else part,
+                        depth, multipv, threads))
+    return configs
+
+
+def parse_epd(line):
+    """
+    Split an EPD line into a FEN and its opcodes.
+
+    Plain FEN lines are accepted too. Only the opcodes used here are kept:
+    id and c1 (the UCI best move written by build_bench_suites.py).
+
+    Returns:
+        Position dict (fen, id, bm_uci) or None for blank or malformed lines
+    """
+    line = line.strip()
+    if not line or line.startswith('#'):
+        return None
+
+    fields = line.split(None, 4)
+    rest = fields[4] if len(fields) > 4 else ''
+    if len(fields) < 4:
+        return None
+    if re.match(r'^\d+ \d+$', rest.strip()):
+        # Full FEN with move counters, no opcodes
+        return {'fen': line, 'id': None, 'bm_uci': None}
+
+    position = {'fen': ' '.join(fields[:4]) + ' 0 1', 'id': None,
+                'bm_uci': None}
+    for op in rest.split(';'):
+        op = op.strip()
+        if not op:
+            continue
+        name, _, value = op.partition(' ')
+        value = value.strip().strip('"')
+        if name == 'id':
+            position['id'] = value
+        elif name == 'c1':
+            position['bm_uci'] = value
+    return position
+
+
+def load_suite(path, limit=None):
+    positions = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            position = parse_epd(line)
+            if position is None:
+                continue
+            if position['id'] is None:
+                position['id'] = f'pos-{len(positions) + 1}'
+            positions.append(position)
+            if limit and len(positions) >= limit:
+                break
+    return positions
+
+
+def search_position(engine, task):
+    """
+    Search one position for one config. Runs inside a pool worker.
+
+    Returns:
+        Result dict with best move, score, nodes and search time
+    """
+    position, depth, multipv = task
+    result = {'id': position['id']}
+    try:
+        engine.new_game()
+        start = time.perf_counter()
+        analysis = engine.analyse(position['fen'], multipv=multipv,
+                                  depth=depth)
+        result['ms'] = (time.perf_counter() - start) * 1000
+    except UciError as e:
+        result['error'] = str(e)
+        return result
+
+    lines = analysis['lines']
+    result['bestmove'] = analysis['bestmove'] or (
+        lines[0]['pv'][0] if lines and lines[0]['pv'] else None)
+    result['score'] = score_value(lines[0]['score']) if lines else None
+    result['nodes'] = analysis['nodes']
+    result['depth'] = analysis['depth']
+    return result
+
+
+def run_config(engine_command, config, positions, cores, hash_mb):
+    """
+    Run a suite under one config on its own engine pool.
+
+    Returns:
+        (results in suite order, wall seconds, worker count)
+    """
+    name, depth, multipv, threads = config
+    workers = max(1, cores // threads)
+    options = {'Threads': threads, 'Hash': hash_mb}
+
+    start = time.perf_counter()
+    results = []
+    with EnginePool(engine_command, workers=workers, options=options) as pool:
+        tasks = ((position, depth, multipv) for position in positions)
+        for i, result in enumerate(pool.imap(search_position, tasks), start=1):
+            results.append(result)
+            if i % 50 == 0:
+                print(f"  {name}: {i}/{len(positions)}...", end='\r')
+    return results, time.perf_counter() - start, workers
+
+
+def clamp(value):
+    return max(-EVAL_CLAMP, min(EVAL_CLAMP, value))
+
+
+def summarize(config, results, wall, workers, positions, reference):
+    """
+    Aggregate one config's results, comparing against the reference results.
+
+    Returns:
+        Summary dict with the CSV_FIELDS keys
+    """
+    name, depth, multipv, threads = config
+    done = [r for r in results if 'error' not in r]
+    nodes = sum(r['nodes'] for r in done)
+    search_s = sum(r['ms'] for r in done) / 1000
+
+    agree = compared = 0
+    eval_diffs = []
+    for result, ref in zip(results, reference):
+        if 'error' in result or 'error' in ref:
+            continue
+        compared += 1
+        agree += result['bestmove'] == ref['bestmove']
+        if result['score'] is not None and ref['score'] is not None:
+            eval_diffs.append(abs(clamp(result['score']) - clamp(ref['score'])))
+
+    found = with_bm = 0
+    for result, position in zip(results, positions):
+        if position['bm_uci'] and 'error' not in result:
+            with_bm += 1
+            found += result['bestmove'] == position['bm_uci']
+
+    return {
+        'config': name,
+        'depth': depth,
+        'multipv': multipv,
+        'threads': threads,
+        'workers': workers,
+        'positions': len(done),
+        'errors': len(results) - len(done),
+        'wall_s': round(wall, 3),
+        'mean_ms': round(statistics.mean(r['ms'] for r in done), 1) if done else None,
+        'nodes': nodes,
+        'nps_engine': round(nodes / search_s) if search_s else None,
+        'nps_pool': round(nodes / wall) if wall else None,
+        'bestmove_agreement': round(agree / compared, 4) if compared else None,
+        'mean_eval_diff': round(statistics.mean(eval_diffs), 1) if eval_diffs else None,
+        'bm_found': round(found / with_bm, 4) if with_bm else None,
+    }
+
+
+def write_outputs(output_base, summaries, settings, per_position):
+    os.makedirs(os.path.dirname(output_base) or '.', exist_ok=True)
+    with open(output_base + '.csv', 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+        writer.writerows(summaries)
+    with open(output_base + '.json', 'w', encoding='utf-8') as f:
+        json.dump({'settings': settings, 'configs': summaries,
+                   'positions': per_position}, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Sweep engine depth/MultiPV/Threads configs over a suite')
+    parser.add_argument('--engine', required=True,
+                        help='engine command, e.g. /usr/bin/stockfish')
+    parser.add_argument('--suite', default=SUITE_FILE,
+                        help=f'EPD or FEN-per-line file (default: {SUITE_FILE})')
+    parser.add_argument('--configs', default=None,
+                        help='comma-separated dN/mpvN/tN configs, reference '
+                             'first (default: the lib/main_sweep.dart matrix)')
+    parser.add_argument('--cores', type=int, default=None,
+                        help='CPU cores to fill per config (default: all)')
+    parser.add_argument('--hash', type=int, default=16,
+                        help='engine hash size in MB (default: 16)')
+    parser.add_argument('--limit', type=int, default=None,
+                        help='only use the first N positions')
+    parser.add_argument('--output', default=OUTPUT_BASE,
+                        help=f'output path without extension; writes .csv '
+                             f'and .json (default: {OUTPUT_BASE})')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.suite):
+        print(f"ERROR: Suite not found: {args.suite}")
+        print("Build one with: python scripts/build_bench_suites.py")
+        return 1
+
+    try:
+        configs = parse_configs(args.configs) if args.configs else CONFIGS
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        return 1
+
+    positions = load_suite(args.suite, args.limit)
+    if not positions:
+        print(f"ERROR: No positions in {args.suite}")
+        return 1
+
+    cores = args.cores or os.cpu_count() or 1
+    command = shlex.split(args.engine)
+    print(f"Sweeping {len(configs)} configs over {len(positions)} positions "
+          f"from {args.suite} on {cores} cores...")
+
+    summaries = []
+    per_position = {}
+    reference = None
+    for config in configs:
+        results, wall, workers = run_config(command, config, positions,
+                                            cores, args.hash)
+        if reference is None:
+            reference = results
+        summary = summarize(config, results, wall, workers, positions,
+                            reference)
+        summaries.append(summary)
+        per_position[config[0]] = results
+
+        agreement = summary['bestmove_agreement']
+        print(f"✓ {config[0]:<16} {summary['wall_s']:>8.1f}s  "
+              f"{summary['mean_ms'] or 0:>7.1f} ms/pos  "
+              f"{summary['nps_pool'] or 0:>10} nps  "
+              f"agree {100 * (agreement or 0):5.1f}%  "
+              f"workers {workers}" + (f"  errors {summary['errors']}"
+                                      if summary['errors'] else ''))
+
+    settings = {
+        'engine': args.engine,
+        'suite': args.suite,
+        'positions': len(positions),
+        'cores': cores,
+        'hash': args.hash,
+    }
+    write_outputs(args.output, summaries, settings, per_position)
+    print(f"\n  Results: {args.output}.csv, {args.output}.json")
+
+    return 0 if all(s['errors'] == 0 for s in summaries) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+External merge sort for puzzle streams larger than memory.
+
+The save functions in the other scripts sort in memory, which is fine for a
+10k selection but not for ordering the whole 4M-row dump. This sorts any
+puzzle stream under a memory cap: records are buffered until the cap is
+reached, each buffer is sorted and spilled to a temporary run file, and the
+runs are k-way merged (in several passes if there are too many to open at
+once).
+
+Usage:
+  python scripts/external_sort.py INPUT OUTPUT [--key rating|popularity|theme]
+                                  [--max-memory 256M] [--tmp-dir DIR]
+                                  [--shard-size N]
+
+INPUT is a dump URL, .csv.zst or .csv file, a .jsonl file of puzzles, or a
+puzzles.json-style array (.json, loaded whole). The theme order groups
+puzzles by their primary motif (build_puzzle_tables.primary_motif), not by
+generic tags such as 'advantage' or 'crushing'.
+OUTPUT is a .jsonl file; with --shard-size it is a name prefix for numbered
+shards (OUTPUT_0000.jsonl, OUTPUT_0001.jsonl, ...).
+"""
+
+import argparse
+import heapq
+import json
+import os
+import re
+import sys
+import tempfile
+
+from build_puzzle_tables import primary_motif
+from lichess_dump import iter_dump_puzzles
+
+DEFAULT_MAX_MEMORY = 256 * 1024 * 1024
+
+# Rough per-record cost of a buffered (key, line) pair on top of the line
+RECORD_OVERHEAD = 200
+
+# Maximum number of run files merged at once
+MAX_FAN_IN = 64
+
+
+def _puzzle_id(puzzle):
+    return puzzle.get('lichess_id') or str(puzzle.get('id', ''))
+
+
+SORT_KEYS = {
+    'rating': lambda p: (p['rating'], _puzzle_id(p)),
+    'popularity': lambda p: (-p['popularity'], p['rating'], _puzzle_id(p)),
+    'theme': lambda p: (primary_motif(p.get('themes')), p['rating'],
+                        _puzzle_id(p)),
+}
+
+
+def parse_memory(value):
+    """Parse a size like '512M', '2G' or '1048576' into bytes."""
+    match = re.fullmatch(r'\s*(\d+)\s*([KMG]?)B?\s*', value.upper())
+    if not match:
+        raise ValueError(f'Invalid memory size: {value}')
+    number, unit = match.groups()
+    return int(number) * {'': 1, 'K': 1024, 'M': 1024 ** 2,
+                          'G': 1024 ** 3}[unit]
+
+
+def _write_run(buffer, tmp_dir):
+    """Sort a buffer of (key, line) pairs and write it as a run file."""
+    buffer.sort(key=lambda item: item[0])
+    fd, path = tempfile.mkstemp(prefix='run_', suffix='.jsonl', dir=tmp_dir)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        for key, line in buffer:
+            f.write(json.dumps(key))
+            f.write('\t')
+            f.write(line)
+            f.write('\n')
+    return path
+
+
+def _read_run(path):
+    """Yield (key, line) pairs from a run file."""
+    with open(path, 'r', encoding='utf-8') as f:
+        for row in f:
+            key, line = row.rstrip('\n').split('\t', 1)
+            yield json.loads(key), line
+
+
+def _merge_runs(paths, tmp_dir):
+    """Merge several run files into one new run file."""
+    fd, path = tempfile.mkstemp(prefix='merge_', suffix='.jsonl', dir=tmp_dir)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        for key, line in heapq.merge(*(_read_run(p) for p in paths),
+                                     key=lambda item: item[0]):
+            f.write(json.dumps(key))
+            f.write('\t')
+            f.write(line)
+            f.write('\n')
+    for p in paths:
+        os.remove(p)
+    return path
+
+
+def external_sort(records, key='rating', max_memory=DEFAULT_MAX_MEMORY,
+                  tmp_dir=None):
+    """
+    Sort a stream of puzzle dicts without holding it all in memory.
+
+    Args:
+        records: Iterable of puzzle dicts
+        key: Name of a SORT_KEYS entry
+        max_memory: Approximate buffer budget in bytes
+        tmp_dir: Directory for run files (default: system temp dir)
+
+    Yields:
+        Puzzle dicts in sorted order. Equal keys keep their input order.
+    """
+    key_fn = SORT_KEYS[key]
+    work_dir = tempfile.mkdtemp(prefix='puzzle_sort_', dir=tmp_dir)
+    runs = []
+    buffer = []
+    buffered_bytes = 0
+
+    try:
+        for seq, record in enumerate(records):
+            line = json.dumps(record, separators=(',', ':'),
+                              ensure_ascii=False)
+            # The sequence number makes the sort stable across runs
+            buffer.append((list(key_fn(record)) + [seq], line))
+            buffered_bytes += len(line) + RECORD_OVERHEAD
+            if buffered_bytes >= max_memory:
+                runs.append(_write_run(buffer, work_dir))
+                buffer = []
+                buffered_bytes = 0
+
+        if not runs:
+            # Everything fit in memory
+            buffer.sort(key=lambda item: item[0])
+            for _, line in buffer:
+                yield json.loads(line)
+            return
+
+        if buffer:
+            runs.append(_write_run(buffer, work_dir))
+            buffer = []
+
+        print(f"  Spilled {len(runs)} sorted runs, merging...")
+        while len(runs) > MAX_FAN_IN:
+            runs = [_merge_runs(runs[i:i + MAX_FAN_IN], work_dir)
+                    for i in range(0, len(runs), MAX_FAN_IN)]
+
+        for _, line in heapq.merge(*(_read_run(p) for p in runs),
+                                   key=lambda item: item[0]):
+            yield json.loads(line)
+    finally:
+        for name in os.listdir(work_dir):
+            os.remove(os.path.join(work_dir, name))
+        os.rmdir(work_dir)
+
+
+def iter_input(path):
+    """Yield puzzle dicts from a .jsonl or .json file, or any dump source."""
+    if path.endswith('.jsonl'):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    elif path.endswith('.json'):
+        with open(path, 'r', encoding='utf-8') as f:
+            puzzles = json.load(f)
+        if not isinstance(puzzles, list):
+            raise ValueError(f'{path} is not a puzzles.json-style array')
+        yield from puzzles
+    else:
+        yield from iter_dump_puzzles(path)
+
+
+def write_output(records, output, shard_size=None):
+    """
+    Write sorted records as JSONL, optionally split into fixed-size shards.
+
+    Returns:
+        (records written, list of files written)
+    """
+    if shard_size is None:
+        count = 0
+        with open(output, 'w', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, separators=(',', ':'),
+                                   ensure_ascii=False))
+                f.write('\n')
+                count += 1
+        return count, [output]
+
+    prefix = output[:-len('.jsonl')] if output.endswith('.jsonl') else output
+    files = []
+    count = 0
+    f = None
+    try:
+        for record in records:
+            if count % shard_size == 0:
+                if f is not None:
+                    f.close()
+                files.append(f'{prefix}_{len(files):04d}.jsonl')
+                f = open(files[-1], 'w', encoding='utf-8')
+            f.write(json.dumps(record, separators=(',', ':'),
+                               ensure_ascii=False))
+            f.write('\n')
+            count += 1
+    finally:
+        if f is not None:
+            f.close()
+    return count, files
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Sort a puzzle stream under a memory cap')
+    parser.add_argument('input', help='dump URL, .csv.zst, .csv or .jsonl')
+    parser.add_argument('output', help='output .jsonl file (or shard prefix)')
+    parser.add_argument('--key', choices=sorted(SORT_KEYS), default='rating',
+                        help='sort order (default: rating)')
+    parser.add_argument('--max-memory', default='256M',
+                        help='buffer budget before spilling a run '
+                             '(default: 256M)')
+    parser.add_argument('--tmp-dir', default=None,
+                        help='directory for run files '
+                             '(default: system temp dir)')
+    parser.add_argument('--shard-size', type=int, default=None,
+                        help='split output into shards of N records')
+    args = parser.parse_args()
+
+    try:
+        max_memory = parse_memory(args.max_memory)
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        return 1
+
+    print(f"Sorting {args.input} by {args.key} "
+          f"(memory cap {max_memory / (1024 * 1024):.1f} MB)...")
+
+    try:
+        records = external_sort(iter_input(args.input), key=args.key,
+                                max_memory=max_memory, tmp_dir=args.tmp_dir)
+        count, files = write_output(records, args.output, args.shard_size)
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+        return 1
+
+    print(f"✓ Wrote {count} sorted puzzles to {len(files)} file(s)")
+    if len(files) > 1:
+        print(f"  {files[0]} ... {files[-1]}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,379 @@
+"""
+Streaming access to the Lichess puzzle database dump.
+
+Shared by the build scripts that scan the dump. Opens a local .csv or
+.csv.zst file or the official URL as a text stream and parses rows into
+puzzle dicts without ever holding the whole dump in memory. DumpReader does
+the same for long scans that checkpoint and resume.
+
+Source: https://database.lichess.org/#puzzles
+Format: CSV with fields: PuzzleId,FEN,Moves,Rating,RatingDeviation,Popularity,NbPlays,Themes,GameUrl,OpeningTags
+"""
+
+import csv
+import io
+import os
+import sys
+
+try:
+    import requests
+except ImportError:
+    requests = None
+
+try:
+    import zstandard as zstd
+except ImportError:
+    zstd = None
+
+LICHESS_DB_URL = 'https://database.lichess.org/lichess_db_puzzle.csv.zst'
+
+CSV_COLUMNS = ['PuzzleId', 'FEN', 'Moves', 'Rating', 'RatingDeviation',
+               'Popularity', 'NbPlays', 'Themes', 'GameUrl', 'OpeningTags']
+
+# Lichess puzzle IDs are short base-62 strings
+ID_ALPHABET = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+
+LICHESS_URL = 'https://lichess.org/'
+
+# Compressed bytes read at a time by DumpReader
+CHUNK_SIZE = 1 << 20
+
+
+def lichess_numeric_id(puzzle_id):
+    """
+    Convert a Lichess puzzle ID to a stable integer ID.
+
+    Unlike hash(), which is salted per process, this gives the same number on
+    every run, so IDs survive rebuilds. Five-character IDs stay below 10**9.
+    """
+    value = 0
+    for ch in puzzle_id:
+        value = value * 62 + ID_ALPHABET.index(ch)
+    return value
+
+
+def compact_game_ref(game_url):
+    """
+    Shorten a GameUrl to 'gameId#ply'.
+
+    'https://lichess.org/787zsVup/black#48' becomes '787zsVup#48'. The host
+    is always the same and the colour segment only picks the board
+    orientation, which the puzzle FEN already implies.
+    """
+    if not game_url:
+        return ''
+    ref = game_url[len(LICHESS_URL):] if game_url.startswith(LICHESS_URL) else game_url
+    path, _, ply = ref.partition('#')
+    game_id = path.split('/', 1)[0]
+    return f'{game_id}#{ply}' if ply else game_id
+
+
+def expand_game_ref(ref):
+    """Turn a compact_game_ref() value back into a Lichess URL."""
+    return LICHESS_URL + ref if ref else ''
+
+
+def open_dump(source):
+    """
+    Open a dump as a text stream.
+
+    Args:
+        source: http(s) URL, path to a .csv.zst file, or path to a .csv file
+
+    Returns:
+        Text file object yielding CSV lines
+    """
+    if source.startswith(('http://', 'https://')):
+        if requests is None or zstd is None:
+            raise RuntimeError('Streaming the dump needs requests and '
+                               'zstandard: pip install requests zstandard')
+        response = requests.get(source, stream=True)
+        response.raise_for_status()
+        raw = zstd.ZstdDecompressor().stream_reader(response.raw)
+        return io.TextIOWrapper(raw, encoding='utf-8', newline='')
+
+    if source.endswith('.zst'):
+        if zstd is None:
+            raise RuntimeError('Reading .zst dumps needs zstandard: '
+                               'pip install zstandard')
+        raw = zstd.ZstdDecompressor().stream_reader(open(source, 'rb'),
+                                                    closefd=True)
+        return io.TextIOWrapper(raw, encoding='utf-8', newline='')
+
+    return open(source, 'r', encoding='utf-8', newline='')
+
+
+def iter_dump_rows(source, limit=None):
+    """
+    Yield raw CSV rows (lists of strings) from a dump, skipping the header.
+
+    Args:
+        source: See open_dump()
+        limit: Stop after this many data rows (None for the whole dump)
+    """
+    with open_dump(source) as stream:
+        count = 0
+        for row in csv.reader(stream):
+            if count == 0 and row and row[0] == 'PuzzleId':
+                continue
+            if limit is not None and count >= limit:
+                break
+            count += 1
+            yield row
+
+
+def _is_url(source):
+    return source.startswith(('http://', 'https://'))
+
+
+def _open_raw(source, offset, version):
+    """
+    Open the undecoded bytes of a dump at a byte offset.
+
+    Returns:
+        (binary file object, version string identifying the dump contents)
+    """
+    if _is_url(source):
+        if requests is None or zstd is None:
+            raise RuntimeError('Streaming the dump needs requests and '
+                               'zstandard: pip install requests zstandard')
+        headers = {}
+        if offset:
+            headers['Range'] = f'bytes={offset}-'
+            if version:
+                # The server answers 200 with the whole file if it changed
+                headers['If-Range'] = version
+        response = requests.get(source, stream=True, headers=headers)
+        response.raise_for_status()
+        if offset and response.status_code != 206:
+            response.close()
+            raise RuntimeError(f'{source} changed since the checkpoint or '
+                               f'does not support range requests')
+        current = (response.headers.get('ETag')
+                   or response.headers.get('Last-Modified') or '')
+        return response.raw, current
+
+    stat = os.stat(source)
+    current = f'{stat.st_size}:{stat.st_mtime_ns}'
+    if version and version != current:
+        raise RuntimeError(f'{source} changed since the checkpoint')
+    f = open(source, 'rb')
+    f.seek(offset)
+    return f, current
+
+
+def _iter_frames(raw, offset):
+    """
+    Decompress a .zst stream one frame at a time.
+
+    Yields:
+        (compressed offset of the frame, decompressed bytes) pairs; a frame
+        usually spans several pairs
+    """
+    dctx = zstd.ZstdDecompressor()
+    dobj = dctx.decompressobj()
+    fed = 0
+    while True:
+        data = raw.read(CHUNK_SIZE)
+        if not data:
+            break
+        while data:
+            out = dobj.decompress(data)
+            fed += len(data)
+            if out:
+                yield offset, out
+            if not dobj.eof:
+                break
+            data = dobj.unused_data
+            offset += fed - len(data)
+            fed = 0
+            dobj = dctx.decompressobj()
+    if fed:
+        raise RuntimeError('Dump ends in the middle of a zstd frame')
+
+
+class DumpReader:
+    """
+    Yield raw CSV rows from a dump, like iter_dump_rows(), with a position
+    that a later run can resume from.
+
+    position() describes the point after the last row yielded:
+
+      offset   compressed byte offset of the zstd frame holding the next row
+               (a plain byte offset for .csv dumps)
+      skip     decompressed bytes of that frame before the next row
+      rows     data rows yielded so far
+      version  size and mtime of a local dump, or the ETag of a URL, so a
+               resume never continues into a different dump
+
+    DumpReader(source, position) seeks to the frame (with a range request
+    for URLs) and discards `skip` bytes without parsing them, then yields
+    the same rows an uninterrupted reader would have. How much has to be
+    decompressed again depends on the frame size: multi-frame dumps (e.g.
+    from pzstd) resume almost instantly, a single-frame dump is decompressed
+    from the start but not re-parsed.
+
+    Rows are split on newlines, which the dump never quotes.
+
+    Args:
+        source: See open_dump()
+        position: A position() dict to resume from (None to start over)
+    """
+
+    def __init__(self, source, position=None):
+        position = position or {}
+        self.source = source
+        self.rows = position.get('rows', 0)
+        self.version = position.get('version')
+        self._start = (position.get('offset', 0), position.get('skip', 0))
+        self._next = self._start
+
+    def position(self):
+        offset, skip = self._next
+        return {'offset': offset, 'skip': skip, 'rows': self.rows,
+                'version': self.version}
+
+    def _iter_chunks(self):
+        offset = self._start[0]
+        raw, self.version = _open_raw(self.source, offset, self.version)
+        try:
+            if _is_url(self.source) or self.source.endswith('.zst'):
+                if zstd is None:
+                    raise RuntimeError('Reading .zst dumps needs zstandard: '
+                                       'pip install zstandard')
+                yield from _iter_frames(raw, offset)
+            else:
+                # Any byte offset of a plain file is a restart point
+                while True:
+                    data = raw.read(CHUNK_SIZE)
+                    if not data:
+                        break
+                    yield offset, data
+                    offset += len(data)
+        finally:
+            raw.close()
+
+    def __iter__(self):
+        skip = self._start[1]
+        check_header = self.rows == 0
+        frame = None
+        pos = 0
+        pending = b''
+        for chunk_frame, data in self._iter_chunks():
+            if chunk_frame != frame:
+                frame = chunk_frame
+                pos = 0
+            if skip:
+                cut = min(skip, len(data))
+                data = data[cut:]
+                pos += cut
+                skip -= cut
+            # `at` tracks where the next line starts within `frame`
+            at = pos - len(pending)
+            pos += len(data)
+            lines = data.split(b'\n')
+            if len(lines) == 1:
+                pending += data
+                continue
+            lines[0] = pending + lines[0]
+            pending = lines.pop()
+            for line, row in zip(lines, csv.reader(
+                    [line.decode('utf-8') for line in lines])):
+                at += len(line) + 1
+                self._next = (frame, at)
+                if check_header:
+                    check_header = False
+                    if row and row[0] == 'PuzzleId':
+                        continue
+                self.rows += 1
+                yield row
+        if pending:
+            self._next = (frame, pos)
+            row = next(csv.reader([pending.decode('utf-8')]))
+            if not (check_header and row and row[0] == 'PuzzleId'):
+                self.rows += 1
+                yield row
+
+
+def parse_row(row):
+    """
+    Parse one CSV row into a puzzle dict.
+
+    Returns:
+        Dict with lichess_id, fen, moves, rating, rating_deviation,
+        popularity, nb_plays, themes, game_url and opening_tags, or None if
+        the row is malformed.
+    """
+    if len(row) < 8:
+        return None
+    try:
+        puzzle = {
+            'lichess_id': row[0],
+            'fen': row[1],
+            'moves': row[2],
+            'rating': int(row[3]),
+            'rating_deviation': int(row[4]),
+            'popularity': int(row[5]),
+            'nb_plays': int(row[6]),
+            'themes': row[7],
+            'game_url': row[8] if len(row) > 8 else '',
+            'opening_tags': row[9] if len(row) > 9 else '',
+        }
+    except ValueError:
+        return None
+
+    if not puzzle['fen'] or not puzzle['moves']:
+        return None
+    return puzzle
+
+
+def iter_dump_puzzles(source, limit=None, progress_every=100000):
+    """
+    Yield parsed puzzles from a dump, printing progress as it goes.
+
+    Args:
+        source: See open_dump()
+        limit: Stop after this many data rows (None for the whole dump)
+        progress_every: Print a progress line every N rows (0 to disable)
+    """
+    scanned = 0
+    for row in iter_dump_rows(source, limit=limit):
+        scanned += 1
+        if progress_every and scanned % progress_every == 0:
+            print(f"  Scanned {scanned} rows...", end='\r')
+            sys.stdout.flush()
+        puzzle = parse_row(row)
+        if puzzle is not None:
+            yield puzzle
+    if progress_every:
+        print(f"  Scanned {scanned} rows.      ")
+
+
+def to_app_record(puzzle, opening_ids=None):
+    """
+    Convert a parsed dump puzzle to the puzzles.json schema.
+
+    Args:
+        puzzle: Dict from parse_row()
+        opening_ids: Optional opening tag -> integer ID table (see
+            opening_index.py). When given, the record also carries
+            'openings' (space-separated tag IDs) and 'game' (a compact game
+            reference), each omitted when the dump has none.
+    """
+    record = {
+        'id': lichess_numeric_id(puzzle['lichess_id']),
+        'fen': puzzle['fen'],
+        'moves': puzzle['moves'],
+        'rating': puzzle['rating'],
+        'themes': puzzle['themes'],
+        'popularity': puzzle['popularity'],
+        'lichess_id': puzzle['lichess_id'],
+    }
+    if opening_ids is not None:
+        tags = puzzle.get('opening_tags', '').split()
+        if tags:
+            record['openings'] = ' '.join(str(opening_ids[t]) for t in tags)
+        game = compact_game_ref(puzzle.get('game_url', ''))
+        if game:
+            record['game'] = game
+    return record
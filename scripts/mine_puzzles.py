@@ -0,0 +1,462 @@
+#!/usr/bin/env python3
+"""
+Mine tactical puzzles from local PGN game collections.
+
+The puzzle set otherwise comes only from the Lichess dump (generate_puzzles.py
+can only vary its 20 base positions). This streams .pgn / .pgn.zst files and
+finds puzzles in two stages:
+
+  1. Pre-filter (process pool, no engine): replay each game's mainline and
+     flag moves that hang material - the reply can capture a piece that is
+     undefended or worth more than its attacker - or, when the PGN carries
+     [%eval] comments, moves after which the eval swings by --swing
+     centipawns or more against the player who moved.
+  2. Confirmation (UCI engine pool): from the position after the flagged
+     move, the side to move must have a single winning move (clearly ahead
+     of the second-best line). The solution is extended with the engine's
+     best defence and the solver's next move for as long as the solver's
+     move stays unique, up to --max-solver-moves.
+
+Puzzles use the app schema with the flagged move as moves[0], the
+opponent's setup move:
+
+  {"id": ..., "fen": ..., "moves": "setup solver reply solver ...",
+   "rating": ..., "themes": "...", "popularity": 0}
+
+Ratings are a provisional estimate from solution length and move type, and
+popularity is 0 until the puzzles have been played.
+
+Progress is checkpointed after every batch of game chunks, so an
+interrupted run continues with --resume and produces the same output as an
+uninterrupted one. --shard K/N processes every Nth chunk, so several
+machines can split one collection.
+
+Requires python-chess (pip install chess); .zst input also needs zstandard.
+
+Usage:
+  python scripts/mine_puzzles.py GAMES.pgn[.zst] [MORE.pgn ...]
+      --engine /usr/bin/stockfish [--output build/mined_puzzles.jsonl]
+      [--workers N] [--nodes N] [--resume] [--shard K/N] [--json FILE]
+"""
+
+import argparse
+import io
+import json
+import os
+import shlex
+import sys
+import time
+from multiprocessing import Pool
+
+try:
+    import chess
+    import chess.pgn
+except ImportError:
+    chess = None
+
+from build_bench_suites import phase_of
+from build_opening_book import GAMES_PER_CHUNK, iter_game_chunks
+from uci_engine import MATE_SCORE, EnginePool, UciError, score_value
+
+OUTPUT_FILE = 'build/mined_puzzles.jsonl'
+
+# Mined ids sit above the Lichess id range (base-62, at most 62^5)
+MINED_ID_BASE = 10 ** 10
+
+PIECE_VALUES = {1: 1, 2: 3, 3: 3, 4: 5, 5: 9, 6: 0}  # indexed by chess piece type
+
+DEFAULT_MIN_PLY = 10
+DEFAULT_SWING = 200
+DEFAULT_MAX_CANDIDATES = 3
+DEFAULT_NODES = 500000
+DEFAULT_WIN_CP = 300
+DEFAULT_MIN_GAP = 200
+DEFAULT_MAX_SOLVER_MOVES = 4
+CHUNKS_PER_BATCH = 16
+
+
+def hanging_capture(board):
+    """
+    Find a capture for the side to move that wins material outright: the
+    target is undefended, or worth more than the cheapest attacker.
+
+    Returns:
+        The capture move, or None
+    """
+    best = None
+    best_gain = 0
+    for move in board.generate_legal_captures():
+        target = board.piece_at(move.to_square)
+        if target is None:  # en passant
+            continue
+        gain = PIECE_VALUES[target.piece_type]
+        if gain < 3:
+            continue
+        attacker = PIECE_VALUES[board.piece_type_at(move.from_square)]
+        defended = board.is_attacked_by(not board.turn, move.to_square)
+        if defended:
+            gain -= attacker
+        if gain >= 2 and gain > best_gain:
+            best, best_gain = move, gain
+    return best
+
+
+def eval_cp(node):
+    """White-POV centipawn eval from a [%eval] comment, or None."""
+    score = node.eval()
+    if score is None:
+        return None
+    return score.white().score(mate_score=MATE_SCORE)
+
+
+def find_candidates(game, min_ply, swing, max_candidates):
+    """
+    Pre-filter one game.
+
+    Returns:
+        List of candidate dicts: fen (before the flagged move), setup (the
+        flagged move), reason ('hanging' or 'swing') and source
+    """
+    candidates = []
+    site = game.headers.get('Site', '')
+    board = game.board()
+    previous_eval = eval_cp(game)
+    ply = 0
+    for node in game.mainline():
+        move = node.move
+        fen = board.fen()
+        mover = board.turn
+        board.push(move)
+        ply += 1
+
+        current_eval = eval_cp(node)
+        reason = None
+        if ply >= min_ply and not board.is_game_over():
+            if previous_eval is not None and current_eval is not None:
+                delta = current_eval - previous_eval
+                if (delta if mover == chess.BLACK else -delta) >= swing:
+                    reason = 'swing'
+            elif hanging_capture(board) is not None:
+                reason = 'hanging'
+        previous_eval = current_eval
+
+        if reason:
+            candidates.append({'fen': fen, 'setup': move.uci(),
+                               'reason': reason, 'source': f'{site}#{ply}'})
+            if len(candidates) >= max_candidates:
+                break
+    return candidates
+
+
+def prefilter_chunk(args):
+    """
+    Pool worker: pre-filter every game in a chunk of PGN text.
+
+    Returns:
+        (games read, candidates)
+    """
+    text, min_ply, swing, max_candidates = args
+    handle = io.StringIO(text)
+    games = 0
+    candidates = []
+    while True:
+        game = chess.pgn.read_game(handle)
+        if game is None:
+            break
+        games += 1
+        if game.errors:
+            continue
+        candidates.extend(find_candidates(game, min_ply, swing,
+                                          max_candidates))
+    return games, candidates
+
+
+def estimate_rating(solver_moves, first_move_quiet, mate):
+    """Provisional difficulty: longer and quieter solutions rate higher."""
+    rating = 1000 + 250 * (solver_moves - 1)
+    if first_move_quiet:
+        rating += 300
+    if mate and solver_moves == 1:
+        rating -= 200
+    return max(600, min(2800, rating))
+
+
+def confirm_candidate(engine, task):
+    """
+    Confirm a candidate with the engine and build its solution. Runs inside
+    a pool worker.
+
+    Returns:
+        Puzzle dict without an id, or None if the position is not a puzzle
+    """
+    candidate, settings = task
+    board = chess.Board(candidate['fen'])
+    board.push_uci(candidate['setup'])
+    moves = [candidate['setup']]
+
+    try:
+        engine.new_game()
+        first = None
+        for solver_move in range(settings['max_solver_moves']):
+            analysis = engine.analyse(candidate['fen'], moves, multipv=2,
+                                      nodes=settings['nodes'])
+            lines = analysis['lines']
+            if not lines or not lines[0]['pv']:
+                break
+            best = score_value(lines[0]['score'])
+            second = (score_value(lines[1]['score']) if len(lines) > 1
+                      else -MATE_SCORE)
+            if first is None:
+                if best < settings['win_cp'] or len(lines) < 2:
+                    return None
+                first = lines[0]
+            if best - second < settings['min_gap']:
+                break  # No longer a unique move; end on the last solver move
+
+            move = chess.Move.from_uci(lines[0]['pv'][0])
+            moves.append(move.uci())
+            board.push(move)
+            if board.is_game_over() or solver_move + 1 == settings['max_solver_moves']:
+                break
+
+            reply = engine.analyse(candidate['fen'], moves, multipv=1,
+                                   nodes=settings['nodes'])
+            if not reply['lines'] or not reply['lines'][0]['pv']:
+                break
+            reply_move = chess.Move.from_uci(reply['lines'][0]['pv'][0])
+            moves.append(reply_move.uci())
+            board.push(reply_move)
+    except UciError:
+        return None
+
+    if first is None or len(moves) < 2:
+        return None
+    # A solution always ends on a solver move
+    if len(moves) % 2 == 1:
+        moves.pop()
+
+    solver_moves = len(moves) // 2
+    start = chess.Board(candidate['fen'])
+    start.push_uci(moves[0])
+    first_move = chess.Move.from_uci(moves[1])
+    quiet = not (start.is_capture(first_move) or start.gives_check(first_move))
+
+    mate = 'mate' in first['score'] and first['score']['mate'] > 0
+    themes = []
+    if mate and first['score']['mate'] == solver_moves:
+        themes += ['mate', f'mateIn{solver_moves}']
+    elif score_value(first['score']) >= 600:
+        themes.append('crushing')
+    else:
+        themes.append('advantage')
+    themes.append({1: 'oneMove', 2: 'short', 3: 'long'}.get(solver_moves,
+                                                             'veryLong'))
+    if candidate['reason'] == 'hanging' and start.is_capture(first_move):
+        themes.append('hangingPiece')
+
+    puzzle = {
+        'fen': candidate['fen'],
+        'moves': ' '.join(moves),
+        'rating': estimate_rating(solver_moves, quiet, mate),
+        'themes': ' '.join(themes),
+        'popularity': 0,
+        'source': candidate['source'],
+    }
+    puzzle['themes'] += ' ' + phase_of(puzzle)
+    return puzzle
+
+
+def parse_shard(text):
+    index, _, count = text.partition('/')
+    index, count = int(index), int(count)
+    if not 0 <= index < count:
+        raise ValueError(f'Bad shard {text!r}, expected K/N with 0 <= K < N')
+    return index, count
+
+
+def load_checkpoint(path, inputs, shard):
+    """
+    Read a checkpoint, refusing one written for different inputs.
+
+    Returns:
+        Checkpoint dict, or None if there is none
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        checkpoint = json.load(f)
+    if checkpoint['inputs'] != inputs or checkpoint['shard'] != list(shard):
+        raise ValueError(f'{path} was written for other inputs or shard')
+    return checkpoint
+
+
+def save_checkpoint(path, checkpoint):
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(tmp, path)
+
+
+def iter_batches(paths, shard, skip_chunks, chunks_per_batch):
+    """
+    Yield (next chunk index, chunk texts) batches for this shard, skipping
+    chunks a previous run already finished.
+    """
+    index, count = shard
+    batch = []
+    position = 0
+    for position, text in enumerate(iter_game_chunks(paths, GAMES_PER_CHUNK)):
+        if position < skip_chunks or position % count != index:
+            continue
+        batch.append(text)
+        if len(batch) >= chunks_per_batch:
+            yield position + 1, batch
+            batch = []
+    if batch:
+        yield position + 1, batch
+
+
+def write_json(jsonl_file, json_file):
+    """Collect the mined JSONL into a puzzles.json-style array."""
+    with open(jsonl_file, 'r', encoding='utf-8') as f:
+        puzzles = [json.loads(line) for line in f if line.strip()]
+    for puzzle in puzzles:
+        puzzle.pop('source', None)
+    with open(json_file, 'w', encoding='utf-8') as f:
+        json.dump(puzzles, f, indent=2, ensure_ascii=False)
+    return len(puzzles)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Mine tactical puzzles from PGN game collections')
+    parser.add_argument('pgn', nargs='+', help='.pgn or .pgn.zst files')
+    parser.add_argument('--engine', required=True,
+                        help='engine command, e.g. /usr/bin/stockfish')
+    parser.add_argument('--output', default=OUTPUT_FILE,
+                        help=f'mined puzzles, one JSON per line '
+                             f'(default: {OUTPUT_FILE})')
+    parser.add_argument('--json', default=None,
+                        help='also write the puzzles as a JSON array here')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='processes per stage (default: all cores)')
+    parser.add_argument('--nodes', type=int, default=DEFAULT_NODES,
+                        help=f'engine nodes per position (default: {DEFAULT_NODES})')
+    parser.add_argument('--min-ply', type=int, default=DEFAULT_MIN_PLY,
+                        help=f'ignore the first plies of each game '
+                             f'(default: {DEFAULT_MIN_PLY})')
+    parser.add_argument('--swing', type=int, default=DEFAULT_SWING,
+                        help=f'[%%eval] swing in centipawns that flags a move '
+                             f'(default: {DEFAULT_SWING})')
+    parser.add_argument('--max-candidates', type=int,
+                        default=DEFAULT_MAX_CANDIDATES,
+                        help=f'candidates per game (default: {DEFAULT_MAX_CANDIDATES})')
+    parser.add_argument('--win-cp', type=int, default=DEFAULT_WIN_CP,
+                        help=f'advantage the first solver move must reach '
+                             f'(default: {DEFAULT_WIN_CP})')
+    parser.add_argument('--min-gap', type=int, default=DEFAULT_MIN_GAP,
+                        help=f'centipawns a solver move must lead the second '
+                             f'best by (default: {DEFAULT_MIN_GAP})')
+    parser.add_argument('--max-solver-moves', type=int,
+                        default=DEFAULT_MAX_SOLVER_MOVES,
+                        help=f'longest solution in solver moves '
+                             f'(default: {DEFAULT_MAX_SOLVER_MOVES})')
+    parser.add_argument('--shard', default='0/1',
+                        help='process chunk K of every N (default: 0/1)')
+    parser.add_argument('--resume', action='store_true',
+                        help='continue from the checkpoint next to --output')
+    args = parser.parse_args()
+
+    if chess is None:
+        print("python-chess library NOT found.")
+        print("Please run: pip install chess")
+        return 1
+
+    missing = [p for p in args.pgn if not os.path.exists(p)]
+    if missing:
+        print(f"ERROR: File not found: {', '.join(missing)}")
+        return 1
+
+    try:
+        shard = parse_shard(args.shard)
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        return 1
+
+    checkpoint_file = args.output + '.checkpoint'
+    inputs = [os.path.abspath(p) for p in args.pgn]
+    checkpoint = None
+    if args.resume:
+        try:
+            checkpoint = load_checkpoint(checkpoint_file, inputs, shard)
+        except ValueError as e:
+            print(f"ERROR: {e}")
+            return 1
+    if checkpoint is None:
+        checkpoint = {'inputs': inputs, 'shard': list(shard), 'chunks_done': 0,
+                      'output_bytes': 0, 'next_id': 0, 'games': 0,
+                      'candidates': 0, 'puzzles': 0}
+    else:
+        print(f"Resuming after chunk {checkpoint['chunks_done']} "
+              f"({checkpoint['puzzles']} puzzles so far)")
+
+    # Drop anything written after the last checkpoint
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'a+b') as f:
+        f.truncate(checkpoint['output_bytes'])
+
+    settings = {
+        'nodes': args.nodes,
+        'win_cp': args.win_cp,
+        'min_gap': args.min_gap,
+        'max_solver_moves': args.max_solver_moves,
+    }
+    workers = args.workers or os.cpu_count() or 1
+    # Each shard numbers its puzzles apart from the others
+    id_base = MINED_ID_BASE + shard[0] * 10 ** 9
+
+    print(f"Mining {len(args.pgn)} file(s) on {workers} processes "
+          f"(shard {shard[0]}/{shard[1]})...")
+    start = time.perf_counter()
+    with Pool(workers) as prefilter, \
+            EnginePool(shlex.split(args.engine), workers=workers) as engines, \
+            open(args.output, 'a', encoding='utf-8') as out:
+        for chunks_done, batch in iter_batches(args.pgn, shard,
+                                               checkpoint['chunks_done'],
+                                               CHUNKS_PER_BATCH):
+            candidates = []
+            tasks = ((text, args.min_ply, args.swing, args.max_candidates)
+                     for text in batch)
+            for games, chunk_candidates in prefilter.imap(prefilter_chunk, tasks):
+                checkpoint['games'] += games
+                candidates.extend(chunk_candidates)
+            checkpoint['candidates'] += len(candidates)
+
+            tasks = ((candidate, settings) for candidate in candidates)
+            for puzzle in engines.imap(confirm_candidate, tasks):
+                if puzzle is None:
+                    continue
+                puzzle = {'id': id_base + checkpoint['next_id'], **puzzle}
+                checkpoint['next_id'] += 1
+                checkpoint['puzzles'] += 1
+                out.write(json.dumps(puzzle, ensure_ascii=False) + '\n')
+
+            out.flush()
+            checkpoint['chunks_done'] = chunks_done
+            checkpoint['output_bytes'] = out.tell()
+            save_checkpoint(checkpoint_file, checkpoint)
+            print(f"  {checkpoint['games']} games, {checkpoint['candidates']} "
+                  f"candidates, {checkpoint['puzzles']} puzzles...", end='\r')
+
+    elapsed = time.perf_counter() - start
+    print(f"\n✓ Mined {checkpoint['puzzles']} puzzles from "
+          f"{checkpoint['games']} games in {elapsed:.1f}s -> {args.output}")
+
+    if args.json:
+        count = write_json(args.output, args.json)
+        print(f"  Wrote {count} puzzles to {args.json}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
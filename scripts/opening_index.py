@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Opening tag table and opening -> puzzle posting index.
+
+The Lichess dump tags each puzzle with the opening of its source game
+(OpeningTags, e.g. "Sicilian_Defense Sicilian_Defense_Najdorf_Variation").
+Puzzle records carry these as small integer IDs in an 'openings' field
+("12 57"), and the tag strings are stored once in a shared table next to
+the pack:
+
+  {
+    "version": 1,
+    "tags": ["Caro-Kann_Defense", ...],
+    "postings": [[190420187, 1203, 88], ...]
+  }
+
+postings[i] lists the IDs of the puzzles tagged tags[i], sorted and delta
+encoded (each entry is the difference from the previous ID) to keep the
+file small, so an "openings you play" mode is a table lookup plus a prefix
+sum. Tags are numbered in sorted order, so IDs are stable for a given set.
+
+build_puzzle_tiers.py writes openings_<tier>.json for every pack. For an
+existing puzzles.json without opening data, this script joins it against a
+dump (by Lichess ID, or by FEN and moves for sets without one, see
+refresh_puzzles.match_row) to build the index, and --annotate also adds the
+'openings' and 'game' fields to the puzzles.
+
+Usage:
+  python scripts/opening_index.py --dump lichess_db_puzzle.csv.zst
+      [--input assets/puzzles/puzzles.json]
+      [--output assets/puzzles/openings.json] [--annotate]
+"""
+
+import argparse
+import json
+import os
+import sys
+from collections import defaultdict
+
+from lichess_dump import (LICHESS_DB_URL, compact_game_ref, iter_dump_rows,
+                          parse_row)
+from refresh_puzzles import build_index, match_row
+
+INPUT_FILE = 'assets/puzzles/puzzles.json'
+OUTPUT_FILE = 'assets/puzzles/openings.json'
+INDEX_VERSION = 1
+
+
+def build_opening_ids(puzzles):
+    """
+    Number every opening tag used by parsed dump puzzles, in sorted order.
+
+    Returns:
+        Dict of tag -> integer ID
+    """
+    tags = set()
+    for puzzle in puzzles:
+        tags.update(puzzle.get('opening_tags', '').split())
+    return {tag: i for i, tag in enumerate(sorted(tags))}
+
+
+def build_postings(records, opening_ids):
+    """
+    Invert the 'openings' field of app records.
+
+    Returns:
+        Index dict ready for JSON: version, tags and delta-encoded postings
+    """
+    postings = defaultdict(list)
+    for record in records:
+        for tag_id in record.get('openings', '').split():
+            postings[int(tag_id)].append(record['id'])
+
+    tags = sorted(opening_ids, key=opening_ids.get)
+    encoded = []
+    for tag_id in range(len(tags)):
+        ids = sorted(postings.get(tag_id, []))
+        encoded.append([ids[0]] + [b - a for a, b in zip(ids, ids[1:])]
+                       if ids else [])
+    return {'version': INDEX_VERSION, 'tags': tags, 'postings': encoded}
+
+
+def decode_postings(index, tag):
+    """Return the sorted puzzle IDs for one opening tag."""
+    try:
+        deltas = index['postings'][index['tags'].index(tag)]
+    except ValueError:
+        return []
+    ids = []
+    total = 0
+    for delta in deltas:
+        total += delta
+        ids.append(total)
+    return ids
+
+
+def save_index(index, output_file):
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(index, f, separators=(',', ':'), ensure_ascii=False)
+
+
+def join_dump(puzzles, rows):
+    """
+    Look up the opening tags and game URL of shipped puzzles in a dump.
+
+    Returns:
+        Dict of puzzle index -> parsed dump puzzle
+    """
+    tables = build_index(puzzles)
+    found = {}
+    for row in rows:
+        index, same = match_row(puzzles, tables, row)
+        if index is None or not same or index in found:
+            continue
+        parsed = parse_row(row)
+        if parsed is not None:
+            found[index] = parsed
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Build the opening -> puzzle index for a puzzle set')
+    parser.add_argument('--dump', default=LICHESS_DB_URL,
+                        help='dump URL, .csv.zst or .csv (default: official URL)')
+    parser.add_argument('--input', default=INPUT_FILE,
+                        help=f'puzzles JSON (default: {INPUT_FILE})')
+    parser.add_argument('--output', default=OUTPUT_FILE,
+                        help=f'index file (default: {OUTPUT_FILE})')
+    parser.add_argument('--annotate', action='store_true',
+                        help="also write 'openings' and 'game' into --input")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input):
+        print(f"ERROR: File not found: {args.input}")
+        return 1
+
+    with open(args.input, 'r', encoding='utf-8') as f:
+        puzzles = json.load(f)
+    print(f"Joining {len(puzzles)} puzzles against {args.dump}...")
+
+    try:
+        found = join_dump(puzzles, iter_dump_rows(args.dump))
+    except (OSError, RuntimeError) as e:
+        print(f"ERROR: {e}")
+        return 1
+
+    opening_ids = build_opening_ids(found.values())
+    for puzzle in puzzles:
+        # IDs from an older table would point at the wrong tags
+        puzzle.pop('openings', None)
+    for index, parsed in found.items():
+        puzzle = puzzles[index]
+        tags = parsed['opening_tags'].split()
+        if tags:
+            puzzle['openings'] = ' '.join(str(opening_ids[t]) for t in tags)
+        game = compact_game_ref(parsed['game_url'])
+        if game:
+            puzzle['game'] = game
+
+    index = build_postings(puzzles, opening_ids)
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    save_index(index, args.output)
+    tagged = sum(1 for p in puzzles if p.get('openings'))
+    print(f"✓ {len(found)} of {len(puzzles)} puzzles found, {tagged} with "
+          f"opening tags, {len(opening_ids)} openings -> {args.output} "
+          f"({os.path.getsize(args.output)} bytes)")
+
+    if args.annotate:
+        with open(args.input, 'w', encoding='utf-8') as f:
+            json.dump(puzzles, f, indent=2, ensure_ascii=False)
+        print(f"  Annotated {args.input}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
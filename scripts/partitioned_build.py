@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Partitioned (map/reduce) puzzle builds across processes or machines.
+
+The dump is split into byte ranges. Each map task parses one range and
+writes a partial-state file holding every tier selector's bucket heaps,
+theme counts and counters. The reduce step merges the partial states and
+writes the same packs build_puzzle_tiers.py would have written from a single
+pass, so builds scale horizontally.
+
+Byte ranges need random access, so partitioned builds read a decompressed
+.csv dump (unzstd lichess_db_puzzle.csv.zst). A row belongs to the range
+holding its first byte, so ranges may be cut anywhere.
+
+Usage:
+  # Print byte ranges to hand out to workers or hosts
+  python scripts/partitioned_build.py plan DUMP.csv --partitions 8
+
+  # On each worker
+  python scripts/partitioned_build.py map DUMP.csv --start S --end E \\
+      --output partial_03.json [--tiers lite,standard,full]
+
+  # Once every partial is available
+  python scripts/partitioned_build.py reduce partial_*.json [--output-dir DIR]
+
+  # Map on local processes and reduce, as a stand-in for several hosts
+  python scripts/partitioned_build.py local DUMP.csv --workers 8
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import tempfile
+from multiprocessing import Pool
+
+from build_puzzle_tiers import OUTPUT_DIR, TIERS, make_selectors, save_tier
+from lichess_dump import parse_row
+from puzzle_selector import PuzzleSelector
+
+PARTIAL_VERSION = 1
+
+
+def plan_partitions(path, partitions):
+    """
+    Split a file into `partitions` contiguous byte ranges.
+
+    Returns:
+        List of (start, end) tuples covering [0, file size)
+    """
+    size = os.path.getsize(path)
+    step = max(1, -(-size // partitions))
+    return [(start, min(start + step, size))
+            for start in range(0, size, step)]
+
+
+def iter_range_rows(path, start, end):
+    """
+    Yield CSV rows whose first byte lies in [start, end).
+
+    The line straddling `start` belongs to the previous range and is
+    skipped; the line straddling `end` is read to completion.
+    """
+    with open(path, 'rb') as f:
+        if start > 0:
+            f.seek(start - 1)
+            # Finish the line the previous range owns (a no-op if start - 1
+            # is the newline ending it)
+            f.readline()
+        pos = f.tell()
+        while pos < end:
+            line = f.readline()
+            if not line:
+                break
+            pos += len(line)
+            if line.startswith(b'PuzzleId,'):
+                continue
+            row = next(csv.reader([line.decode('utf-8')]), None)
+            if row:
+                yield row
+
+
+def run_map(path, start, end, tier_names):
+    """
+    Run the parse and select stages over one byte range.
+
+    Returns:
+        Partial-state dict, JSON-serializable
+    """
+    selectors = make_selectors(tier_names)
+    rows = 0
+    for row in iter_range_rows(path, start, end):
+        rows += 1
+        puzzle = parse_row(row)
+        if puzzle is None:
+            continue
+        for selector in selectors:
+            selector.offer(puzzle)
+
+    return {
+        'version': PARTIAL_VERSION,
+        'source': os.path.basename(path),
+        'source_size': os.path.getsize(path),
+        'range': [start, end],
+        'rows': rows,
+        'selectors': [selector.to_state() for selector in selectors],
+    }
+
+
+def save_partial(partial, output_file):
+    """Write a partial-state file atomically."""
+    tmp_file = output_file + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(partial, f, separators=(',', ':'), ensure_ascii=False)
+    os.replace(tmp_file, output_file)
+
+
+def load_partial(path):
+    """Read a partial-state file written by save_partial()."""
+    with open(path, 'r', encoding='utf-8') as f:
+        partial = json.load(f)
+    if partial.get('version') != PARTIAL_VERSION:
+        raise ValueError(f'{path}: unsupported partial version '
+                         f'{partial.get("version")}')
+    return partial
+
+
+def check_coverage(partials):
+    """
+    Verify that partials cover one source exactly once.
+
+    Returns:
+        List of problems (empty if coverage is complete)
+    """
+    problems = []
+    sources = {(p['source'], p['source_size']) for p in partials}
+    if len(sources) > 1:
+        problems.append(f'partials come from different sources: {sorted(sources)}')
+        return problems
+
+    size = partials[0]['source_size']
+    expected = 0
+    for start, end in sorted(tuple(p['range']) for p in partials):
+        if start > expected:
+            problems.append(f'missing bytes {expected}-{start}')
+        elif start < expected:
+            problems.append(f'overlapping range at byte {start}')
+        expected = max(expected, end)
+    if expected < size:
+        problems.append(f'missing bytes {expected}-{size}')
+    return problems
+
+
+def reduce_partials(partials):
+    """
+    Merge partial states into one selector per tier.
+
+    Returns:
+        (list of merged selectors, total rows)
+    """
+    merged = {}
+    order = []
+    rows = 0
+    for partial in partials:
+        rows += partial['rows']
+        for state in partial['selectors']:
+            selector = PuzzleSelector.from_state(state)
+            if selector.name in merged:
+                merged[selector.name].merge(selector)
+            else:
+                merged[selector.name] = selector
+                order.append(selector.name)
+    return [merged[name] for name in order], rows
+
+
+def _map_task(args):
+    """Pool worker: run one map task and save its partial."""
+    path, start, end, tier_names, output_file = args
+    save_partial(run_map(path, start, end, tier_names), output_file)
+    return output_file
+
+
+def finish(partials, output_dir):
+    """Check coverage, reduce the partials and save the merged tiers."""
+    problems = check_coverage(partials)
+    for problem in problems:
+        print(f"ERROR: {problem}")
+    if problems:
+        return 1
+
+    selectors, rows = reduce_partials(partials)
+    print(f"Merged {len(partials)} partials covering {rows} rows")
+    os.makedirs(output_dir, exist_ok=True)
+    for selector in selectors:
+        save_tier(selector, output_dir)
+    return 0
+
+
+def cmd_plan(args):
+    for i, (start, end) in enumerate(plan_partitions(args.source,
+                                                     args.partitions)):
+        print(f"{i}\t{start}\t{end}")
+    return 0
+
+
+def cmd_map(args):
+    tier_names = parse_tiers(args.tiers)
+    print(f"Mapping bytes {args.start}-{args.end} of {args.source}...")
+    partial = run_map(args.source, args.start, args.end, tier_names)
+    save_partial(partial, args.output)
+    print(f"✓ {partial['rows']} rows -> {args.output}")
+    return 0
+
+
+def cmd_reduce(args):
+    partials = [load_partial(path) for path in args.partials]
+    return finish(partials, args.output_dir)
+
+
+def cmd_local(args):
+    tier_names = parse_tiers(args.tiers)
+    ranges = plan_partitions(args.source, args.workers)
+    print(f"Running {len(ranges)} map tasks on {args.workers} processes...")
+
+    with tempfile.TemporaryDirectory(prefix='puzzle_partials_') as tmp_dir:
+        tasks = [(args.source, start, end, tier_names,
+                  os.path.join(tmp_dir, f'partial_{i:04d}.json'))
+                 for i, (start, end) in enumerate(ranges)]
+        with Pool(args.workers) as pool:
+            files = pool.map(_map_task, tasks)
+
+        partials = [load_partial(path) for path in files]
+
+    return finish(partials, args.output_dir)
+
+
+def parse_tiers(value):
+    names = [t.strip() for t in value.split(',') if t.strip()]
+    unknown = [t for t in names if t not in TIERS]
+    if unknown:
+        raise SystemExit(f"ERROR: Unknown tier(s): {', '.join(unknown)}")
+    return names
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Partitioned map/reduce puzzle builds')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('plan', help='print byte ranges for map tasks')
+    p.add_argument('source', help='decompressed dump .csv')
+    p.add_argument('--partitions', type=int, default=os.cpu_count() or 1)
+    p.set_defaults(func=cmd_plan)
+
+    p = sub.add_parser('map', help='build a partial state for one range')
+    p.add_argument('source', help='decompressed dump .csv')
+    p.add_argument('--start', type=int, required=True)
+    p.add_argument('--end', type=int, required=True)
+    p.add_argument('--output', required=True, help='partial-state file')
+    p.add_argument('--tiers', default=','.join(TIERS))
+    p.set_defaults(func=cmd_map)
+
+    p = sub.add_parser('reduce', help='merge partial states into packs')
+    p.add_argument('partials', nargs='+', help='partial-state files')
+    p.add_argument('--output-dir', default=OUTPUT_DIR)
+    p.set_defaults(func=cmd_reduce)
+
+    p = sub.add_parser('local', help='map on local processes, then reduce')
+    p.add_argument('source', help='decompressed dump .csv')
+    p.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    p.add_argument('--tiers', default=','.join(TIERS))
+    p.add_argument('--output-dir', default=OUTPUT_DIR)
+    p.set_defaults(func=cmd_local)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
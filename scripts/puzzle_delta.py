@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Record-level delta patches between two puzzle releases.
+
+A new release usually changes a few ratings and adds or drops a few
+puzzles, yet the app re-downloads the whole puzzles.json. `diff` compares
+two builds by their stable puzzle IDs and writes only the differences;
+`apply` turns the old file plus the delta back into the new file.
+
+Both files are sorted by ID (a no-op check when they already are) and
+walked side by side, so the diff is a single linear merge. The delta:
+
+  {
+    "version": 2,
+    "base":   {"count": 9980, "sha256": "..."},
+    "target": {"count": 10000, "sha256": "..."},
+    "delete": [id, ...],
+    "put":    [full record, ...],
+    "update": [[id, {field: value, ...}, [removed field, ...]], ...],
+    "order":  "rating" | "id"
+              | {"keep": "base" | "rating", "insert": [[index, id], ...]}
+              | [id, ...]
+  }
+
+'put' holds new puzzles and puzzles whose fields changed shape (e.g. the
+key order), 'update' only the changed fields of the rest. 'order' says how
+to lay out the result: sorted by (rating, lichess_id, id) as the builders
+write it, or by id; otherwise relative to the base, as the puzzles kept
+from the base in base order ("keep": "base"), or stably sorted by their new
+rating so ties stay in base order ("keep": "rating"), with each new puzzle
+inserted at its index in the target. Only when the target follows none of
+these is the full ID list written, so a release that re-rates a few
+puzzles in a file sorted by rating alone costs a few bytes of order.
+
+Checksums are SHA-256 of the records written as puzzles.json
+(write_app_json() output), so apply refuses a base that is not the one the
+delta was made from and verifies that it rebuilt the target exactly.
+Deltas ending in .gz are gzipped.
+
+Usage:
+  python scripts/puzzle_delta.py diff OLD.json NEW.json --output DELTA.json[.gz]
+  python scripts/puzzle_delta.py apply OLD.json DELTA.json[.gz] --output NEW.json
+"""
+
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import os
+import sys
+
+from puzzle_record import write_app_json
+
+DELTA_VERSION = 2
+
+
+def records_checksum(records):
+    """SHA-256 of records serialized the way puzzles.json is written."""
+    buffer = io.StringIO()
+    write_app_json(records, buffer)
+    return hashlib.sha256(buffer.getvalue().encode('utf-8')).hexdigest()
+
+
+def rating_order_key(record):
+    return (record['rating'], record.get('lichess_id', ''), record['id'])
+
+
+def sorted_by_id(records):
+    """
+    Return records sorted by id, raising ValueError on duplicate IDs.
+
+    Already sorted input (the common case for diffs of ID-ordered builds) is
+    detected in one pass and not re-sorted.
+    """
+    ids = [record['id'] for record in records]
+    if any(a >= b for a, b in zip(ids, ids[1:])):
+        records = sorted(records, key=lambda r: r['id'])
+        ids = [record['id'] for record in records]
+        for a, b in zip(ids, ids[1:]):
+            if a == b:
+                raise ValueError(f'Duplicate puzzle id {a}')
+    return records
+
+
+def relative_order(base_ids, target, keep):
+    """
+    Lay out the target's IDs from the base order.
+
+    Args:
+        base_ids: IDs of the base in its file order
+        target: Dict of id -> target record, giving the kept puzzles'
+            ratings
+        keep: 'base' to keep the base order, 'rating' to sort stably by the
+            target ratings
+
+    Returns:
+        IDs of the base puzzles present in the target, in that order
+    """
+    kept = [puzzle_id for puzzle_id in base_ids if puzzle_id in target]
+    if keep == 'rating':
+        kept.sort(key=lambda puzzle_id: target[puzzle_id]['rating'])
+    return kept
+
+
+def detect_order(base, target):
+    """Describe the layout of `target` for the delta's 'order' field."""
+    if target == sorted(target, key=rating_order_key):
+        return 'rating'
+    ids = [record['id'] for record in target]
+    if ids == sorted(ids):
+        return 'id'
+
+    base_ids = [record['id'] for record in base]
+    in_base = set(base_ids)
+    by_id = {record['id']: record for record in target}
+    from_base = [puzzle_id for puzzle_id in ids if puzzle_id in in_base]
+    for keep in ('base', 'rating'):
+        if relative_order(base_ids, by_id, keep) == from_base:
+            return {'keep': keep,
+                    'insert': [[index, puzzle_id]
+                               for index, puzzle_id in enumerate(ids)
+                               if puzzle_id not in in_base]}
+    return ids
+
+
+def order_records(base, records, order):
+    """Arrange rebuilt records as described by a detect_order() value."""
+    if order == 'rating':
+        return sorted(records, key=rating_order_key)
+    if order == 'id':
+        return records
+    by_id = {record['id']: record for record in records}
+    if isinstance(order, list):
+        return [by_id[puzzle_id] for puzzle_id in order]
+
+    kept = iter(relative_order([record['id'] for record in base], by_id,
+                               order['keep']))
+    inserts = {index: puzzle_id for index, puzzle_id in order['insert']}
+    return [by_id[inserts[index] if index in inserts else next(kept)]
+            for index in range(len(records))]
+
+
+def diff_record(old, new):
+    """
+    Compare two versions of a puzzle.
+
+    Returns:
+        None if equal, (changed fields, removed fields) if the new record
+        is the old one with fields changed, removed or appended, or False
+        if it has to be shipped whole
+    """
+    if old == new and list(old) == list(new):
+        return None
+    kept = [key for key in old if key in new]
+    if list(new)[:len(kept)] != kept:
+        return False
+    changed = {key: value for key, value in new.items()
+               if key not in old or old[key] != value}
+    removed = [key for key in old if key not in new]
+    return changed, removed
+
+
+def make_delta(base, target):
+    """
+    Diff two record lists by ID in one merge pass.
+
+    Returns:
+        Delta dict ready for JSON
+    """
+    old = sorted_by_id(base)
+    new = sorted_by_id(target)
+    deletes = []
+    puts = []
+    updates = []
+
+    i = j = 0
+    while i < len(old) or j < len(new):
+        if j == len(new) or (i < len(old) and old[i]['id'] < new[j]['id']):
+            deletes.append(old[i]['id'])
+            i += 1
+        elif i == len(old) or new[j]['id'] < old[i]['id']:
+            puts.append(new[j])
+            j += 1
+        else:
+            change = diff_record(old[i], new[j])
+            if change is False:
+                puts.append(new[j])
+            elif change is not None:
+                updates.append([new[j]['id'], change[0], change[1]])
+            i += 1
+            j += 1
+
+    return {
+        'version': DELTA_VERSION,
+        'base': {'count': len(base), 'sha256': records_checksum(base)},
+        'target': {'count': len(target), 'sha256': records_checksum(target)},
+        'delete': deletes,
+        'put': puts,
+        'update': updates,
+        'order': detect_order(base, target),
+    }
+
+
+def apply_delta(base, delta):
+    """
+    Rebuild the target record list from the base and a delta.
+
+    Raises:
+        ValueError: if the base or the rebuilt target fails its checksum
+    """
+    if delta['version'] != DELTA_VERSION:
+        raise ValueError(f"Unsupported delta version {delta['version']}")
+    if records_checksum(base) != delta['base']['sha256']:
+        raise ValueError('Base does not match the delta (checksum mismatch)')
+
+    old = sorted_by_id(base)
+    puts = sorted_by_id(delta['put'])
+    deletes = set(delta['delete'])
+    updates = {update[0]: update for update in delta['update']}
+
+    result = []
+    i = j = 0
+    while i < len(old) or j < len(puts):
+        if j == len(puts) or (i < len(old) and old[i]['id'] < puts[j]['id']):
+            record = old[i]
+            i += 1
+            if record['id'] in deletes:
+                continue
+            update = updates.get(record['id'])
+            if update is not None:
+                _, changed, removed = update
+                record = {key: value for key, value in record.items()
+                          if key not in removed}
+                record.update(changed)
+            result.append(record)
+        else:
+            if i < len(old) and old[i]['id'] == puts[j]['id']:
+                # Replaced whole
+                i += 1
+            result.append(puts[j])
+            j += 1
+
+    result = order_records(base, result, delta['order'])
+    if records_checksum(result) != delta['target']['sha256']:
+        raise ValueError('Rebuilt puzzles do not match the target checksum')
+    return result
+
+
+def load_json(path):
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_delta(delta, path):
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'wt', encoding='utf-8') as f:
+        json.dump(delta, f, separators=(',', ':'), ensure_ascii=False)
+
+
+def cmd_diff(args):
+    base = load_json(args.old)
+    target = load_json(args.new)
+    delta = make_delta(base, target)
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    save_delta(delta, args.output)
+
+    size = os.path.getsize(args.output)
+    full = os.path.getsize(args.new)
+    print(f"✓ Delta {args.old} -> {args.new}: {len(delta['put'])} put, "
+          f"{len(delta['update'])} updated, {len(delta['delete'])} deleted")
+    order = delta['order']
+    if isinstance(order, dict):
+        layout = ('base order' if order['keep'] == 'base'
+                  else 'by rating, ties in base order')
+        order = f"{layout}, {len(order['insert'])} inserted"
+    elif isinstance(order, list):
+        order = 'explicit'
+    print(f"  Order: {order}")
+    print(f"  {args.output}: {size} bytes ({size / max(full, 1):.1%} of "
+          f"the {full}-byte target)")
+    return 0
+
+
+def cmd_apply(args):
+    base = load_json(args.old)
+    delta = load_json(args.delta)
+    try:
+        result = apply_delta(base, delta)
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        return 1
+    with open(args.output, 'w', encoding='utf-8') as f:
+        write_app_json(result, f)
+    print(f"✓ Applied {args.delta}: {len(base)} -> {len(result)} puzzles, "
+          f"checksum verified -> {args.output}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Diff and patch puzzle releases at record level')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('diff', help='write the delta from OLD to NEW')
+    p.add_argument('old')
+    p.add_argument('new')
+    p.add_argument('--output', required=True,
+                   help='delta file (.json or .json.gz)')
+    p.set_defaults(func=cmd_diff)
+
+    p = sub.add_parser('apply', help='rebuild NEW from OLD and a delta')
+    p.add_argument('old')
+    p.add_argument('delta')
+    p.add_argument('--output', required=True, help='rebuilt puzzles JSON')
+    p.set_defaults(func=cmd_apply)
+
+    args = parser.parse_args()
+    try:
+        return args.func(args)
+    except (OSError, ValueError) as e:
+        print(f"ERROR: {e}")
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,567 @@
+#!/usr/bin/env python3
+"""
+Extract per-puzzle board features as compact integer columns.
+
+The app only gets rating, themes and popularity from the CSV and filters
+themes by substring at runtime. This computes structural features for every
+puzzle at build time, vectorized with NumPy over packed 64-square boards so
+it stays fast over millions of rows:
+
+  phase           non-pawn material on a 0-24 scale (24 = all pieces on,
+                  knight/bishop 1, rook 2, queen 4), after the setup move
+  material        solver's material minus the opponent's, in pawns
+  own_p .. own_q  solver's pawns, knights, bishops, rooks and queens
+  opp_p .. opp_q  the same for the opponent
+  solver_moves    number of moves the player makes in the solution
+  checks          bit i set if the player's move i gives check
+  captures        bit i set if the player's move i captures
+  mate_in         N for a forced mate in N (from the mate themes), else 0
+
+Puzzles are packed into byte columns (shared_columns.pack_puzzles) and
+FENs and move lists are parsed from those bytes with array operations, so
+no per-puzzle string handling happens beyond the theme lists. Boards are
+64 uint8 squares (a8 first, FEN order) holding piece codes 1-6 for white
+PNBRQK and 7-12 for black. All puzzles in a block advance one ply
+at a time, with captures, en passant, promotion and castling handled as
+array operations; check detection uses precomputed knight, pawn and ray
+tables. Only the first 8 solver moves are recorded in the bit masks.
+
+Columns are written in puzzles.json order, so column[i] describes
+puzzles[i]. With --workers N the blocks are spread over N processes that
+read the same columns from shared memory (shared_columns.py).
+
+Requires numpy (pip install numpy).
+
+Usage:
+  python scripts/puzzle_features.py [--input FILE_OR_DUMP] [--output FILE]
+      [--npz FILE] [--workers N]
+"""
+
+import argparse
+import json
+import re
+import sys
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from build_bench_suites import iter_input
+from build_puzzle_tables import split_themes
+from shared_columns import (ColumnPool, pack_puzzles, slice_rows,
+                            unpack_strings)
+
+INPUT_FILE = 'assets/puzzles/puzzles.json'
+OUTPUT_FILE = 'assets/puzzles/puzzle_features.json'
+FEATURES_VERSION = 1
+
+BLOCK_SIZE = 100000
+MAX_MASK_MOVES = 8
+
+EMPTY = 0
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(1, 7)
+BLACK_OFFSET = 6
+
+PIECE_CODES = {ch: i + 1 for i, ch in enumerate('PNBRQKpnbrqk')}
+# Pawns per piece type, indexed by code % 6 (P=1 .. Q=5, K=0)
+MATERIAL = [0, 1, 3, 3, 5, 9]
+PHASE_WEIGHTS = [0, 0, 1, 1, 2, 4]
+PHASE_MAX = 24
+
+COLUMNS = ['id', 'rating', 'phase', 'material',
+           'own_p', 'own_n', 'own_b', 'own_r', 'own_q',
+           'opp_p', 'opp_n', 'opp_b', 'opp_r', 'opp_q',
+           'solver_moves', 'checks', 'captures', 'mate_in']
+
+MATE_THEME = re.compile(r'^mateIn(\d+)$')
+
+
+
+def parse_fens(data, offsets):
+    """
+    Expand packed FENs (shared_columns.pack_strings) into boards.
+
+    Works on the byte column as a whole: each placement byte's width (0 for
+    '/', n for a digit, else 1) is summed per string to find its square.
+
+    Returns:
+        (piece codes (n, 64) uint8 in FEN square order, white_to_move (n,)
+         bool, malformed (n,) bool where the placement is not 64 squares or
+         the side to move is not 'w' or 'b')
+    """
+    starts, ends = offsets[:-1], offsets[1:]
+    n = len(starts)
+    space = data == ord(' ')
+    spaces = np.concatenate(([0], np.cumsum(space, dtype=np.int64)))
+    row_start = np.repeat(starts, ends - starts)
+    # The placement is everything before a string's first space
+    before_first = spaces[:-1] == spaces[row_start]
+    in_placement = before_first & ~space
+
+    width = np.ones(256, dtype=np.int64)
+    width[ord('/')] = 0
+    for digit in range(1, 9):
+        width[ord(str(digit))] = digit
+    lookup = np.zeros(256, dtype=np.uint8)
+    for ch, code in PIECE_CODES.items():
+        lookup[ord(ch)] = code
+
+    squares = np.concatenate(([0], np.cumsum(np.where(in_placement,
+                                                      width[data], 0))))
+    square = squares[:-1] - squares[row_start]
+    filled = squares[ends] - squares[starts]
+    codes = lookup[data]
+    pieces = np.flatnonzero(in_placement & (codes > 0) & (square < 64))
+    boards = np.zeros((n, 64), dtype=np.uint8)
+    boards[np.searchsorted(ends, pieces, side='right'),
+           square[pieces]] = codes[pieces]
+
+    # Side to move: the one-character field after the first space
+    first_space = np.flatnonzero(space & before_first)
+    rows = np.searchsorted(ends, first_space, side='right')
+    side_at = first_space + 1
+    after = side_at + 1
+    valid = side_at < ends[rows]
+    valid[valid] &= (after[valid] == ends[rows[valid]]) \
+        | (data[np.minimum(after[valid], len(data) - 1)] == ord(' '))
+    side = np.zeros(n, dtype=np.uint8)
+    side[rows[valid]] = data[side_at[valid]]
+    white_to_move = side == ord('w')
+    malformed = (filled != 64) | ~(white_to_move | (side == ord('b')))
+    return boards, white_to_move, malformed
+
+
+def parse_moves(data, offsets, max_plies=None):
+    """
+    Decode packed space-separated UCI move lists.
+
+    Args:
+        data, offsets: A shared_columns.pack_strings() column
+        max_plies: Decode only this many moves per list (default: all)
+
+    Returns:
+        (moves (n, plies, 3) int64 as from/to/promotion with -1 padding,
+         squares in FEN order and promotion KNIGHT..QUEEN or 0; move counts
+         (n,) of the full lists; malformed (n,) bool where a decoded move
+         is not UCI)
+    """
+    starts, ends = offsets[:-1], offsets[1:]
+    n = len(starts)
+    nonempty = ends > starts
+    space = data == ord(' ')
+    after_space = np.concatenate(([True], space[:-1]))
+    after_space[starts[nonempty]] = True
+    before_space = np.concatenate((space[1:], [True]))
+    before_space[ends[nonempty] - 1] = True
+    token_start = np.flatnonzero(~space & after_space)
+    token_length = np.flatnonzero(~space & before_space) + 1 - token_start
+
+    rows = np.searchsorted(ends, token_start, side='right')
+    counts = np.bincount(rows, minlength=n)
+    ply = np.arange(len(rows)) - (np.cumsum(counts) - counts)[rows]
+    plies = counts.max(initial=0) if max_plies is None else max_plies
+    keep = ply < plies
+    rows, ply = rows[keep], ply[keep]
+    token_length = token_length[keep]
+
+    padded = np.concatenate((data, np.zeros(5, dtype=np.uint8)))
+    chars = padded[token_start[keep, None] + np.arange(5)].astype(np.int64)
+    files = chars[:, [0, 2]] - ord('a')
+    ranks = chars[:, [1, 3]] - ord('1')
+    promotion_codes = np.zeros(256, dtype=np.int64)
+    for ch, code in (('n', KNIGHT), ('b', BISHOP), ('r', ROOK), ('q', QUEEN)):
+        promotion_codes[ord(ch)] = code
+    promotion = np.where(token_length > 4, promotion_codes[chars[:, 4]], 0)
+    valid = ((token_length >= 4)
+             & ((files >= 0) & (files < 8) & (ranks >= 0) & (ranks < 8)).all(axis=1)
+             & ((token_length == 4) | (promotion > 0)))
+
+    moves = np.full((n, max(plies, 1), 3), -1, dtype=np.int64)
+    squares = (7 - ranks) * 8 + files
+    moves[rows[valid], ply[valid]] = np.column_stack(
+        (squares[valid], promotion[valid]))
+    malformed = np.zeros(n, dtype=bool)
+    malformed[rows[~valid]] = True
+    return moves, counts, malformed
+
+
+def build_tables():
+    """
+    Precompute the attack lookup tables used by check detection.
+
+    Missing entries point at square 64, a sentinel column that is always
+    empty.
+
+    Returns:
+        (knight (64, 8), pawn attackers per colour (2, 64, 2),
+         rays (64, 8, 7) with the first four directions orthogonal)
+    """
+    def on_board(r, f):
+        return 0 <= r < 8 and 0 <= f < 8
+
+    knight = np.full((64, 8), 64, dtype=np.int64)
+    pawn = np.full((2, 64, 2), 64, dtype=np.int64)
+    rays = np.full((64, 8, 7), 64, dtype=np.int64)
+    jumps = [(1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1),
+             (-1, 2)]
+    directions = [(0, 1), (0, -1), (1, 0), (-1, 0),
+                  (1, 1), (1, -1), (-1, 1), (-1, -1)]
+
+    for sq in range(64):
+        r, f = divmod(sq, 8)
+        for i, (dr, df) in enumerate(jumps):
+            if on_board(r + dr, f + df):
+                knight[sq, i] = (r + dr) * 8 + f + df
+        # White pawns attack towards rank 8 (lower index), so a white pawn
+        # attacking `sq` stands one row below it; black pawns one row above
+        for colour, dr in ((0, 1), (1, -1)):
+            for i, df in enumerate((-1, 1)):
+                if on_board(r + dr, f + df):
+                    pawn[colour, sq, i] = (r + dr) * 8 + f + df
+        for d, (dr, df) in enumerate(directions):
+            for step in range(1, 8):
+                if not on_board(r + dr * step, f + df * step):
+                    break
+                rays[sq, d, step - 1] = (r + dr * step) * 8 + f + df * step
+    return knight, pawn, rays
+
+
+def is_attacked(boards, squares, by_white, tables):
+    """
+    Vectorized attack test: is squares[i] attacked on boards[i] by the side
+    given by by_white[i]?
+
+    Args:
+        boards: (n, 65) uint8 boards with the empty sentinel square
+        squares: (n,) target squares
+        by_white: (n,) bool, attacking colour
+        tables: Output of build_tables()
+
+    Returns:
+        (n,) bool
+    """
+    knight, pawn, rays = tables
+    rows = np.arange(len(boards))[:, None]
+    offset = np.where(by_white, 0, BLACK_OFFSET).astype(np.uint8)[:, None]
+
+    attacked = (boards[rows, knight[squares]] == KNIGHT + offset).any(axis=1)
+    pawn_squares = pawn[np.where(by_white, 0, 1), squares]
+    attacked |= (boards[rows, pawn_squares] == PAWN + offset).any(axis=1)
+
+    # First piece along each ray
+    contents = boards[rows[:, :, None], rays[squares]]  # (n, 8, 7)
+    occupied = contents != EMPTY
+    first = np.argmax(occupied, axis=2)
+    blocker = np.take_along_axis(contents, first[:, :, None], axis=2)[:, :, 0]
+    blocker = np.where(occupied.any(axis=2), blocker, EMPTY)
+    queen = QUEEN + offset
+    attacked |= ((blocker[:, :4] == ROOK + offset)
+                 | (blocker[:, :4] == queen)).any(axis=1)
+    attacked |= ((blocker[:, 4:] == BISHOP + offset)
+                 | (blocker[:, 4:] == queen)).any(axis=1)
+    return attacked
+
+
+def apply_moves(boards, rows, from_sq, to_sq, promotion):
+    """
+    Play one move on each of boards[rows] in place.
+
+    Args:
+        promotion: Promotion piece type (KNIGHT..QUEEN) or 0 per row
+
+    Returns:
+        (captured (n,) bool, mover is white (n,) bool)
+    """
+    piece = boards[rows, from_sq]
+    target = boards[rows, to_sq]
+    white = (piece >= 1) & (piece <= 6)
+    is_pawn = (piece == PAWN) | (piece == PAWN + BLACK_OFFSET)
+    is_king = (piece == KING) | (piece == KING + BLACK_OFFSET)
+
+    en_passant = is_pawn & (from_sq % 8 != to_sq % 8) & (target == EMPTY)
+    boards[rows[en_passant], (from_sq // 8 * 8 + to_sq % 8)[en_passant]] = EMPTY
+
+    promoted = promotion > 0
+    piece = np.where(promoted,
+                     promotion + np.where(white, 0, BLACK_OFFSET),
+                     piece).astype(np.uint8)
+    boards[rows, from_sq] = EMPTY
+    boards[rows, to_sq] = piece
+
+    castle = is_king & (np.abs(from_sq % 8 - to_sq % 8) == 2)
+    if castle.any():
+        kingside = to_sq > from_sq
+        base = from_sq // 8 * 8
+        rook_from = (base + np.where(kingside, 7, 0))[castle]
+        rook_to = (base + np.where(kingside, 5, 3))[castle]
+        castle_rows = rows[castle]
+        boards[castle_rows, rook_to] = boards[castle_rows, rook_from]
+        boards[castle_rows, rook_from] = EMPTY
+
+    return (target != EMPTY) | en_passant, white
+
+
+def piece_counts(boards):
+    """Per-board counts of each piece code. Returns (n, 13)."""
+    n = len(boards)
+    index = np.arange(n)[:, None] * 13 + boards[:, :64]
+    return np.bincount(index.ravel(), minlength=n * 13).reshape(n, 13)
+
+
+def parse_block(columns):
+    """
+    Unpack a block of shared_columns.pack_puzzles() columns into arrays.
+
+    Returns:
+        Dict of boards (n, 65), white_to_move (n,), moves (n, plies, 3)
+        as from/to/promotion with -1 padding, ply counts, ids, ratings and
+        mate_in
+
+    Raises:
+        ValueError: If a FEN or move list cannot be parsed
+    """
+    codes, white_to_move, bad_fens = parse_fens(columns['fen_data'],
+                                                columns['fen_offsets'])
+    moves, plies, bad_moves = parse_moves(columns['moves_data'],
+                                          columns['moves_offsets'])
+    bad = np.flatnonzero(bad_fens | bad_moves)
+    if len(bad):
+        raise ValueError(f"Malformed FEN or moves in puzzle "
+                         f"{columns['id'][bad[0]]}")
+    n = len(codes)
+    boards = np.zeros((n, 65), dtype=np.uint8)
+    boards[:, :64] = codes
+
+    mate_in = np.zeros(n, dtype=np.int64)
+    theme_strings = unpack_strings(columns['themes_data'],
+                                   columns['themes_offsets'])
+    for i, theme_string in enumerate(theme_strings):
+        if 'mate' not in theme_string:
+            continue
+        themes = split_themes(theme_string)
+        for theme in themes:
+            match = MATE_THEME.match(theme)
+            if match:
+                mate_in[i] = int(match.group(1))
+                break
+        else:
+            if 'mate' in themes:
+                mate_in[i] = plies[i] // 2
+
+    return {
+        'boards': boards,
+        'white_to_move': white_to_move,
+        'moves': moves,
+        'plies': plies,
+        'id': columns['id'],
+        'rating': columns['rating'],
+        'mate_in': mate_in,
+    }
+
+
+def extract_block(columns, tables):
+    """
+    Compute feature columns for a block of puzzles.
+
+    Args:
+        columns: shared_columns.pack_puzzles() columns of the block
+        tables: Output of build_tables()
+
+    Returns:
+        Dict of column name -> 1-D integer array
+    """
+    block = parse_block(columns)
+    boards = block['boards']
+    moves = block['moves']
+    plies = block['plies']
+    n = len(plies)
+    checks = np.zeros(n, dtype=np.int64)
+    captures = np.zeros(n, dtype=np.int64)
+    # The player moves second; the setup move belongs to the side to move
+    solver_white = ~block['white_to_move']
+
+    counts = None
+    for ply in range(moves.shape[1]):
+        rows = np.nonzero(plies > ply)[0]
+        if len(rows) == 0:
+            break
+        from_sq, to_sq, promotion = moves[rows, ply].T
+        captured, mover_white = apply_moves(boards, rows, from_sq, to_sq,
+                                            promotion)
+
+        if ply == 0:
+            counts = piece_counts(boards)
+            continue
+
+        solver_index = (ply - 1) // 2
+        if ply % 2 == 0 or solver_index >= MAX_MASK_MOVES:
+            continue
+        enemy_king = np.where(mover_white, KING + BLACK_OFFSET, KING)
+        king_square = np.argmax(boards[rows, :64] == enemy_king[:, None],
+                                axis=1)
+        check = is_attacked(boards[rows], king_square, mover_white, tables)
+        bit = 1 << solver_index
+        checks[rows[check]] |= bit
+        captures[rows[captured]] |= bit
+
+    if counts is None:
+        counts = piece_counts(boards)
+
+    white = counts[:, PAWN:KING]
+    black = counts[:, PAWN + BLACK_OFFSET:KING + BLACK_OFFSET]
+    own = np.where(solver_white[:, None], white, black)
+    opp = np.where(solver_white[:, None], black, white)
+    values = np.array(MATERIAL[1:], dtype=np.int64)
+    weights = np.array(PHASE_WEIGHTS[1:], dtype=np.int64)
+
+    columns = {
+        'id': block['id'],
+        'rating': block['rating'],
+        'phase': np.minimum((white + black) @ weights, PHASE_MAX),
+        'material': own @ values - opp @ values,
+        'solver_moves': plies // 2,
+        'checks': checks,
+        'captures': captures,
+        'mate_in': block['mate_in'],
+    }
+    for i, name in enumerate('pnbrq'):
+        columns[f'own_{name}'] = own[:, i]
+        columns[f'opp_{name}'] = opp[:, i]
+    return columns
+
+
+def iter_blocks(puzzles, block_size=BLOCK_SIZE):
+    block = []
+    for puzzle in puzzles:
+        block.append(puzzle)
+        if len(block) >= block_size:
+            yield block
+            block = []
+    if block:
+        yield block
+
+
+# Lookup tables of a ColumnPool worker, built on its first task
+_worker_tables = None
+
+
+def _extract_task(inputs, outputs, start, stop):
+    """ColumnPool task: write the feature columns of rows start..stop."""
+    global _worker_tables
+    if _worker_tables is None:
+        _worker_tables = build_tables()
+    columns = extract_block(slice_rows(inputs, start, stop), _worker_tables)
+    for name in COLUMNS:
+        outputs[name][start:stop] = columns[name]
+
+
+def _output_spec(rows):
+    return [(name, np.int64, (rows,)) for name in COLUMNS]
+
+
+def extract_features(puzzles, block_size=BLOCK_SIZE, workers=1):
+    """
+    Compute feature columns for any iterable of puzzles.
+
+    Args:
+        workers: Worker processes; above 1, blocks go to a ColumnPool
+            through shared memory
+
+    Returns:
+        Dict of column name -> 1-D integer array, in input order
+    """
+    parts = {name: [] for name in COLUMNS}
+    total = 0
+    if workers > 1:
+        with ColumnPool(workers) as pool:
+            for batch, columns, _ in pool.map_batches(
+                    _extract_task, puzzles, _output_spec, block_size):
+                for name in COLUMNS:
+                    parts[name].append(columns[name])
+                total += len(batch)
+                print(f"  Extracted {total} puzzles...", end='\r')
+    else:
+        tables = build_tables()
+        for block in iter_blocks(puzzles, block_size):
+            columns = extract_block(pack_puzzles(block), tables)
+            for name in COLUMNS:
+                parts[name].append(columns[name])
+            total += len(block)
+            print(f"  Extracted {total} puzzles...", end='\r')
+    print()
+    return {name: (np.concatenate(parts[name]) if parts[name]
+                   else np.zeros(0, dtype=np.int64))
+            for name in COLUMNS}
+
+
+def save_features(columns, output_file):
+    """Write the columns as compact JSON: {"version", "columns": {name: [...]}}."""
+    data = {
+        'version': FEATURES_VERSION,
+        'count': len(columns['id']),
+        'columns': {name: columns[name].tolist() for name in COLUMNS},
+    }
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(data, f, separators=(',', ':'))
+
+
+def save_npz(columns, output_file):
+    """Write the columns with the smallest integer dtype that holds them."""
+    packed = {}
+    for name in COLUMNS:
+        column = columns[name]
+        low, high = (int(column.min()), int(column.max())) if len(column) else (0, 0)
+        for dtype in (np.int8, np.uint8, np.int16, np.uint16, np.int32,
+                      np.int64):
+            info = np.iinfo(dtype)
+            if info.min <= low and high <= info.max:
+                break
+        packed[name] = column.astype(dtype)
+    np.savez_compressed(output_file, **packed)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Extract per-puzzle board features as integer columns')
+    parser.add_argument('--input', default=INPUT_FILE,
+                        help=f'puzzles JSON or dump source (default: {INPUT_FILE})')
+    parser.add_argument('--output', default=OUTPUT_FILE,
+                        help=f'JSON columns file (default: {OUTPUT_FILE})')
+    parser.add_argument('--npz', default=None,
+                        help='also write the columns as a compressed .npz')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='worker processes (default: 1)')
+    args = parser.parse_args()
+
+    if np is None:
+        print("numpy library NOT found.")
+        print("Please run: pip install numpy")
+        return 1
+
+    print(f"Extracting features from {args.input}...")
+    start = time.perf_counter()
+    columns = extract_features(iter_input(args.input), workers=args.workers)
+    count = len(columns['id'])
+    elapsed = time.perf_counter() - start
+    print(f"✓ {count} puzzles in {elapsed:.1f}s "
+          f"({count / max(elapsed, 1e-9):.0f} puzzles/s)")
+
+    save_features(columns, args.output)
+    print(f"  Wrote {args.output}")
+    if args.npz:
+        save_npz(columns, args.npz)
+        print(f"  Wrote {args.npz}")
+
+    if count:
+        print("\nSummary:")
+        print(f"  Mates: {int((columns['mate_in'] > 0).sum())}")
+        print(f"  Check on first move: {int((columns['checks'] & 1).sum())}")
+        print(f"  Capture on first move: {int((columns['captures'] & 1).sum())}")
+        print(f"  Endgames (phase <= 6): {int((columns['phase'] <= 6).sum())}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Merge puzzle sources by rating with per-source priority and dedup.
+
+Every fetch/generate script writes assets/puzzles/puzzles.json wholesale,
+so combining the curated set, the generated base puzzles, API fetches and
+dump extracts meant picking one. This k-way merges any number of
+rating-sorted sources into one output in a single streaming pass:
+
+  - order    heapq.merge on (rating, -priority, source, position in
+             source), so equal ratings come out highest priority first
+  - dedup    a record is dropped if its stable ID (lichess_id, else id) or
+             its canonical position (first four FEN fields, as
+             analysis_cache.fen_key) was already written
+  - priority a record is also dropped if a higher-priority source holds
+             the same ID or position, even at a different rating. The keys
+             of every source above the lowest priority are indexed before
+             the merge; the lowest-priority sources (in practice the big
+             dump extracts) are only streamed.
+
+Records are never buffered: memory is one record per source plus 8-byte
+digests of the keys indexed and written.
+
+Sources are [PRIORITY=]SOURCE (priority defaults to 0, higher wins):
+
+  curated          fetch_lichess_puzzles.get_curated_puzzle_set()
+  base             generate_puzzles.BASE_PUZZLES
+  FILE.json        a puzzles.json-style array (sorted in memory)
+  FILE.jsonl       e.g. external_sort.py output, must be sorted by rating
+  dump source      .csv.zst/.csv/URL, must be sorted by rating (pipe it
+                   through external_sort.py first)
+
+Output is puzzles.json-style records (dump rows go through to_app_record;
+records without an id get one derived from their position). A .jsonl
+output is written one record per line, anything else as a JSON array.
+
+Usage:
+  python scripts/puzzle_merge.py [PRIORITY=]SOURCE ... [--output FILE]
+"""
+
+import argparse
+import hashlib
+import heapq
+import json
+import os
+import re
+import sys
+
+from analysis_cache import fen_key
+from external_sort import iter_input, write_output
+from lichess_dump import to_app_record
+from puzzle_record import write_app_json
+
+OUTPUT_FILE = 'assets/puzzles/puzzles.json'
+
+# IDs derived from positions live above the Lichess ID range (62^5 < 2^30)
+DERIVED_ID_BASE = 1 << 40
+
+SOURCE_SPEC = re.compile(r'^(-?\d+)=(.+)$')
+
+
+def _digest(text):
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest()
+
+
+def record_keys(puzzle):
+    """Digests of a puzzle's stable ID (if any) and canonical position."""
+    keys = [_digest('pos:' + fen_key(puzzle['fen']))]
+    puzzle_id = puzzle.get('lichess_id') or puzzle.get('id')
+    if puzzle_id is not None:
+        keys.append(_digest(f'id:{puzzle_id}'))
+    return keys
+
+
+def derived_id(fen):
+    """Stable integer ID for a puzzle that has none, from its position."""
+    digest = hashlib.blake2b(fen_key(fen).encode('utf-8'), digest_size=5)
+    return DERIVED_ID_BASE + int.from_bytes(digest.digest(), 'big')
+
+
+def app_record(puzzle):
+    """Bring a record from any source to the puzzles.json schema."""
+    if 'rating_deviation' in puzzle:
+        # parse_row() output from a dump or dump-derived .jsonl
+        return to_app_record(puzzle)
+    if 'id' in puzzle:
+        return puzzle
+    return {'id': derived_id(puzzle['fen']), **puzzle}
+
+
+class Source:
+    """
+    One merge input.
+
+    Args:
+        spec: Builtin name, file or dump source
+        priority: Higher priority wins duplicates
+    """
+
+    def __init__(self, spec, priority=0):
+        self.spec = spec
+        self.priority = priority
+        self.read = 0
+        self.kept = 0
+        self.duplicates = 0
+        self.superseded = 0
+
+    def records(self):
+        """Yield the source's records in rating order."""
+        if self.spec == 'curated':
+            from fetch_lichess_puzzles import get_curated_puzzle_set
+            yield from sorted(get_curated_puzzle_set(),
+                              key=lambda p: p['rating'])
+        elif self.spec == 'base':
+            from generate_puzzles import BASE_PUZZLES
+            yield from sorted(BASE_PUZZLES, key=lambda p: p['rating'])
+        elif self.spec.endswith('.json'):
+            with open(self.spec, 'r', encoding='utf-8') as f:
+                puzzles = json.load(f)
+            yield from sorted(puzzles, key=lambda p: p['rating'])
+        else:
+            last = None
+            for puzzle in iter_input(self.spec):
+                if last is not None and puzzle['rating'] < last:
+                    raise ValueError(
+                        f'{self.spec} is not sorted by rating '
+                        f'({puzzle["rating"]} after {last}); sort it with '
+                        f'external_sort.py first')
+                last = puzzle['rating']
+                yield puzzle
+
+
+def parse_source(value):
+    """Parse a [PRIORITY=]SOURCE argument."""
+    match = SOURCE_SPEC.match(value)
+    if match:
+        return Source(match.group(2), int(match.group(1)))
+    return Source(value)
+
+
+def index_claims(sources):
+    """
+    Map the key digests of every source above the lowest priority to the
+    highest priority holding them.
+    """
+    lowest = min(source.priority for source in sources)
+    claims = {}
+    for source in sources:
+        if source.priority == lowest:
+            continue
+        for puzzle in source.records():
+            for key in record_keys(puzzle):
+                if claims.get(key, lowest) < source.priority:
+                    claims[key] = source.priority
+    return claims
+
+
+def _tagged(index, source):
+    for seq, puzzle in enumerate(source.records()):
+        yield (puzzle['rating'], -source.priority, index, seq), source, puzzle
+
+
+def merge_sources(sources):
+    """
+    K-way merge the sources by rating, dropping duplicates.
+
+    Yields:
+        App-schema puzzle dicts in rating order
+    """
+    claims = index_claims(sources)
+    written = set()
+    for _, source, puzzle in heapq.merge(
+            *(_tagged(i, s) for i, s in enumerate(sources)),
+            key=lambda item: item[0]):
+        source.read += 1
+        keys = record_keys(puzzle)
+        if any(claims.get(key, source.priority) > source.priority
+               for key in keys):
+            source.superseded += 1
+            continue
+        if any(key in written for key in keys):
+            source.duplicates += 1
+            continue
+        written.update(keys)
+        source.kept += 1
+        yield app_record(puzzle)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Merge puzzle sources by rating with priority and dedup')
+    parser.add_argument('sources', nargs='+', metavar='[PRIORITY=]SOURCE',
+                        help="'curated', 'base', .json, .jsonl or a "
+                             "rating-sorted dump source")
+    parser.add_argument('--output', default=OUTPUT_FILE,
+                        help=f'merged .json or .jsonl (default: {OUTPUT_FILE})')
+    args = parser.parse_args()
+
+    sources = [parse_source(value) for value in args.sources]
+    print(f"Merging {len(sources)} sources into {args.output}...")
+
+    # Write next to the output and swap in at the end, so a source can be
+    # the file being replaced
+    tmp_path = args.output + '.tmp'
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    try:
+        merged = merge_sources(sources)
+        if args.output.endswith('.jsonl'):
+            count, _ = write_output(merged, tmp_path)
+        else:
+            count = 0
+
+            def counted(records):
+                nonlocal count
+                for record in records:
+                    count += 1
+                    yield record
+
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                write_app_json(counted(merged), f)
+        os.replace(tmp_path, args.output)
+    except Exception as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        print(f"\n❌ Error: {e}")
+        return 1
+
+    print(f"✓ Merged {count} puzzles -> {args.output}")
+    for source in sources:
+        print(f"  [{source.priority:>3}] {source.spec}: {source.read} read, "
+              f"{source.kept} kept, {source.duplicates} duplicate, "
+              f"{source.superseded} superseded")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
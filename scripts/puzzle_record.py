@@ -0,0 +1,254 @@
+"""
+Compact in-pipeline puzzle records.
+
+Parsed dump puzzles are dicts with ten string keys and their own copies of
+the FEN, moves, themes, game URL and opening tags, about 800 bytes per row.
+Stages that buffer many puzzles (the PuzzleSelector heaps) hold
+PuzzleRecords instead, about 500 bytes per row: one puzzle in __slots__,
+with theme and opening-tag strings interned per process so a record holds a
+small integer for each, moves packed 2 bytes per move and the game URL kept
+as a compact 'gameId#ply' reference. Records also answer puzzle['field']
+and puzzle.get('field') like the parse_row() dicts they replace, and
+convert back to parse_row()-style dicts and to the app schema.
+
+write_app_json() streams app records from any iterable, byte-for-byte like
+json.dump(indent=2, ensure_ascii=False) but without first building the
+whole list.
+
+Interned IDs are only meaningful inside one process; records pickle as plain
+dicts so they can cross process pools.
+"""
+
+import json
+from array import array
+
+from lichess_dump import (compact_game_ref, expand_game_ref,
+                          lichess_numeric_id)
+
+PROMOTION_CODES = {'': 0, 'n': 1, 'b': 2, 'r': 3, 'q': 4}
+PROMOTION_PIECES = ['', 'n', 'b', 'r', 'q']
+FILES = 'abcdefgh'
+
+
+class StringTable:
+    """Interns strings as dense integer IDs."""
+
+    def __init__(self):
+        self.ids = {}
+        self.strings = []
+
+    def intern(self, text):
+        string_id = self.ids.get(text)
+        if string_id is None:
+            string_id = len(self.strings)
+            self.ids[text] = string_id
+            self.strings.append(text)
+        return string_id
+
+    def __getitem__(self, string_id):
+        return self.strings[string_id]
+
+    def __len__(self):
+        return len(self.strings)
+
+
+class TagSetTable(StringTable):
+    """
+    Interns whole space-separated tag strings ("endgame mate mateIn1"), and
+    the individual tags in them, so each distinct combination is stored
+    once and converts back to the exact original string.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.tags = StringTable()
+        self.tag_ids = []
+
+    def intern(self, text):
+        before = len(self.strings)
+        set_id = super().intern(text)
+        if set_id == before:
+            self.tag_ids.append(tuple(self.tags.intern(t) for t in text.split()))
+        return set_id
+
+    def names(self, set_id):
+        return self.strings[set_id].split()
+
+
+# Per-process tables shared by every record
+THEMES = TagSetTable()
+OPENINGS = TagSetTable()
+# App records' opening tag IDs ("12 40"), see opening_index.py
+OPENING_REFS = StringTable()
+
+
+def encode_move(uci):
+    """Pack a UCI move into 16 bits: from | to << 6 | promotion << 12."""
+    from_sq = FILES.index(uci[0]) + (int(uci[1]) - 1) * 8
+    to_sq = FILES.index(uci[2]) + (int(uci[3]) - 1) * 8
+    return from_sq | to_sq << 6 | PROMOTION_CODES[uci[4:5]] << 12
+
+
+def decode_move(code):
+    from_sq = code & 0x3f
+    to_sq = (code >> 6) & 0x3f
+    return (f'{FILES[from_sq % 8]}{from_sq // 8 + 1}'
+            f'{FILES[to_sq % 8]}{to_sq // 8 + 1}'
+            f'{PROMOTION_PIECES[code >> 12]}')
+
+
+def encode_moves(moves):
+    """Pack a space-separated UCI move list into bytes."""
+    return array('H', [encode_move(m) for m in moves.split()]).tobytes()
+
+
+def decode_moves(data):
+    packed = array('H')
+    packed.frombytes(data)
+    return ' '.join(decode_move(code) for code in packed)
+
+
+class PuzzleRecord:
+    """
+    One puzzle in compact form.
+
+    Build with from_dict() from a parse_row() dict or an app record.
+    """
+
+    __slots__ = ('id', 'lichess_id', 'fen', 'packed_moves', 'rating',
+                 'rating_deviation', 'popularity', 'nb_plays', 'theme_set',
+                 'opening_set', 'opening_ref', 'game')
+
+    @classmethod
+    def from_dict(cls, puzzle):
+        record = cls.__new__(cls)
+        lichess_id = puzzle.get('lichess_id') or ''
+        record.lichess_id = lichess_id
+        record.id = puzzle.get('id')
+        if record.id is None and lichess_id:
+            record.id = lichess_numeric_id(lichess_id)
+        record.fen = puzzle['fen']
+        record.packed_moves = encode_moves(puzzle['moves'])
+        record.rating = puzzle['rating']
+        record.rating_deviation = puzzle.get('rating_deviation', 0)
+        record.popularity = puzzle.get('popularity', 0)
+        record.nb_plays = puzzle.get('nb_plays', 0)
+        record.theme_set = THEMES.intern(puzzle.get('themes') or '')
+        record.opening_set = OPENINGS.intern(puzzle.get('opening_tags') or '')
+        record.opening_ref = OPENING_REFS.intern(puzzle.get('openings') or '')
+        record.game = (puzzle.get('game')
+                       or compact_game_ref(puzzle.get('game_url') or ''))
+        return record
+
+    @property
+    def moves(self):
+        return decode_moves(self.packed_moves)
+
+    @property
+    def themes(self):
+        return THEMES[self.theme_set]
+
+    @property
+    def theme_ids(self):
+        """Interned IDs of the individual themes (see THEMES.tags)."""
+        return THEMES.tag_ids[self.theme_set]
+
+    @property
+    def opening_tags(self):
+        return OPENINGS[self.opening_set]
+
+    @property
+    def openings(self):
+        return OPENING_REFS[self.opening_ref]
+
+    @property
+    def game_url(self):
+        return expand_game_ref(self.game)
+
+    def __getitem__(self, field):
+        try:
+            return getattr(self, field)
+        except AttributeError:
+            raise KeyError(field) from None
+
+    def get(self, field, default=None):
+        try:
+            value = self[field]
+        except KeyError:
+            return default
+        return default if value is None else value
+
+    def to_dict(self):
+        """
+        Convert to a parse_row()-style dict. The game URL comes back without
+        its colour segment (see compact_game_ref()).
+        """
+        return {
+            'lichess_id': self.lichess_id,
+            'fen': self.fen,
+            'moves': self.moves,
+            'rating': self.rating,
+            'rating_deviation': self.rating_deviation,
+            'popularity': self.popularity,
+            'nb_plays': self.nb_plays,
+            'themes': self.themes,
+            'game_url': self.game_url,
+            'opening_tags': self.opening_tags,
+        }
+
+    def to_app_record(self, opening_ids=None):
+        """
+        Convert to the puzzles.json schema.
+
+        Args:
+            opening_ids: Optional opening tag -> integer ID table, as for
+                lichess_dump.to_app_record(). Without it, the opening IDs
+                the record was built with (if any) are kept.
+        """
+        record = {
+            'id': self.id,
+            'fen': self.fen,
+            'moves': self.moves,
+            'rating': self.rating,
+            'themes': self.themes,
+            'popularity': self.popularity,
+        }
+        if self.lichess_id:
+            record['lichess_id'] = self.lichess_id
+        tags = self.opening_tags.split()
+        if opening_ids is not None and tags:
+            record['openings'] = ' '.join(str(opening_ids[t]) for t in tags)
+        elif self.openings:
+            record['openings'] = self.openings
+        if self.game:
+            record['game'] = self.game
+        return record
+
+    def __reduce__(self):
+        # Interned IDs do not survive a trip to another process
+        return (PuzzleRecord.from_dict,
+                (dict(self.to_dict(), id=self.id, openings=self.openings),))
+
+    def __repr__(self):
+        return f'PuzzleRecord({self.lichess_id or self.id!r}, rating={self.rating})'
+
+
+def write_app_json(records, f):
+    """
+    Write app-schema dicts from any iterable as a JSON array.
+
+    The output is identical to json.dump(list(records), f, indent=2,
+    ensure_ascii=False) for flat records, but records are encoded one at a
+    time, so a generator of records never materializes as a list.
+    """
+    encode = json.JSONEncoder(ensure_ascii=False).encode
+    first = True
+    f.write('[')
+    for record in records:
+        f.write('\n  {' if first else ',\n  {')
+        first = False
+        f.write(','.join(f'\n    {encode(key)}: {encode(value)}'
+                         for key, value in record.items()))
+        f.write('\n  }' if record else '}')
+    f.write('\n]' if not first else ']')
+
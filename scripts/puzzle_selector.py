@@ -0,0 +1,243 @@
+"""
+Streaming puzzle selection with per-bucket quotas.
+
+A PuzzleSelector is fed puzzles one at a time and keeps, for each rating
+bucket, the best `quota` puzzles seen so far in a min-heap. Memory is bounded
+by the total quota, not by the size of the dump, and the result does not
+depend on the order in which puzzles arrive (nor on how a partitioned build
+splits the dump).
+
+Puzzles are ranked by (popularity, nb_plays, lichess_id). Duplicates of the
+same FEN are resolved in two steps that both keep that guarantee: within a
+bucket only the best-ranked copy competes for the quota, and when results
+are read, a position kept in several buckets stays only in the bucket of
+its best copy (that bucket's neighbours may then come out one short).
+Resolving across buckets while streaming would not be order-independent:
+dropping a copy from one bucket lowers that bucket's bar for puzzles it
+already turned away.
+
+Kept puzzles are held as compact PuzzleRecords and handed back as
+parse_row()-style dicts.
+"""
+
+import heapq
+from collections import Counter
+
+from puzzle_record import PuzzleRecord
+
+# Rating buckets and their share of the target count, matching the
+# distribution used by download_lichess_puzzles_official.py
+DEFAULT_BUCKETS = [
+    ('beginner', 600, 1200, 0.20),
+    ('intermediate', 1200, 1600, 0.25),
+    ('advanced', 1600, 2000, 0.25),
+    ('expert', 2000, 2400, 0.20),
+    ('master', 2400, 3000, 0.10),
+]
+
+
+def rank_key(puzzle):
+    """Ordering used to decide which puzzles a full bucket keeps."""
+    return (puzzle['popularity'], puzzle['nb_plays'], puzzle['lichess_id'])
+
+
+class PuzzleSelector:
+    """
+    Select the best puzzles per rating bucket from a stream.
+
+    Args:
+        name: Label used in progress output and file names
+        target_count: Total number of puzzles to keep
+        buckets: List of (name, min_rating, max_rating, share) tuples
+        min_popularity: Skip puzzles below this popularity
+        min_plays: Skip puzzles with fewer plays
+        max_rating_deviation: Skip puzzles with a less certain rating
+        themes: If set, only keep puzzles with at least one of these themes
+    """
+
+    def __init__(self, name, target_count, buckets=None, min_popularity=50,
+                 min_plays=50, max_rating_deviation=None, themes=None):
+        self.name = name
+        self.target_count = target_count
+        self.buckets = list(buckets or DEFAULT_BUCKETS)
+        self.min_popularity = min_popularity
+        self.min_plays = min_plays
+        self.max_rating_deviation = max_rating_deviation
+        self.themes = set(themes) if themes else None
+
+        self.quotas = self._split_quota(target_count)
+        self.heaps = {bucket[0]: [] for bucket in self.buckets}
+        self.kept_fens = {bucket[0]: {} for bucket in self.buckets}
+        self.theme_counts = Counter()
+        self.offered = 0
+        self.accepted = 0
+
+    def _split_quota(self, target_count):
+        """Distribute target_count over buckets by share, summing exactly."""
+        quotas = {}
+        remaining = target_count
+        for i, (name, _, _, share) in enumerate(self.buckets):
+            if i == len(self.buckets) - 1:
+                quotas[name] = remaining
+            else:
+                quotas[name] = int(target_count * share)
+                remaining -= quotas[name]
+        return quotas
+
+    def bucket_for(self, rating):
+        """Return the bucket name for a rating, or None if out of range."""
+        for name, min_rating, max_rating, _ in self.buckets:
+            if min_rating <= rating < max_rating:
+                return name
+        return None
+
+    def accepts(self, puzzle):
+        """Check the selector's filters (not its quotas)."""
+        if puzzle['popularity'] < self.min_popularity:
+            return False
+        if puzzle['nb_plays'] < self.min_plays:
+            return False
+        if (self.max_rating_deviation is not None
+                and puzzle['rating_deviation'] > self.max_rating_deviation):
+            return False
+        if self.themes is not None:
+            if not self.themes.intersection(puzzle['themes'].split()):
+                return False
+        return True
+
+    def offer(self, puzzle):
+        """
+        Consider a puzzle for selection.
+
+        Returns:
+            True if the puzzle is currently kept
+        """
+        self.offered += 1
+        if not self.accepts(puzzle):
+            return False
+
+        bucket = self.bucket_for(puzzle['rating'])
+        if bucket is None or self.quotas[bucket] <= 0:
+            return False
+
+        self.accepted += 1
+        self.theme_counts.update(puzzle['themes'].split())
+        return self._push(bucket, rank_key(puzzle), puzzle)
+
+    def _push(self, bucket, key, puzzle):
+        """Insert into a bucket heap, enforcing the quota and FEN dedup."""
+        heap = self.heaps[bucket]
+        fens = self.kept_fens[bucket]
+        fen = puzzle['fen']
+
+        existing = fens.get(fen)
+        if existing is not None:
+            if existing >= key:
+                return False
+            # A better copy of a kept position takes its place
+            heap[:] = [e for e in heap if e[0] != existing]
+            heapq.heapify(heap)
+        elif len(heap) >= self.quotas[bucket] and key <= heap[0][0]:
+            return False
+
+        if not isinstance(puzzle, PuzzleRecord):
+            puzzle = PuzzleRecord.from_dict(puzzle)
+        if len(heap) < self.quotas[bucket]:
+            heapq.heappush(heap, (key, puzzle))
+        else:
+            _, evicted = heapq.heapreplace(heap, (key, puzzle))
+            del fens[evicted.fen]
+
+        fens[fen] = key
+        return True
+
+    def is_full(self):
+        """True once every bucket has reached its quota."""
+        return all(len(self.heaps[name]) >= quota
+                   for name, quota in self.quotas.items())
+
+    def _kept(self):
+        """
+        Return (bucket, record) pairs with positions kept in several buckets
+        reduced to their best-ranked copy.
+        """
+        best = {}
+        for bucket, heap in self.heaps.items():
+            for key, record in heap:
+                current = best.get(record.fen)
+                if current is None or key > current[0]:
+                    best[record.fen] = (key, bucket, record)
+        return [(bucket, record) for _, bucket, record in best.values()]
+
+    def selected(self):
+        """Return the kept puzzles sorted by rating, then Lichess ID."""
+        records = [record for _, record in self._kept()]
+        records.sort(key=lambda r: (r.rating, r.lichess_id))
+        return [record.to_dict() for record in records]
+
+    def bucket_sizes(self):
+        """Return {bucket name: selected count} in bucket order."""
+        counts = Counter(bucket for bucket, _ in self._kept())
+        return {name: counts[name] for name, _, _, _ in self.buckets}
+
+    def config(self):
+        """Return the constructor arguments, for rebuilding the selector."""
+        return {
+            'name': self.name,
+            'target_count': self.target_count,
+            'buckets': [list(bucket) for bucket in self.buckets],
+            'min_popularity': self.min_popularity,
+            'min_plays': self.min_plays,
+            'max_rating_deviation': self.max_rating_deviation,
+            'themes': sorted(self.themes) if self.themes else None,
+        }
+
+    def to_state(self):
+        """
+        Serialize the selector's partial state as JSON-compatible data.
+
+        The state holds the kept puzzles per bucket, theme counts of accepted
+        puzzles and the counters; the FEN dedup index is rebuilt on load.
+        """
+        return {
+            'config': self.config(),
+            'heaps': {bucket: [record.to_dict() for _, record in heap]
+                      for bucket, heap in self.heaps.items()},
+            'theme_counts': dict(self.theme_counts),
+            'offered': self.offered,
+            'accepted': self.accepted,
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        """Rebuild a selector from to_state() output."""
+        config = dict(state['config'])
+        config['buckets'] = [tuple(bucket) for bucket in config['buckets']]
+        selector = cls(**config)
+        for bucket, puzzles in state['heaps'].items():
+            for puzzle in puzzles:
+                selector._push(bucket, rank_key(puzzle), puzzle)
+        selector.theme_counts.update(state['theme_counts'])
+        selector.offered = state['offered']
+        selector.accepted = state['accepted']
+        return selector
+
+    def merge(self, other):
+        """
+        Fold another selector's partial state into this one.
+
+        Both selectors must share the same config. Because each bucket is a
+        top-k over a total order (with per-bucket FEN dedup) and duplicates
+        across buckets are only resolved when results are read, merging
+        partials built from disjoint parts of the dump gives the same result
+        as one pass over all of it.
+        """
+        if other.config() != self.config():
+            raise ValueError(f'Cannot merge selector {other.name!r} '
+                             f'into {self.name!r}: configs differ')
+        for bucket, heap in other.heaps.items():
+            for key, puzzle in heap:
+                self._push(bucket, key, puzzle)
+        self.theme_counts.update(other.theme_counts)
+        self.offered += other.offered
+        self.accepted += other.accepted
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Precompute a top-k "more like this" table for every puzzle.
+
+After a solve the app draws the next puzzle uniformly from its candidate
+list, so staying on a motif needs a full filter pass. This builds a
+feature vector per puzzle and stores each puzzle's k nearest neighbours,
+which turns "next similar puzzle" into a table lookup on device.
+
+Feature vector (squared Euclidean distance, weights in WEIGHTS):
+
+  themes     multi-hot over the theme vocabulary, L2-normalized; generic
+             length/phase/outcome tags (GENERIC_THEMES) count less than
+             tactical motifs, so a shared fork outweighs a shared 'short'
+  phase      0-24 non-pawn material (puzzle_features.py), scaled to 0-1
+  material   solver's material balance, clipped to +-MATERIAL_CLIP pawns
+  rating     rating / RATING_SCALE, so RATING_SCALE points of difference
+             cost as much as a full motif mismatch
+
+Distances are computed a block of rows at a time against all puzzles
+(|a|^2 + |b|^2 - 2ab as one matrix product), with the block height chosen
+so the block's distance matrix fits in --memory-mb. The k smallest per row
+are found with argpartition; ties are broken by puzzle index so the table
+is reproducible.
+
+Output is neighbour indices into puzzles.json, nearest first, as one flat
+array: the neighbours of puzzles[i] are neighbors[i*k:(i+1)*k]. Indices
+only mean something against the exact puzzle list they were computed
+from, so the table carries that list's records_checksum (puzzle_delta.py)
+and load_neighbors() refuses a table whose source no longer matches.
+
+  {"version": 2, "k": 16, "count": 10000, "source": "<sha256>",
+   "neighbors": [...]}
+
+Requires numpy (pip install numpy).
+
+Usage:
+  python scripts/puzzle_similarity.py [--input FILE_OR_DUMP] [--k 16]
+      [--output FILE] [--npz FILE] [--memory-mb 256]
+"""
+
+import argparse
+import json
+import sys
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from build_bench_suites import iter_input
+from build_puzzle_tables import GENERIC_THEMES, split_themes
+from puzzle_delta import records_checksum
+from puzzle_features import PHASE_MAX, extract_features
+
+INPUT_FILE = 'assets/puzzles/puzzles.json'
+OUTPUT_FILE = 'assets/puzzles/puzzle_neighbors.json'
+SIMILARITY_VERSION = 2
+
+DEFAULT_K = 16
+MEMORY_MB = 256
+
+# Relative weight of each feature group in the distance
+WEIGHTS = {
+    'themes': 1.0,
+    'phase': 0.5,
+    'material': 0.35,
+    'rating': 1.0,
+}
+GENERIC_THEME_WEIGHT = 0.35
+MATERIAL_CLIP = 9
+RATING_SCALE = 400
+
+
+def theme_matrix(puzzles):
+    """
+    Build the L2-normalized, weighted multi-hot theme matrix.
+
+    Returns:
+        (float32 array of shape (len(puzzles), vocabulary size), vocabulary)
+    """
+    theme_lists = [split_themes(p.get('themes', '')) for p in puzzles]
+    vocabulary = sorted({t for themes in theme_lists for t in themes})
+    column = {theme: i for i, theme in enumerate(vocabulary)}
+    weight = np.array([GENERIC_THEME_WEIGHT if t in GENERIC_THEMES else 1.0
+                       for t in vocabulary], dtype=np.float32)
+
+    matrix = np.zeros((len(puzzles), len(vocabulary)), dtype=np.float32)
+    for row, themes in enumerate(theme_lists):
+        matrix[row, [column[t] for t in themes]] = 1.0
+    matrix *= weight
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix, vocabulary
+
+
+def feature_vectors(puzzles, columns):
+    """
+    Stack the weighted feature groups into one float32 matrix.
+
+    Args:
+        puzzles: Puzzle dicts, in puzzles.json order
+        columns: extract_features() output for the same puzzles
+    """
+    themes, _ = theme_matrix(puzzles)
+    phase = columns['phase'].astype(np.float32) / PHASE_MAX
+    material = np.clip(columns['material'], -MATERIAL_CLIP,
+                       MATERIAL_CLIP).astype(np.float32) / MATERIAL_CLIP
+    rating = columns['rating'].astype(np.float32) / RATING_SCALE
+    # Center the rating so the float32 dot products keep their precision
+    rating -= rating.mean() if len(rating) else 0
+    return np.hstack([
+        themes * WEIGHTS['themes'],
+        (phase * WEIGHTS['phase'])[:, None],
+        (material * WEIGHTS['material'])[:, None],
+        (rating * WEIGHTS['rating'])[:, None],
+    ]).astype(np.float32)
+
+
+def block_rows(count, memory_mb=MEMORY_MB):
+    """Rows per block so a block's distance matrix and scratch fit the budget."""
+    # Distances plus the argpartition index array and the tie mask
+    per_row = max(count, 1) * (4 + 8 + 1)
+    return max(1, memory_mb * 1024 * 1024 // per_row)
+
+
+def nearest_neighbors(vectors, k, memory_mb=MEMORY_MB):
+    """
+    Find the k nearest other rows of every row, blocked to bound memory.
+
+    Returns:
+        int64 array of shape (rows, k), nearest first, ties by lower index
+    """
+    count = len(vectors)
+    k = min(k, count - 1)
+    result = np.zeros((count, max(k, 0)), dtype=np.int64)
+    if k <= 0:
+        return result
+
+    norms = np.einsum('ij,ij->i', vectors, vectors)
+    rows = block_rows(count, memory_mb)
+    for start in range(0, count, rows):
+        stop = min(start + rows, count)
+        block = np.arange(stop - start)
+        dist = vectors[start:stop] @ vectors.T
+        dist *= -2
+        dist += norms[start:stop, None]
+        dist += norms[None, :]
+        dist[block, start + block] = np.inf
+
+        candidates = np.argpartition(dist, k - 1, axis=1)[:, :k]
+        picked = np.take_along_axis(dist, candidates, axis=1)
+        order = np.lexsort((candidates, picked), axis=1)
+        result[start:stop] = np.take_along_axis(candidates, order, axis=1)
+
+        # argpartition picks arbitrarily among values tied with the k-th;
+        # redo those rows taking the lowest indices
+        kth = picked.max(axis=1)
+        tied = np.flatnonzero((dist <= kth[:, None]).sum(axis=1) > k)
+        for row in tied:
+            within = np.flatnonzero(dist[row] <= kth[row])
+            order = np.lexsort((within, dist[row, within]))[:k]
+            result[start + row] = within[order]
+        print(f"  Ranked {stop}/{count} puzzles...", end='\r')
+    print()
+    return result
+
+
+def save_neighbors(neighbors, source, output_file):
+    """
+    Write the table as compact JSON with one flat neighbour array.
+
+    Args:
+        neighbors: nearest_neighbors() output
+        source: records_checksum() of the puzzles the indices refer to
+        output_file: Path of the JSON table
+    """
+    count, k = neighbors.shape
+    data = {
+        'version': SIMILARITY_VERSION,
+        'k': k,
+        'count': count,
+        'source': source,
+        'neighbors': neighbors.ravel().tolist(),
+    }
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(data, f, separators=(',', ':'))
+
+
+def load_neighbors(input_file, puzzles):
+    """
+    Read a JSON table back, checking it was built from these puzzles.
+
+    Returns:
+        int64 array of shape (count, k)
+
+    Raises:
+        ValueError: If the table's version, count or source checksum does
+            not match
+    """
+    with open(input_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if data.get('version') != SIMILARITY_VERSION:
+        raise ValueError(f"Unsupported neighbour table version "
+                         f"{data.get('version')}")
+    if data['count'] != len(puzzles) or \
+            data['source'] != records_checksum(puzzles):
+        raise ValueError(f"{input_file} was built from a different puzzle set")
+    neighbors = np.array(data['neighbors'], dtype=np.int64)
+    return neighbors.reshape(data['count'], data['k'])
+
+
+def save_npz(neighbors, source, output_file):
+    """Write the table as uint16 (uint32 past 65536 puzzles) in an .npz."""
+    dtype = np.uint16 if len(neighbors) <= 1 << 16 else np.uint32
+    np.savez_compressed(output_file, neighbors=neighbors.astype(dtype),
+                        source=np.array(source))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Precompute nearest-neighbour puzzles for "more like this"')
+    parser.add_argument('--input', default=INPUT_FILE,
+                        help=f'puzzles JSON or dump source (default: {INPUT_FILE})')
+    parser.add_argument('--k', type=int, default=DEFAULT_K,
+                        help=f'neighbours per puzzle (default: {DEFAULT_K})')
+    parser.add_argument('--output', default=OUTPUT_FILE,
+                        help=f'JSON table (default: {OUTPUT_FILE})')
+    parser.add_argument('--npz', default=None,
+                        help='also write the table as a compressed .npz')
+    parser.add_argument('--memory-mb', type=int, default=MEMORY_MB,
+                        help=f'memory budget for one block of distances '
+                             f'(default: {MEMORY_MB})')
+    args = parser.parse_args()
+
+    if np is None:
+        print("numpy library NOT found.")
+        print("Please run: pip install numpy")
+        return 1
+    if args.k < 1:
+        print("ERROR: --k must be at least 1")
+        return 1
+
+    print(f"Loading puzzles from {args.input}...")
+    try:
+        puzzles = list(iter_input(args.input))
+    except (OSError, RuntimeError, json.JSONDecodeError) as e:
+        print(f"ERROR: Could not read {args.input}: {e}")
+        return 1
+    if len(puzzles) < 2:
+        print(f"ERROR: Need at least 2 puzzles, got {len(puzzles)}")
+        return 1
+
+    start = time.perf_counter()
+    columns = extract_features(puzzles)
+    vectors = feature_vectors(puzzles, columns)
+    print(f"  {vectors.shape[1]} features per puzzle, "
+          f"{block_rows(len(puzzles), args.memory_mb)} rows per block")
+    neighbors = nearest_neighbors(vectors, args.k, args.memory_mb)
+    elapsed = time.perf_counter() - start
+
+    source = records_checksum(puzzles)
+    save_neighbors(neighbors, source, args.output)
+    print(f"✓ {neighbors.shape[1]} neighbours for {len(puzzles)} puzzles "
+          f"in {elapsed:.1f}s -> {args.output}")
+    if args.npz:
+        save_npz(neighbors, source, args.npz)
+        print(f"  Wrote {args.npz}")
+
+    motifs = [{t for t in split_themes(p.get('themes', ''))
+               if t not in GENERIC_THEMES} for p in puzzles]
+    shared = sum(bool(motifs[i] & motifs[j])
+                 for i, row in enumerate(neighbors) if motifs[i]
+                 for j in row[:1])
+    with_motif = sum(1 for m in motifs if m)
+    if with_motif:
+        print(f"  Nearest neighbour shares a motif: "
+              f"{shared / with_motif:.1%} of {with_motif} puzzles")
+    rating = columns['rating']
+    gap = np.abs(rating[neighbors[:, 0]] - rating)
+    print(f"  Nearest neighbour rating gap: median {int(np.median(gap))}, "
+          f"p90 {int(np.percentile(gap, 90))}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
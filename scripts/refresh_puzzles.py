@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Refresh ratings, popularity and themes of the shipped puzzles from a newer
+Lichess dump.
+
+Ratings and popularity drift from one monthly dump to the next, but
+re-running the selection would change which puzzles ship. This keeps the
+set fixed: it loads the shipped puzzles into a hash table keyed by Lichess
+puzzle ID, streams the new dump once, and updates every puzzle it finds in
+place. Memory is bounded by the shipped set, not the dump.
+
+Puzzles are matched by their lichess_id field (written by import_puzzles.py
+and build_puzzle_tiers.py). Puzzles without one are matched by their id,
+which the dump-based builders derive from the Lichess ID with
+lichess_numeric_id(), and failing that by their exact (FEN, moves): older
+sets such as the shipped puzzles.json (download_lichess_puzzles_official.py)
+used a salted hash() of the Lichess ID that cannot be reproduced. A match
+is only applied if the FEN and moves are unchanged, so a colliding or
+reused ID can never rewrite a different puzzle.
+
+The report lists how many puzzles were found, missing or conflicting, and
+the rating, popularity and theme drift. --drop-missing refuses to run when
+fewer than --min-match-rate of the puzzles were found, since that means the
+join failed, not that the puzzles left the dump.
+
+Usage:
+  python scripts/refresh_puzzles.py --dump lichess_db_puzzle.csv.zst
+      [--input assets/puzzles/puzzles.json] [--output FILE]
+      [--report build/refresh_report.json] [--drop-missing]
+      [--min-match-rate 0.5] [--dry-run]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from collections import Counter
+
+from build_puzzle_tables import split_themes
+from lichess_dump import (LICHESS_DB_URL, iter_dump_rows, lichess_numeric_id,
+                          parse_row)
+
+INPUT_FILE = 'assets/puzzles/puzzles.json'
+REPORT_FILE = 'build/refresh_report.json'
+
+REFRESHED_FIELDS = ('rating', 'popularity', 'themes')
+
+# Share of the shipped set that must be found before --drop-missing may
+# delete the rest
+MIN_MATCH_RATE = 0.5
+
+
+def build_index(puzzles):
+    """
+    Hash the shipped set for the join.
+
+    Returns:
+        (by Lichess ID string -> index, by numeric id -> index,
+         by (fen, moves) -> index) where the last two tables only hold
+        puzzles without a lichess_id
+    """
+    by_lichess_id = {}
+    by_numeric_id = {}
+    by_position = {}
+    for i, puzzle in enumerate(puzzles):
+        if puzzle.get('lichess_id'):
+            by_lichess_id[puzzle['lichess_id']] = i
+            continue
+        if puzzle.get('id') is not None:
+            by_numeric_id[puzzle['id']] = i
+        by_position.setdefault((puzzle['fen'], puzzle['moves']), i)
+    return by_lichess_id, by_numeric_id, by_position
+
+
+def match_row(puzzles, tables, row):
+    """
+    Find the shipped puzzle a raw dump row refers to.
+
+    Args:
+        tables: build_index() output
+
+    Returns:
+        (puzzle index, same FEN and moves) or (None, False) if no puzzle
+        matches. Only a lichess_id match can come back with different FEN
+        or moves; that is a conflict.
+    """
+    if len(row) < 3:
+        return None, False
+    by_lichess_id, by_numeric_id, by_position = tables
+    position = (row[1], row[2])
+    index = by_lichess_id.get(row[0])
+    if index is not None:
+        puzzle = puzzles[index]
+        return index, (puzzle['fen'], puzzle['moves']) == position
+    if by_numeric_id:
+        try:
+            index = by_numeric_id.get(lichess_numeric_id(row[0]))
+        except ValueError:
+            index = None
+        if index is not None:
+            puzzle = puzzles[index]
+            if (puzzle['fen'], puzzle['moves']) == position:
+                return index, True
+    index = by_position.get(position)
+    return index, index is not None
+
+
+def distribution(deltas):
+    """Summarize a list of signed changes."""
+    if not deltas:
+        return {'changed': 0}
+    magnitudes = sorted(abs(d) for d in deltas)
+    return {
+        'changed': sum(1 for d in deltas if d),
+        'mean': round(statistics.mean(deltas), 2),
+        'mean_abs': round(statistics.mean(magnitudes), 2),
+        'p50_abs': magnitudes[len(magnitudes) // 2],
+        'p90_abs': magnitudes[int(len(magnitudes) * 0.9)],
+        'max_abs': magnitudes[-1],
+    }
+
+
+def refresh(puzzles, rows):
+    """
+    Join dump rows against the shipped puzzles and update them in place.
+
+    Args:
+        puzzles: Shipped puzzle dicts (modified in place)
+        rows: Raw dump CSV rows
+
+    Returns:
+        (set of matched puzzle indices, list of conflicting lichess IDs,
+         drift dict)
+    """
+    tables = build_index(puzzles)
+    matched = set()
+    conflicts = []
+    rating_deltas = []
+    popularity_deltas = []
+    themes_changed = 0
+    themes_added = Counter()
+    themes_removed = Counter()
+
+    for row in rows:
+        index, same = match_row(puzzles, tables, row)
+        if index is None or index in matched:
+            continue
+        if not same:
+            conflicts.append(row[0])
+            continue
+        fresh = parse_row(row)
+        if fresh is None:
+            continue
+        puzzle = puzzles[index]
+        matched.add(index)
+
+        rating_deltas.append(fresh['rating'] - puzzle['rating'])
+        popularity_deltas.append(fresh['popularity'] - puzzle.get('popularity', 0))
+        old_themes = set(split_themes(puzzle['themes']))
+        new_themes = set(split_themes(fresh['themes']))
+        if old_themes != new_themes:
+            themes_changed += 1
+            themes_added.update(new_themes - old_themes)
+            themes_removed.update(old_themes - new_themes)
+
+        for field in REFRESHED_FIELDS:
+            puzzle[field] = fresh[field]
+
+    drift = {
+        'rating': distribution(rating_deltas),
+        'popularity': distribution(popularity_deltas),
+        'themes': {
+            'changed': themes_changed,
+            'added': dict(themes_added.most_common(20)),
+            'removed': dict(themes_removed.most_common(20)),
+        },
+    }
+    return matched, conflicts, drift
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Refresh shipped puzzles from a newer Lichess dump')
+    parser.add_argument('--dump', default=LICHESS_DB_URL,
+                        help='dump URL, .csv.zst or .csv (default: official URL)')
+    parser.add_argument('--input', default=INPUT_FILE,
+                        help=f'shipped puzzles JSON (default: {INPUT_FILE})')
+    parser.add_argument('--output', default=None,
+                        help='where to write the refreshed set '
+                             '(default: overwrite --input)')
+    parser.add_argument('--report', default=REPORT_FILE,
+                        help=f'JSON drift report (default: {REPORT_FILE})')
+    parser.add_argument('--drop-missing', action='store_true',
+                        help='remove puzzles that are no longer in the dump')
+    parser.add_argument('--min-match-rate', type=float, default=MIN_MATCH_RATE,
+                        help='share of puzzles that must be found for '
+                             f'--drop-missing to run (default: {MIN_MATCH_RATE})')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='only write the report')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input):
+        print(f"ERROR: File not found: {args.input}")
+        return 1
+
+    with open(args.input, 'r', encoding='utf-8') as f:
+        puzzles = json.load(f)
+    print(f"Loaded {len(puzzles)} shipped puzzles from {args.input}")
+    print(f"Streaming {args.dump}...")
+
+    start = time.perf_counter()
+    try:
+        matched, conflicts, drift = refresh(puzzles, iter_dump_rows(args.dump))
+    except (OSError, RuntimeError) as e:
+        print(f"ERROR: {e}")
+        return 1
+    elapsed = time.perf_counter() - start
+
+    missing = [puzzles[i].get('lichess_id') or puzzles[i].get('id')
+               for i in range(len(puzzles)) if i not in matched]
+    print(f"✓ Joined in {elapsed:.1f}s: {len(matched)} refreshed, "
+          f"{len(missing)} missing, {len(conflicts)} conflicting")
+    for field in ('rating', 'popularity'):
+        stats = drift[field]
+        if stats['changed']:
+            print(f"  {field}: {stats['changed']} changed, mean "
+                  f"{stats['mean']:+}, p90 |change| {stats['p90_abs']}, "
+                  f"max {stats['max_abs']}")
+        else:
+            print(f"  {field}: unchanged")
+    print(f"  themes: {drift['themes']['changed']} changed")
+
+    os.makedirs(os.path.dirname(args.report) or '.', exist_ok=True)
+    with open(args.report, 'w', encoding='utf-8') as f:
+        json.dump({'dump': args.dump, 'shipped': len(puzzles),
+                   'refreshed': len(matched), 'missing': missing,
+                   'conflicts': conflicts, 'drift': drift}, f, indent=2)
+    print(f"  Report: {args.report}")
+
+    if args.dry_run:
+        return 0
+
+    match_rate = len(matched) / max(len(puzzles), 1)
+    if args.drop_missing and missing and (not matched or
+                                          match_rate < args.min_match_rate):
+        print(f"ERROR: Only {match_rate:.1%} of the puzzles were found in the "
+              f"dump (--min-match-rate {args.min_match_rate}); refusing to "
+              f"drop {len(missing)} puzzles; nothing written to "
+              f"{args.output or args.input}.")
+        return 1
+    if args.drop_missing and missing:
+        puzzles = [p for i, p in enumerate(puzzles) if i in matched]
+        print(f"  Dropped {len(missing)} puzzles no longer in the dump")
+
+    output_file = args.output or args.input
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(puzzles, f, indent=2, ensure_ascii=False)
+    print(f"  Wrote {len(puzzles)} puzzles to {output_file}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Scripted stand-in UCI engine for exercising engine-backed build stages.
+
+Speaks enough UCI for uci_engine.UciEngine and answers every search from a
+JSON script instead of searching, so verification and sweep tools can be run
+on machines without Stockfish and with fully predictable answers.
+
+Script format:
+  {
+    "name": "Scripted",
+    "delay_ms": 0,
+    "positions": {
+      "<fen>": [{"cp": 350, "pv": "h5f7 e8e7"}, {"cp": 20, "pv": "d2d3"}],
+      "<fen> moves e2e4 e7e5": [{"mate": 1, "pv": "d1h5"}]
+    },
+    "default": [{"cp": 0, "pv": "0000"}]
+  }
+
+Keys are the FEN plus any moves exactly as sent in the 'position' command.
+Lines are listed best first; only the first MultiPV lines are reported.
+
+Usage:
+  python scripts/scripted_uci_engine.py SCRIPT.json
+"""
+
+import json
+import sys
+import time
+
+
+def main():
+    script = {}
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], 'r', encoding='utf-8') as f:
+            script = json.load(f)
+
+    positions = script.get('positions', {})
+    default = script.get('default', [])
+    delay = script.get('delay_ms', 0) / 1000.0
+    options = {'MultiPV': 1}
+    position = None
+
+    def out(line):
+        sys.stdout.write(line + '\n')
+        sys.stdout.flush()
+
+    for raw in sys.stdin:
+        command = raw.strip()
+        if command == 'uci':
+            out(f"id name {script.get('name', 'Scripted')}")
+            out('id author ChessMaster build scripts')
+            out('option name MultiPV type spin default 1 min 1 max 500')
+            out('uciok')
+        elif command == 'isready':
+            out('readyok')
+        elif command.startswith('setoption name '):
+            name, _, value = command[len('setoption name '):].partition(' value ')
+            options[name.strip()] = value.strip()
+        elif command.startswith('position '):
+            position = command[len('position '):]
+            if position.startswith('fen '):
+                position = position[len('fen '):]
+        elif command.startswith('go'):
+            if delay:
+                time.sleep(delay)
+            lines = positions.get(position, default)
+            multipv = int(options.get('MultiPV', 1))
+            for i, line in enumerate(lines[:multipv], start=1):
+                if 'mate' in line:
+                    score = f"mate {line['mate']}"
+                else:
+                    score = f"cp {line.get('cp', 0)}"
+                out(f"info depth {line.get('depth', 20)} multipv {i} "
+                    f"score {score} nodes {line.get('nodes', 1000)} "
+                    f"pv {line['pv']}")
+            best = lines[0]['pv'].split()[0] if lines else '(none)'
+            out(f'bestmove {best}')
+        elif command == 'quit':
+            break
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,291 @@
+"""
+Shared-memory column transport for process-pool stages.
+
+Handing puzzle dicts to Pool workers pickles every record on the way in
+and every result on the way out, which costs more than the vectorized
+work the legality screen and feature extraction do per row. Instead, a
+ColumnPool packs each batch of puzzles into NumPy columns in one
+multiprocessing.shared_memory block (strings as a byte buffer plus
+offsets), preallocates the output columns in a second block, and sends
+workers only (function, block layouts, start, stop). Workers attach to
+the blocks, parse their rows straight from the byte columns (no puzzle
+dicts are rebuilt), and write their results into the output arrays; the
+only thing pickled back is the task's small return value.
+
+Task functions have the signature func(inputs, outputs, start, stop),
+where inputs and outputs are SharedColumns, and must be module-level so
+they can be pickled by reference. slice_rows() gives a task the columns
+of its rows in the same form pack_puzzles() returns, so the single-process
+path runs the same block functions on pack_puzzles() output.
+
+Requires numpy (pip install numpy).
+"""
+
+import os
+from multiprocessing import Pool, resource_tracker, shared_memory
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from lichess_dump import lichess_numeric_id
+
+# Puzzle fields shipped to workers: strings, then integers
+STRING_FIELDS = ('fen', 'moves', 'themes')
+INT_FIELDS = ('id', 'rating')
+
+# Rows packed into shared memory per batch and per worker
+BATCH_ROWS_PER_WORKER = 50000
+
+ALIGNMENT = 64
+
+
+def _attach_untracked(name):
+    """
+    Open an existing block without registering it with the resource tracker.
+
+    Before Python 3.13 (track=False) every attach registers the block as if
+    the attaching process owned it, and the tracker then "cleans up" the
+    creator's block or warns about leaks when workers exit. Only the
+    creator should track it.
+    """
+    register = resource_tracker.register
+    resource_tracker.register = lambda *args: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+class SharedColumns:
+    """
+    Named NumPy arrays laid out back to back in one shared memory block.
+
+    Args:
+        spec: List of (name, dtype, shape)
+        name: Attach to this existing block instead of creating one
+    """
+
+    def __init__(self, spec, name=None):
+        self.spec = [(column, np.dtype(dtype).str, tuple(shape))
+                     for column, dtype, shape in spec]
+        offsets = []
+        size = 0
+        for _, dtype, shape in self.spec:
+            offsets.append(size)
+            nbytes = np.dtype(dtype).itemsize * int(np.prod(shape))
+            size += -(-nbytes // ALIGNMENT) * ALIGNMENT
+
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True,
+                                                  size=max(size, 1))
+        else:
+            self.shm = _attach_untracked(name)
+        self.arrays = {
+            column: np.ndarray(shape, dtype=dtype, buffer=self.shm.buf,
+                               offset=offset)
+            for (column, dtype, shape), offset in zip(self.spec, offsets)
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """Create a block holding copies of a dict of arrays."""
+        columns = cls([(name, array.dtype, array.shape)
+                       for name, array in arrays.items()])
+        for name, array in arrays.items():
+            columns.arrays[name][...] = array
+        return columns
+
+    @classmethod
+    def attach(cls, layout):
+        """Attach to a block from another process's layout()."""
+        name, spec = layout
+        return cls(spec, name=name)
+
+    def layout(self):
+        """Picklable description of the block for attach()."""
+        return self.shm.name, self.spec
+
+    def __getitem__(self, column):
+        return self.arrays[column]
+
+    def close(self):
+        """Release this process's mapping; the creator also frees the block."""
+        # Views into the buffer must be gone before it can be closed
+        self.arrays = {}
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def pack_strings(values):
+    """
+    Store strings back to back.
+
+    Returns:
+        (uint8 data, int64 offsets of length len(values) + 1)
+    """
+    lengths = [len(value) for value in values]
+    data = ''.join(values).encode('utf-8')
+    if len(data) != sum(lengths):
+        # Non-ASCII text: character counts are not byte counts
+        encoded = [value.encode('utf-8') for value in values]
+        lengths = [len(value) for value in encoded]
+        data = b''.join(encoded)
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return np.frombuffer(data, dtype=np.uint8), offsets
+
+
+def unpack_strings(data, offsets):
+    """Decode a pack_strings() column back to a list of strings."""
+    raw = data.tobytes()
+    bounds = (offsets - offsets[0]).tolist()
+    return [raw[a:b].decode('utf-8') for a, b in zip(bounds, bounds[1:])]
+
+
+def pack_puzzles(puzzles):
+    """
+    Columns holding what the workers need of each puzzle.
+
+    Returns:
+        Dict of column name -> array, for SharedColumns.from_arrays()
+    """
+    columns = {}
+    for field in STRING_FIELDS:
+        data, offsets = pack_strings([p.get(field) or '' for p in puzzles])
+        columns[f'{field}_data'] = data
+        columns[f'{field}_offsets'] = offsets
+    columns['id'] = np.array([p['id'] if p.get('id') is not None
+                              else lichess_numeric_id(p.get('lichess_id', ''))
+                              for p in puzzles], dtype=np.int64)
+    columns['rating'] = np.array([p.get('rating', 0) for p in puzzles],
+                                 dtype=np.int64)
+    return columns
+
+
+def slice_rows(columns, start, stop):
+    """
+    Rows start..stop of pack_puzzles() columns, as pack_puzzles() columns.
+
+    String data and integer columns are views; only the offsets are copied,
+    rebased to start at 0.
+    """
+    rows = {}
+    for field in STRING_FIELDS:
+        offsets = columns[f'{field}_offsets'][start:stop + 1]
+        rows[f'{field}_data'] = columns[f'{field}_data'][offsets[0]:offsets[-1]]
+        rows[f'{field}_offsets'] = offsets - offsets[0]
+    for field in INT_FIELDS:
+        rows[field] = columns[field][start:stop]
+    return rows
+
+
+def row_string(columns, field, row):
+    """Decode one row's string field from pack_puzzles() columns."""
+    offsets = columns[f'{field}_offsets']
+    data = columns[f'{field}_data'][offsets[row]:offsets[row + 1]]
+    return data.tobytes().decode('utf-8')
+
+
+# Blocks the current worker process is attached to, by block name
+_attached = {}
+
+
+def _attach(layout):
+    name = layout[0]
+    if name not in _attached:
+        _attached[name] = SharedColumns.attach(layout)
+    return _attached[name]
+
+
+def _run_task(args):
+    func, input_layout, output_layout, start, stop = args
+    # A new batch means new blocks; drop mappings of the previous one
+    for name in [n for n in _attached
+                 if n not in (input_layout[0], output_layout[0])]:
+        _attached.pop(name).close()
+    return func(_attach(input_layout), _attach(output_layout), start, stop)
+
+
+class ColumnPool:
+    """
+    Worker processes that run column tasks over shared memory.
+
+    Args:
+        workers: Number of processes (default: all cores)
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        self._pool = Pool(self.workers)
+
+    def run(self, func, inputs, outputs, rows, task_rows):
+        """
+        Run func(inputs, outputs, start, stop) over rows in task_rows slices.
+
+        Returns:
+            List of the tasks' return values, in row order
+        """
+        ranges = [(start, min(start + task_rows, rows))
+                  for start in range(0, rows, task_rows)]
+        return self._pool.map(
+            _run_task, [(func, inputs.layout(), outputs.layout(), start, stop)
+                        for start, stop in ranges], chunksize=1)
+
+    def map_batches(self, func, puzzles, output_spec, block_size,
+                    batch_rows=None):
+        """
+        Stream puzzles through func in shared-memory batches.
+
+        Args:
+            func: Task function writing rows start..stop of the outputs
+            puzzles: Iterable of puzzle dicts
+            output_spec: Function of a row count returning the outputs'
+                SharedColumns spec
+            block_size: Maximum rows per task
+            batch_rows: Rows packed per batch (default: scales with workers)
+
+        Yields:
+            (batch of puzzle dicts, dict of output arrays, task results)
+        """
+        batch_rows = batch_rows or BATCH_ROWS_PER_WORKER * self.workers
+        batch = []
+        for puzzle in puzzles:
+            batch.append(puzzle)
+            if len(batch) >= batch_rows:
+                yield self._run_batch(func, batch, output_spec, block_size)
+                batch = []
+        if batch:
+            yield self._run_batch(func, batch, output_spec, block_size)
+
+    def _run_batch(self, func, batch, output_spec, block_size):
+        # Enough tasks to keep every worker busy, none over block_size
+        task_rows = max(1, min(block_size, -(-len(batch) // self.workers)))
+        with SharedColumns.from_arrays(pack_puzzles(batch)) as inputs, \
+                SharedColumns(output_spec(len(batch))) as outputs:
+            results = self.run(func, inputs, outputs, len(batch), task_rows)
+            arrays = {name: array.copy()
+                      for name, array in outputs.arrays.items()}
+        return batch, arrays, results
+
+    def close(self):
+        self._pool.close()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if exc[0] is None:
+            self.close()
+        else:
+            self._pool.terminate()
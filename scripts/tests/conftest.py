@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The scripts import their siblings directly, as when run from scripts/
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, SCRIPTS_DIR)
@@ -0,0 +1,73 @@
+import json
+import sqlite3
+
+import pytest
+
+from analysis_cache import AnalysisCache, fen_key, position_key
+
+START = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+
+
+def analysis(depth, multipv, best='e2e4'):
+    return {'depth': depth, 'nodes': 1000, 'bestmove': best,
+            'lines': [{'multipv': i + 1, 'score': {'cp': 30 - i},
+                       'pv': [best]} for i in range(multipv)]}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    with AnalysisCache(str(tmp_path / 'cache.sqlite')) as cache:
+        yield cache
+
+
+def test_deeper_narrow_result_does_not_hide_a_wider_one(cache):
+    key = fen_key(START)
+    cache.put(key, analysis(20, 2), 2, 'sf')
+    cache.put(key, analysis(30, 1), 1, 'sf')
+    assert cache.get(key, min_multipv=2, engine='sf')['depth'] == 20
+    assert cache.get(key, min_depth=30, engine='sf')['depth'] == 30
+
+    cache.put(key, analysis(25, 2), 2, 'sf')
+    assert cache.get(key, min_multipv=2, engine='sf')['depth'] == 25
+    cache.put(key, analysis(20, 2), 2, 'sf')
+    assert cache.get(key, min_multipv=2, engine='sf')['depth'] == 25
+
+
+def test_lookups_are_per_engine(cache):
+    key = fen_key(START)
+    cache.put(key, analysis(20, 1), 1, 'stockfish 16')
+    assert cache.get(key, engine='stockfish 17') is None
+    assert cache.get(key, engine='stockfish 16')['depth'] == 20
+
+
+def test_uncapturable_en_passant_square_is_dropped():
+    fen = 'rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1'
+    assert fen_key(fen).endswith(' b KQkq -')
+    capturable = 'rnbqkbnr/ppp1pppp/8/8/3pP3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 3'
+    assert fen_key(capturable).endswith(' b KQkq e3')
+
+
+def test_played_and_written_positions_share_a_key():
+    pytest.importorskip('chess')
+    written = 'rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1'
+    assert position_key(START, ['e2e4']) == fen_key(written)
+
+
+def test_version_1_cache_is_migrated(tmp_path):
+    path = str(tmp_path / 'old.sqlite')
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE analysis (key TEXT PRIMARY KEY, '
+                 'depth INTEGER NOT NULL, multipv INTEGER NOT NULL, '
+                 'nodes INTEGER NOT NULL, bestmove TEXT, lines TEXT NOT NULL, '
+                 'engine TEXT, last_used REAL NOT NULL)')
+    old_key = 'rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3'
+    conn.execute('INSERT INTO analysis VALUES (?, 18, 1, 10, ?, ?, ?, 0)',
+                 (old_key, 'e7e5', json.dumps(analysis(18, 1)['lines']),
+                  'sf'))
+    conn.commit()
+    conn.close()
+
+    with AnalysisCache(path) as cache:
+        assert cache.count() == 1
+        found = cache.get(fen_key(old_key), engine='sf')
+        assert found['depth'] == 18
@@ -0,0 +1,32 @@
+from bench_history import group_samples, previous_commit
+
+FULL = '1b41b4c9e0a2d57f3c8b6a4e2f1d0c9b8a7e6f5d'
+
+
+def sample(commit, ms, dirty=False, metric='New parse'):
+    return {'bench': 'fen_parsing', 'metric': metric, 'ms': ms,
+            'commit': commit, 'dirty': dirty, 'machine': 'ci'}
+
+
+def test_commits_match_by_prefix_either_way():
+    history = [sample('1b41b4c', 10.0), sample(FULL, 11.0)]
+    key = ('fen_parsing', 'New parse')
+    assert group_samples(history, 'ci', FULL)[key] == [10.0, 11.0]
+    assert group_samples(history, 'ci', '1b41b4c')[key] == [10.0, 11.0]
+    assert group_samples(history, 'ci', '1b41b4d') == {}
+
+
+def test_dirty_samples_are_opt_in():
+    history = [sample('1b41b4c', 10.0), sample('1b41b4c', 50.0, dirty=True)]
+    key = ('fen_parsing', 'New parse')
+    assert group_samples(history, 'ci', '1b41b4c')[key] == [10.0]
+    assert group_samples(history, 'ci', '1b41b4c',
+                         include_dirty=True)[key] == [10.0, 50.0]
+
+
+def test_previous_commit_skips_dirty_and_current():
+    history = [sample('aaaaaaa', 10.0), sample('bbbbbbb', 10.0, dirty=True),
+               sample('1b41b4c', 10.0)]
+    assert previous_commit(history, 'ci', FULL) == 'aaaaaaa'
+    assert previous_commit(history, 'ci', FULL,
+                           include_dirty=True) == 'bbbbbbb'
@@ -0,0 +1,23 @@
+import random
+
+from build_opening_book import (build_entries, iter_entries, merge_counts,
+                                spill_counts)
+
+
+def test_spilled_runs_merge_to_the_same_entries(tmp_path):
+    rng = random.Random(5)
+    chunks = [{(rng.randrange(20), rng.randrange(4)):
+               [rng.randrange(1, 4), rng.randrange(8)] for _ in range(50)}
+              for _ in range(6)]
+
+    total = {}
+    for chunk in chunks:
+        for pair, (games, points) in chunk.items():
+            entry = total.setdefault(pair, [0, 0])
+            entry[0] += games
+            entry[1] += points
+
+    runs = [spill_counts(chunk, str(tmp_path)) for chunk in chunks[:-1]]
+    entries = list(iter_entries(merge_counts(runs, chunks[-1]), min_games=3))
+    assert entries == build_entries(total, min_games=3)
+    assert entries
@@ -0,0 +1,89 @@
+import csv
+import json
+import os
+import sys
+
+import pytest
+
+pytest.importorskip('numpy')
+pytest.importorskip('zstandard')
+
+import build_pipeline  # noqa: E402
+import build_puzzle_tiers  # noqa: E402
+from build_cache import BuildCache, stage_key  # noqa: E402
+
+ASSET = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__)))), 'assets', 'puzzles', 'puzzles.json')
+
+
+@pytest.fixture
+def dump(tmp_path):
+    """A 60-row dump CSV made from shipped puzzles."""
+    with open(ASSET, 'r', encoding='utf-8') as f:
+        puzzles = json.load(f)[::150][:60]
+    path = tmp_path / 'dump.csv'
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['PuzzleId', 'FEN', 'Moves', 'Rating',
+                         'RatingDeviation', 'Popularity', 'NbPlays', 'Themes',
+                         'GameUrl', 'OpeningTags'])
+        for i, p in enumerate(puzzles):
+            writer.writerow([f'p{i:04d}', p['fen'], p['moves'], p['rating'],
+                             80, 95, 5000, p['themes'],
+                             f'https://lichess.org/abcd{i:04d}#10',
+                             'Sicilian_Defense'])
+    return str(path)
+
+
+def run(monkeypatch, capsys, dump, tmp_path, fmt):
+    monkeypatch.setattr(sys, 'argv', [
+        'build_pipeline.py', '--source', dump, '--tiers', 'tiny',
+        '--format', fmt, '--output-dir', str(tmp_path / 'out'),
+        '--cache-dir', str(tmp_path / 'cache')])
+    assert build_pipeline.main() == 0
+    return capsys.readouterr().out
+
+
+@pytest.fixture(autouse=True)
+def tiny_tier(monkeypatch):
+    monkeypatch.setitem(build_puzzle_tiers.TIERS, 'tiny',
+                        {'target_count': 40, 'min_popularity': 0,
+                         'min_plays': 0})
+
+
+def test_rerun_is_all_cache_hits(monkeypatch, capsys, dump, tmp_path):
+    first = run(monkeypatch, capsys, dump, tmp_path, 'json')
+    assert '5 stages built, 0 cached' in first
+    second = run(monkeypatch, capsys, dump, tmp_path, 'json')
+    assert '0 stages built, 5 cached' in second
+
+
+def test_format_change_rebuilds_only_write(monkeypatch, capsys, dump,
+                                           tmp_path):
+    run(monkeypatch, capsys, dump, tmp_path, 'json')
+    out = run(monkeypatch, capsys, dump, tmp_path, 'pack')
+    assert '1 stages built, 4 cached' in out
+    assert 'tiny/write: built' in out
+    exported = os.listdir(tmp_path / 'out')
+    assert 'puzzles_tiny.pack' in exported
+    assert 'puzzles_tiny.json' not in exported
+
+
+def test_truncated_entry_fails_lookup(tmp_path):
+    cache = BuildCache(str(tmp_path / 'cache'))
+    key = stage_key('write', [1], format='json')
+
+    def produce(directory):
+        with open(os.path.join(directory, 'out.json'), 'w') as f:
+            f.write('[1, 2, 3]')
+
+    entry, hit = cache.get_or_build(key, 'write', produce)
+    assert not hit
+    assert cache.lookup(key) == entry
+
+    with open(os.path.join(entry, 'out.json'), 'r+') as f:
+        f.truncate(3)
+    assert cache.lookup(key) is None
+    _, hit = cache.get_or_build(key, 'write', produce)
+    assert not hit
+    assert cache.lookup(key) is not None
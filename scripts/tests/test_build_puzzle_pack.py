@@ -0,0 +1,33 @@
+import pytest
+
+from build_puzzle_pack import build_pack, decode_pack, read_pack_index
+
+pytest.importorskip('zstandard')
+
+
+def puzzles():
+    records = []
+    for i in range(300):
+        record = {'id': 1000 + i, 'fen': f'8/8/8/8/8/8/8/{i % 7}K w - - 0 1',
+                  'moves': 'e2e4 e7e5', 'rating': 400 + 7 * i,
+                  'themes': 'fork middlegame', 'popularity': i % 100}
+        if i % 3:
+            record['openings'] = '1 4'
+        records.append(record)
+    return records
+
+
+def test_pack_round_trips_records_with_optional_fields():
+    records = puzzles()
+    pack = build_pack(records)
+    assert decode_pack(pack) == sorted(records,
+                                       key=lambda p: (p['rating'], p['id']))
+
+
+def test_pack_decodes_one_rating_range():
+    pack = build_pack(puzzles())
+    blocks, _ = read_pack_index(pack)
+    assert len(blocks) > 1
+    band = decode_pack(pack, rating_min=1000, rating_max=1199)
+    assert band
+    assert {p['rating'] // 200 for p in band} == {5}
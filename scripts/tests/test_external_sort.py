@@ -0,0 +1,45 @@
+import json
+import random
+
+import pytest
+
+from external_sort import SORT_KEYS, external_sort, iter_input
+
+THEMES = ['advantage fork middlegame', 'crushing endgame pin',
+          'mate mateIn2 short', 'advantage skewer', 'equality']
+
+
+def puzzles(count=500, seed=11):
+    rng = random.Random(seed)
+    return [{'id': i, 'fen': f'8/8/8/8/8/8/8/{i}K w - - 0 1',
+             'moves': 'e2e4 e7e5', 'rating': rng.randrange(400, 3000),
+             'popularity': rng.randrange(100), 'themes': rng.choice(THEMES)}
+            for i in range(count)]
+
+
+@pytest.mark.parametrize('key', sorted(SORT_KEYS))
+def test_small_memory_cap_matches_in_memory_sort(tmp_path, key):
+    records = puzzles()
+    in_memory = list(external_sort(records, key=key,
+                                   tmp_dir=str(tmp_path)))
+    spilled = list(external_sort(records, key=key, max_memory=4096,
+                                 tmp_dir=str(tmp_path)))
+    assert spilled == in_memory
+    assert in_memory == sorted(records, key=SORT_KEYS[key])
+
+
+def test_theme_order_groups_by_motif():
+    records = list(external_sort(puzzles(), key='theme'))
+    motifs = [p['themes'] for p in records]
+    # 'advantage' and 'crushing' are generic; the motifs decide the order
+    assert motifs.index('advantage fork middlegame') \
+        < motifs.index('mate mateIn2 short') \
+        < motifs.index('crushing endgame pin') \
+        < motifs.index('advantage skewer')
+
+
+def test_json_input_is_read_as_an_array(tmp_path):
+    records = puzzles(20)
+    path = tmp_path / 'puzzles.json'
+    path.write_text(json.dumps(records))
+    assert list(iter_input(str(path))) == records
@@ -0,0 +1,52 @@
+import argparse
+import csv
+import random
+
+import build_puzzle_tiers
+from build_puzzle_tiers import make_selectors, save_tier
+from lichess_dump import iter_dump_rows, parse_row
+from partitioned_build import cmd_local
+
+HEADER = ['PuzzleId', 'FEN', 'Moves', 'Rating', 'RatingDeviation',
+          'Popularity', 'NbPlays', 'Themes', 'GameUrl', 'OpeningTags']
+
+
+def write_dump(path, rows=400, positions=60, seed=3):
+    """A small dump where most positions recur at different ratings."""
+    rng = random.Random(seed)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        for i in range(rows):
+            fen = f'8/8/8/8/8/8/8/{rng.randrange(positions)}K w - - 0 1'
+            writer.writerow([f'p{i:04d}', fen, 'e2e4 e7e5',
+                             rng.randrange(400, 3000), 80, rng.randrange(100),
+                             rng.randrange(200), 'fork middlegame',
+                             f'https://lichess.org/abcdefgh#{i}',
+                             'Sicilian_Defense'])
+
+
+def test_local_build_matches_single_pass(tmp_path, monkeypatch):
+    monkeypatch.setitem(build_puzzle_tiers.TIERS, 'tiny',
+                        {'target_count': 30, 'min_popularity': 0,
+                         'min_plays': 0})
+    dump = str(tmp_path / 'dump.csv')
+    write_dump(dump)
+
+    single_dir = tmp_path / 'single'
+    single_dir.mkdir()
+    selector, = make_selectors(['tiny'])
+    for row in iter_dump_rows(dump):
+        selector.offer(parse_row(row))
+    save_tier(selector, str(single_dir))
+    fens = [p['fen'] for p in selector.selected()]
+    assert len(fens) == len(set(fens))
+
+    local_dir = tmp_path / 'local'
+    args = argparse.Namespace(source=dump, workers=3, tiers='tiny',
+                              output_dir=str(local_dir))
+    assert cmd_local(args) == 0
+
+    for name in ('puzzles_tiny.json', 'openings_tiny.json'):
+        assert ((local_dir / name).read_bytes()
+                == (single_dir / name).read_bytes())
@@ -0,0 +1,71 @@
+import pytest
+
+from puzzle_delta import apply_delta, make_delta
+
+
+def puzzle(puzzle_id, rating, themes='fork'):
+    return {'id': puzzle_id, 'fen': f'8/8/8/8/8/8/8/{puzzle_id % 8}K w - - 0 1',
+            'moves': 'e2e4 e7e5', 'rating': rating, 'themes': themes,
+            'popularity': 90}
+
+
+def base():
+    # Sorted by rating, ties in no particular ID order
+    ratings = [800, 800, 800, 1200, 1200, 1500, 1500, 1500, 1900, 2300]
+    ids = [17, 3, 9, 42, 5, 31, 8, 12, 27, 1]
+    return [puzzle(i, r) for i, r in zip(ids, ratings)]
+
+
+def release(records):
+    """Re-rate two puzzles, drop one, add one, keep rating order."""
+    records = [dict(r) for r in records if r['id'] != 27]
+    for record in records:
+        if record['id'] == 9:
+            record['rating'] = 1500
+        elif record['id'] == 42:
+            record['rating'] = 800
+    records.append(puzzle(50, 1500, themes='pin'))
+    records.sort(key=lambda r: r['rating'])
+    return records
+
+
+def test_round_trip_with_order_relative_to_base():
+    old = base()
+    new = release(old)
+    delta = make_delta(old, new)
+    assert delta['order'] == {'keep': 'rating', 'insert': [[8, 50]]}
+    assert apply_delta(old, delta) == new
+
+
+def test_round_trip_with_explicit_order():
+    old = base()
+    new = list(reversed(release(old)))
+    delta = make_delta(old, new)
+    assert isinstance(delta['order'], list)
+    assert apply_delta(old, delta) == new
+
+
+def test_round_trip_keeping_base_order():
+    old = base()
+    new = [dict(r, themes='fork pin') if r['id'] == 8 else r for r in old]
+    delta = make_delta(old, new)
+    assert delta['order'] == {'keep': 'base', 'insert': []}
+    assert delta['update'] == [[8, {'themes': 'fork pin'}, []]]
+    assert apply_delta(old, delta) == new
+
+
+def test_wrong_base_is_refused():
+    old = base()
+    delta = make_delta(old, release(old))
+    other = [dict(r) for r in old]
+    other[0]['rating'] += 1
+    with pytest.raises(ValueError, match='Base does not match'):
+        apply_delta(other, delta)
+
+
+def test_target_checksum_is_verified():
+    old = base()
+    delta = make_delta(old, release(old))
+    delta['update'][0][1]['rating'] += 1
+    with pytest.raises(ValueError, match='target checksum'):
+        apply_delta(old, delta)
@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+from puzzle_merge import merge_sources, parse_source
+
+def fen(square):
+    """A lone-king position, distinct per square."""
+    file, rank = 'abcdefgh'.index(square[0]), int(square[1])
+    rows = ['8'] * 8
+    rows[8 - rank] = f'{file}K{7 - file}'.replace('0', '')
+    return '/'.join(rows) + ' w - - 0 1'
+
+
+def puzzle(puzzle_id, square, rating):
+    return {'id': puzzle_id, 'fen': fen(square), 'moves': 'e1e2',
+            'rating': rating, 'themes': 'fork', 'popularity': 90}
+
+
+def write_json(path, puzzles):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(puzzles, f)
+    return str(path)
+
+
+def write_jsonl(path, puzzles):
+    with open(path, 'w', encoding='utf-8') as f:
+        for p in puzzles:
+            f.write(json.dumps(p) + '\n')
+    return str(path)
+
+
+def test_merge_is_rating_ordered(tmp_path):
+    a = write_json(tmp_path / 'a.json',
+                   [puzzle(3, 'c3', 1500), puzzle(1, 'a1', 900)])
+    b = write_jsonl(tmp_path / 'b.jsonl',
+                    [puzzle(2, 'b2', 1000), puzzle(4, 'd4', 2000)])
+    merged = list(merge_sources([parse_source(a), parse_source(b)]))
+    assert [p['id'] for p in merged] == [1, 2, 3, 4]
+
+
+def test_higher_priority_supersedes_at_any_rating(tmp_path):
+    # Same ID at a different rating, and same position under another ID
+    high = write_json(tmp_path / 'high.json',
+                      [puzzle(1, 'a1', 1800), puzzle(2, 'b2', 1900)])
+    low = write_jsonl(tmp_path / 'low.jsonl',
+                      [puzzle(1, 'a1', 900), puzzle(9, 'b2', 1000),
+                       puzzle(5, 'e5', 1100)])
+    sources = [parse_source(low), parse_source(f'5={high}')]
+    merged = list(merge_sources(sources))
+
+    assert [(p['id'], p['rating']) for p in merged] == \
+        [(5, 1100), (1, 1800), (2, 1900)]
+    low_source, high_source = sources
+    assert high_source.priority == 5
+    assert (low_source.read, low_source.kept, low_source.superseded) == \
+        (3, 1, 2)
+    assert high_source.kept == 2
+
+
+def test_equal_priority_keeps_first_by_rating(tmp_path):
+    a = write_json(tmp_path / 'a.json',
+                   [puzzle(1, 'a1', 1200), puzzle(2, 'b2', 1300)])
+    # ID 1 again (other position) and position b2 again (other ID)
+    b = write_json(tmp_path / 'b.json',
+                   [puzzle(1, 'h8', 1100), puzzle(7, 'b2', 1400)])
+    sources = [parse_source(a), parse_source(b)]
+    merged = list(merge_sources(sources))
+
+    assert [(p['id'], p['fen']) for p in merged] == \
+        [(1, fen('h8')), (2, fen('b2'))]
+    assert sources[0].duplicates == 1
+    assert sources[1].duplicates == 1
+
+
+def test_position_dedup_ignores_move_counters(tmp_path):
+    moved = dict(puzzle(8, 'a1', 1000), fen=fen('a1').replace(' 0 1', ' 7 40'))
+    a = write_json(tmp_path / 'a.json', [puzzle(1, 'a1', 1000)])
+    b = write_json(tmp_path / 'b.json', [moved])
+    merged = list(merge_sources([parse_source(a), parse_source(b)]))
+    assert [p['id'] for p in merged] == [1]
+
+
+def test_unsorted_jsonl_source_raises(tmp_path):
+    path = write_jsonl(tmp_path / 'unsorted.jsonl',
+                       [puzzle(1, 'a1', 1500), puzzle(2, 'b2', 1200)])
+    with pytest.raises(ValueError, match='is not sorted by rating'):
+        list(merge_sources([parse_source(path)]))
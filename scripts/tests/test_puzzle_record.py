@@ -0,0 +1,46 @@
+import io
+import json
+import pickle
+
+from lichess_dump import (compact_game_ref, expand_game_ref, parse_row,
+                          to_app_record)
+from puzzle_record import PuzzleRecord, write_app_json
+
+ROW = ['8aspm', '2r3k1/p4p2/1p4pp/3p4/3Bq3/P6P/5QP1/5RK1 b - - 1 36',
+       'c8c2 f2f7 e7e8q', '482', '76', '95', '32478',
+       'endgame mate mateIn1 oneMove', 'https://lichess.org/mSUfOoD6/black#72',
+       'Sicilian_Defense Sicilian_Defense_Najdorf_Variation']
+OPENING_IDS = {'Sicilian_Defense': 3,
+               'Sicilian_Defense_Najdorf_Variation': 7}
+
+
+def test_parsed_puzzle_round_trips():
+    puzzle = parse_row(ROW)
+    # The game URL's colour segment is dropped by design
+    expected = dict(puzzle, game_url=expand_game_ref(
+        compact_game_ref(puzzle['game_url'])))
+    assert PuzzleRecord.from_dict(puzzle).to_dict() == expected
+
+
+def test_app_record_matches_lichess_dump():
+    puzzle = parse_row(ROW)
+    record = PuzzleRecord.from_dict(puzzle)
+    assert (record.to_app_record(OPENING_IDS)
+            == to_app_record(puzzle, OPENING_IDS))
+
+
+def test_app_record_round_trips_with_openings_and_game():
+    app = to_app_record(parse_row(ROW), OPENING_IDS)
+    assert app['openings'] == '3 7' and app['game']
+    record = PuzzleRecord.from_dict(app)
+    assert record.to_app_record() == app
+    assert pickle.loads(pickle.dumps(record)).to_app_record() == app
+
+
+def test_write_app_json_matches_json_dump():
+    records = [to_app_record(parse_row(ROW), OPENING_IDS),
+               {'id': 1, 'fen': 'x', 'moves': 'e2e4', 'rating': 1500,
+                'themes': 'fork', 'popularity': 90}]
+    f = io.StringIO()
+    write_app_json(iter(records), f)
+    assert f.getvalue() == json.dumps(records, indent=2, ensure_ascii=False)
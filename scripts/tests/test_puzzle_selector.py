@@ -0,0 +1,48 @@
+import random
+
+from puzzle_selector import PuzzleSelector
+
+BUCKETS = [('low', 0, 1000, 0.5), ('high', 1000, 2000, 0.5)]
+
+
+def puzzle(lichess_id, fen, popularity, rating, nb_plays=100):
+    return {'lichess_id': lichess_id, 'fen': fen, 'moves': 'e2e4 e7e5',
+            'rating': rating, 'rating_deviation': 80,
+            'popularity': popularity, 'nb_plays': nb_plays,
+            'themes': 'fork', 'game_url': '', 'opening_tags': ''}
+
+
+def select(puzzles, target_count=2):
+    selector = PuzzleSelector('test', target_count, buckets=BUCKETS,
+                              min_popularity=0, min_plays=0)
+    for p in puzzles:
+        selector.offer(p)
+    return [p['lichess_id'] for p in selector.selected()]
+
+
+def test_cross_bucket_duplicate_does_not_depend_on_order():
+    a = puzzle('aaaaa', 'X', 80, 500)
+    b = puzzle('bbbbb', 'X', 60, 1500)
+    c = puzzle('ccccc', 'Y', 90, 600)
+    results = {tuple(select(order))
+               for order in ([a, b, c], [c, a, b], [b, a, c], [a, c, b])}
+    assert results == {('ccccc', 'bbbbb')}
+
+
+def test_kept_duplicate_stays_in_its_best_bucket():
+    a = puzzle('aaaaa', 'X', 80, 500)
+    b = puzzle('bbbbb', 'X', 60, 1500)
+    assert select([b, a]) == ['aaaaa']
+
+
+def test_shuffled_input_gives_same_selection():
+    rng = random.Random(7)
+    fens = [f'fen{i}' for i in range(40)]
+    puzzles = [puzzle(f'p{i:04d}', rng.choice(fens), rng.randrange(100),
+                      rng.randrange(2000), nb_plays=rng.randrange(50))
+               for i in range(300)]
+    expected = select(puzzles, target_count=40)
+    assert len(set(expected)) == len(expected)
+    for _ in range(20):
+        rng.shuffle(puzzles)
+        assert select(puzzles, target_count=40) == expected
@@ -0,0 +1,58 @@
+import json
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from puzzle_delta import records_checksum
+from puzzle_features import extract_features
+from puzzle_similarity import (feature_vectors, load_neighbors,
+                               nearest_neighbors, save_neighbors)
+
+ASSET = 'assets/puzzles/puzzles.json'
+
+
+def brute_force(vectors, k):
+    """Rank every other row by exact float64 distance, ties by index."""
+    vectors = vectors.astype(np.float64)
+    dist = ((vectors[:, None, :] - vectors[None, :, :]) ** 2).sum(axis=2)
+    result = []
+    for row, distances in enumerate(dist):
+        order = sorted((d, j) for j, d in enumerate(distances) if j != row)
+        result.append([j for _, j in order[:k]])
+    return np.array(result), dist
+
+
+def test_matches_brute_force_with_ties():
+    # Small integer coordinates keep float32 exact and produce many ties
+    rng = np.random.default_rng(7)
+    vectors = rng.integers(0, 3, size=(60, 3)).astype(np.float32)
+    expected, _ = brute_force(vectors, 5)
+    # memory_mb=0 forces one row per block
+    assert (nearest_neighbors(vectors, 5, memory_mb=0) == expected).all()
+    assert (nearest_neighbors(vectors, 5) == expected).all()
+
+
+def test_matches_brute_force_on_puzzles():
+    with open(ASSET, 'r', encoding='utf-8') as f:
+        puzzles = json.load(f)[:300]
+    vectors = feature_vectors(puzzles, extract_features(puzzles))
+    neighbors = nearest_neighbors(vectors, 8, memory_mb=0)
+    expected, dist = brute_force(vectors, 8)
+    rows = np.arange(len(puzzles))[:, None]
+    # Float32 rounding may swap near-equal neighbours, never change distances
+    assert np.allclose(dist[rows, neighbors], dist[rows, expected], atol=1e-4)
+
+
+def test_load_checks_source(tmp_path):
+    puzzles = [{'id': i, 'rating': 1000 + i} for i in range(4)]
+    neighbors = np.array([[1], [0], [3], [2]])
+    path = tmp_path / 'neighbors.json'
+    save_neighbors(neighbors, records_checksum(puzzles), path)
+    assert (load_neighbors(path, puzzles) == neighbors).all()
+
+    puzzles[2]['rating'] += 1
+    with pytest.raises(ValueError, match='different puzzle set'):
+        load_neighbors(path, puzzles)
+    with pytest.raises(ValueError, match='different puzzle set'):
+        load_neighbors(path, puzzles[:3])
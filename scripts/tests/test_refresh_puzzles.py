@@ -0,0 +1,49 @@
+from opening_index import join_dump
+from refresh_puzzles import refresh
+
+FEN_A = '2r3k1/p4p2/1p4pp/3p4/3Bq3/P6P/5QP1/5RK1 b - - 1 36'
+FEN_B = '2r2rk1/p4ppp/1p2p3/3pP2Q/3N4/7R/P4PPP/R1q3K1 w - - 1 23'
+
+
+def row(lichess_id, fen, moves, rating=1500, popularity=90,
+        themes='mate mateIn1', openings='Sicilian_Defense'):
+    return [lichess_id, fen, moves, str(rating), '75', str(popularity), '100',
+            themes, f'https://lichess.org/abcdefgh#{rating}', openings]
+
+
+def shipped():
+    # Salted-hash IDs, as download_lichess_puzzles_official.py wrote them
+    return [
+        {'id': 987654321, 'fen': FEN_A, 'moves': 'c8c2 f2f7', 'rating': 600,
+         'themes': 'mate', 'popularity': 100},
+        {'id': 123456789, 'fen': FEN_B, 'moves': 'a1c1 c8c1', 'rating': 700,
+         'themes': 'mate', 'popularity': 100},
+    ]
+
+
+def test_refresh_joins_on_position_without_lichess_id():
+    puzzles = shipped()
+    rows = [row('8aspm', FEN_A, 'c8c2 f2f7', rating=650),
+            row('vrORc', FEN_B, 'a1c1 c8c1 h5d1', rating=900)]
+    matched, conflicts, _ = refresh(puzzles, rows)
+    # FEN B's moves differ, so it is a different puzzle, not a match
+    assert matched == {0}
+    assert conflicts == []
+    assert puzzles[0]['rating'] == 650
+    assert puzzles[1]['rating'] == 700
+
+
+def test_refresh_reports_lichess_id_conflicts():
+    puzzles = [{'id': 1, 'lichess_id': '8aspm', 'fen': FEN_A,
+                'moves': 'c8c2 f2f7', 'rating': 600, 'themes': 'mate',
+                'popularity': 100}]
+    matched, conflicts, _ = refresh(puzzles,
+                                    [row('8aspm', FEN_B, 'a1c1 c8c1')])
+    assert matched == set()
+    assert conflicts == ['8aspm']
+
+
+def test_join_dump_finds_puzzles_without_lichess_id():
+    found = join_dump(shipped(), [row('8aspm', FEN_A, 'c8c2 f2f7')])
+    assert list(found) == [0]
+    assert found[0]['opening_tags'] == 'Sicilian_Defense'
@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import shared_columns
+from legality_screen import screen_puzzles
+from puzzle_features import COLUMNS, extract_features
+from shared_columns import pack_puzzles, row_string, slice_rows
+
+ASSET = 'assets/puzzles/puzzles.json'
+
+
+@pytest.fixture
+def puzzles():
+    with open(ASSET, 'r', encoding='utf-8') as f:
+        return json.load(f)[:3000]
+
+
+@pytest.fixture
+def small_batches(monkeypatch):
+    # Several batches per run, several tasks per batch
+    monkeypatch.setattr(shared_columns, 'BATCH_ROWS_PER_WORKER', 700)
+
+
+def malformed(puzzle):
+    fen, moves = puzzle['fen'], puzzle['moves']
+    return [dict(puzzle, **change) for change in [
+        {'fen': fen.split()[0]},
+        {'fen': '8/8/8 w - - 0 1'},
+        {'fen': fen.replace(' w ', ' x ').replace(' b ', ' x ')},
+        {'moves': moves.split()[0]},
+        {'moves': 'z9e4 ' + moves},
+        {'moves': moves.split()[0] + ' e7e8k'},
+    ]]
+
+
+def test_slice_rows_matches_packing_the_slice(puzzles):
+    columns = pack_puzzles(puzzles)
+    sliced = slice_rows(columns, 100, 250)
+    expected = pack_puzzles(puzzles[100:250])
+    for name, array in expected.items():
+        assert (sliced[name] == array).all()
+    assert row_string(sliced, 'fen', 7) == puzzles[107]['fen']
+
+
+def test_features_match_single_process(puzzles, small_batches):
+    single = extract_features(puzzles, block_size=500)
+    pooled = extract_features(puzzles, block_size=500, workers=2)
+    for name in COLUMNS:
+        assert (single[name] == pooled[name]).all(), name
+
+
+def test_screen_matches_single_process(puzzles, small_batches):
+    puzzles = puzzles + malformed(puzzles[0]) + puzzles[:500]
+    statuses = {}
+
+    def collector(workers):
+        def collect(block, block_statuses):
+            statuses.setdefault(workers, []).extend(block_statuses.tolist())
+        return collect
+
+    single = screen_puzzles(puzzles, block_size=500,
+                            on_block=collector(1))
+    pooled = screen_puzzles(puzzles, block_size=500, workers=2,
+                            on_block=collector(2))
+    assert single == pooled
+    assert statuses[1] == statuses[2]
+    assert single[0]['malformed'] == 6
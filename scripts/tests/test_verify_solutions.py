@@ -0,0 +1,104 @@
+import json
+import os
+import sys
+
+import pytest
+
+from uci_engine import UciEngine
+from verify_solutions import check_move, verify_puzzle
+
+ENGINE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                      'scripted_uci_engine.py')
+
+# After the setup move c8c2, f2f7 is mate in one
+FEN = '2r3k1/p4p2/1p4pp/3p4/3Bq3/P6P/5QP1/5RK1 b - - 1 36'
+SETUP = 'c8c2'
+
+SETTINGS = {
+    'has_setup_move': True,
+    'multipv': 2,
+    'nodes': 1000,
+    'movetime': None,
+    'depth': None,
+    'min_gap': 150,
+    'cache': None,
+    'cache_min_depth': 0,
+}
+
+
+@pytest.fixture
+def scripted(tmp_path):
+    """Start a scripted engine answering `lines` after the setup move."""
+    engines = []
+
+    def start(lines):
+        script = tmp_path / 'script.json'
+        script.write_text(json.dumps({
+            'positions': {f'{FEN} moves {SETUP}': lines},
+            'default': [],
+        }))
+        engine = UciEngine([sys.executable, ENGINE, str(script)])
+        engines.append(engine)
+        return engine
+
+    yield start
+    for engine in engines:
+        engine.close()
+
+
+def verify(engine, solution):
+    puzzle = {'id': 1, 'fen': FEN, 'moves': f'{SETUP} {solution}'}
+    return verify_puzzle(engine, (puzzle, SETTINGS))
+
+
+def test_best_move_with_clear_gap_is_ok(scripted):
+    engine = scripted([{'cp': 400, 'pv': 'f2f3'}, {'cp': 0, 'pv': 'a3a4'}])
+    assert verify(engine, 'f2f3')['status'] == 'ok'
+
+
+def test_expected_in_second_line_with_equal_score_is_ambiguous(scripted):
+    engine = scripted([{'cp': 0, 'pv': 'a1a2'}, {'cp': 0, 'pv': 'f2f3'}])
+    result = verify(engine, 'f2f3')
+    assert result['status'] == 'ambiguous'
+    assert result['plies'][0]['gap'] == 0
+
+
+def test_best_move_with_close_runner_up_is_ambiguous(scripted):
+    engine = scripted([{'cp': 100, 'pv': 'f2f3'}, {'cp': 50, 'pv': 'a3a4'}])
+    assert verify(engine, 'f2f3')['status'] == 'ambiguous'
+
+
+def test_expected_far_below_best_is_wrong(scripted):
+    engine = scripted([{'cp': 500, 'pv': 'a1a2'}, {'cp': 0, 'pv': 'f2f3'}])
+    result = verify(engine, 'f2f3')
+    assert result['status'] == 'wrong'
+    assert result['plies'][0]['gap'] == 500
+
+
+def test_expected_missing_from_lines_is_wrong(scripted):
+    engine = scripted([{'cp': 50, 'pv': 'a1a2'}, {'cp': 0, 'pv': 'a3a4'}])
+    result = verify(engine, 'f2f3')
+    assert result['status'] == 'wrong'
+    assert 'top 2 lines' in result['plies'][0]['reason']
+
+
+def test_engine_without_a_move_is_wrong(scripted):
+    engine = scripted([])
+    result = verify(engine, 'f2f3')
+    assert result['status'] == 'wrong'
+    assert result['plies'][0]['reason'] == 'engine returned no move'
+
+
+def test_alternative_mate_on_final_ply_is_ok(scripted):
+    engine = scripted([{'mate': 1, 'pv': 'f2g2'}, {'mate': 1, 'pv': 'f2f7'}])
+    result = verify(engine, 'f2f7')
+    assert result['status'] == 'ok'
+    assert result['plies'][0]['mate'] is True
+
+
+def test_check_move_accepts_mate_score_without_board():
+    analysis = {'depth': 20, 'lines': [
+        {'multipv': 1, 'score': {'mate': 1}, 'pv': ['f2g2']},
+        {'multipv': 2, 'score': {'mate': 1}, 'pv': ['f2f7']},
+    ]}
+    assert check_move(analysis, 'f2f7', 150)[0] == 'ok'
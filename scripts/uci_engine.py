@@ -0,0 +1,247 @@
+"""
+Minimal UCI engine driver and process pool for build-time analysis.
+
+UciEngine talks to one local engine binary (e.g. Stockfish) over stdin and
+stdout. EnginePool runs one engine per worker process so analysis scales
+across all cores; each engine is started once per worker and reused for
+every position that worker handles.
+"""
+
+import os
+import subprocess
+from multiprocessing import Pool
+
+# Scores are normalized to centipawns from the side to move; mates map to
+# values beyond any real evaluation, shorter mates scoring higher.
+MATE_SCORE = 100000
+
+DEFAULT_OPTIONS = {'Threads': 1, 'Hash': 16}
+
+
+class UciError(Exception):
+    """Raised when the engine dies or answers something unexpected."""
+
+
+def score_value(score):
+    """
+    Convert a {'cp': n} or {'mate': n} score into one comparable number.
+    """
+    if 'mate' in score:
+        mate = score['mate']
+        return MATE_SCORE - mate if mate > 0 else -MATE_SCORE - mate
+    return score['cp']
+
+
+def parse_info(line):
+    """
+    Parse a UCI 'info' line.
+
+    Returns:
+        Dict with any of depth, multipv, nodes, nps, score and pv, or None if
+        the line carries no score (e.g. 'info string ...' or currmove lines).
+    """
+    tokens = line.split()
+    if 'score' not in tokens or 'pv' not in tokens:
+        return None
+
+    info = {'multipv': 1}
+    i = 1
+    while i < len(tokens):
+        token = tokens[i]
+        if token in ('depth', 'seldepth', 'multipv', 'nodes', 'nps', 'time'):
+            info[token] = int(tokens[i + 1])
+            i += 2
+        elif token == 'score':
+            kind, value = tokens[i + 1], int(tokens[i + 2])
+            info['score'] = {kind: value}
+            i += 3
+            # Skip lowerbound/upperbound markers
+            while i < len(tokens) and tokens[i] in ('lowerbound', 'upperbound'):
+                i += 1
+        elif token == 'pv':
+            info['pv'] = tokens[i + 1:]
+            break
+        else:
+            i += 1
+    return info
+
+
+class UciEngine:
+    """
+    A running UCI engine process.
+
+    Args:
+        command: Engine executable path, or a list of program arguments
+        options: UCI options to set after the handshake
+    """
+
+    def __init__(self, command, options=None):
+        if isinstance(command, str):
+            command = [command]
+        self.command = command
+        self.process = subprocess.Popen(
+            command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL, text=True, bufsize=1)
+        self.name = command[0]
+
+        self._send('uci')
+        for line in self._read_until('uciok'):
+            if line.startswith('id name '):
+                self.name = line[len('id name '):]
+
+        for name, value in {**DEFAULT_OPTIONS, **(options or {})}.items():
+            self._send(f'setoption name {name} value {value}')
+        self._ready()
+
+    def _send(self, command):
+        try:
+            self.process.stdin.write(command + '\n')
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            raise UciError(f'Engine {self.name} is not running: {e}')
+
+    def _read_until(self, prefix):
+        """Yield engine output lines up to and including one starting with prefix."""
+        while True:
+            line = self.process.stdout.readline()
+            if not line:
+                raise UciError(f'Engine {self.name} exited unexpectedly')
+            line = line.strip()
+            yield line
+            if line.startswith(prefix):
+                return
+
+    def _ready(self):
+        self._send('isready')
+        for _ in self._read_until('readyok'):
+            pass
+
+    def new_game(self):
+        """Clear engine state between unrelated positions."""
+        self._send('ucinewgame')
+        self._ready()
+
+    def analyse(self, fen, moves=(), multipv=1, nodes=None, movetime=None,
+                depth=None):
+        """
+        Analyse a position.
+
+        Args:
+            fen: Starting FEN
+            moves: UCI moves to play from the FEN before searching
+            multipv: Number of principal variations to report
+            nodes: Node budget for the search
+            movetime: Time budget in milliseconds
+            depth: Depth limit
+
+        Returns:
+            Dict with 'bestmove', 'depth', 'nodes' and 'lines', where lines
+            is a list of {'multipv', 'score', 'pv'} sorted by multipv
+        """
+        self._send(f'setoption name MultiPV value {multipv}')
+        position = f'position fen {fen}'
+        if moves:
+            position += ' moves ' + ' '.join(moves)
+        self._send(position)
+
+        go = ['go']
+        if nodes:
+            go += ['nodes', str(nodes)]
+        if movetime:
+            go += ['movetime', str(movetime)]
+        if depth:
+            go += ['depth', str(depth)]
+        if len(go) == 1:
+            go += ['depth', '12']
+        self._send(' '.join(go))
+
+        lines = {}
+        result = {'bestmove': None, 'depth': 0, 'nodes': 0}
+        for line in self._read_until('bestmove'):
+            if line.startswith('info '):
+                info = parse_info(line)
+                if info is None:
+                    continue
+                # Later lines for the same multipv supersede earlier ones
+                lines[info['multipv']] = {
+                    'multipv': info['multipv'],
+                    'score': info['score'],
+                    'pv': info['pv'],
+                }
+                result['depth'] = max(result['depth'], info.get('depth', 0))
+                result['nodes'] = max(result['nodes'], info.get('nodes', 0))
+            elif line.startswith('bestmove'):
+                parts = line.split()
+                if len(parts) > 1 and parts[1] != '(none)':
+                    result['bestmove'] = parts[1]
+
+        result['lines'] = [lines[k] for k in sorted(lines)]
+        return result
+
+    def close(self):
+        """Ask the engine to quit and wait for it."""
+        if self.process.poll() is None:
+            try:
+                self._send('quit')
+                self.process.wait(timeout=5)
+            except (UciError, subprocess.TimeoutExpired):
+                self.process.kill()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Per-process engine used by EnginePool workers
+_worker_engine = None
+
+
+def _init_worker(command, options):
+    global _worker_engine
+    _worker_engine = UciEngine(command, options)
+
+
+def _run_task(args):
+    func, item = args
+    return func(_worker_engine, item)
+
+
+class EnginePool:
+    """
+    A pool of worker processes, each owning one UCI engine.
+
+    Args:
+        command: Engine executable path or argument list
+        workers: Number of engine processes (default: all cores)
+        options: UCI options for every engine (Threads defaults to 1 so the
+            pool, not the engine, provides the parallelism)
+    """
+
+    def __init__(self, command, workers=None, options=None):
+        self.workers = workers or os.cpu_count() or 1
+        self._pool = Pool(self.workers, initializer=_init_worker,
+                          initargs=(command, options))
+
+    def imap(self, func, items, chunksize=1):
+        """
+        Run func(engine, item) for every item, yielding results in order.
+
+        func must be a module-level function so it can be pickled.
+        """
+        return self._pool.imap(_run_task, ((func, item) for item in items),
+                               chunksize=chunksize)
+
+    def close(self):
+        self._pool.close()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if exc[0] is None:
+            self.close()
+        else:
+            self._pool.terminate()
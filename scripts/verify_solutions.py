@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Verify puzzle solutions with a pool of local UCI engines.
+
+For every solver move of every puzzle, the position is searched with MultiPV
+and the move is checked against the engine:
+
+  - wrong:     the solver move trails the best line by --min-gap or more,
+               or is not among the MultiPV lines
+  - ambiguous: the solver move and another move score within --min-gap of
+               each other, so the puzzle has more than one good answer (the
+               app only accepts the listed move)
+  - ok:        the solver move is best and clearly better than the rest
+
+On the final ply a checkmating solver move is always ok: Lichess accepts
+any mate there, so alternative mates are not ambiguous. Mates are detected
+with python-chess when it is installed, otherwise from a 'mate 1' score.
+
+Puzzles use the app convention: moves[0] is the opponent's setup move and
+the player's moves are moves[1], moves[3], ... Hand-written sets such as
+generate_puzzles.BASE_PUZZLES start with the player's move instead; check
+those with --base-puzzles.
+
+Usage:
+  python scripts/verify_solutions.py --engine /usr/bin/stockfish
+      [--input FILE | --base-puzzles] [--workers N] [--multipv 2]
+      [--nodes N] [--movetime MS] [--depth D] [--min-gap CP]
+      [--report FILE] [--write-verified FILE]
+
+  # Without Stockfish, against a scripted stand-in:
+  python scripts/verify_solutions.py \\
+      --engine "python scripts/scripted_uci_engine.py script.json" ...
+"""
+
+import argparse
+import json
+import os
+import shlex
+import sys
+import time
+from collections import Counter
+
+try:
+    import chess
+except ImportError:
+    chess = None
+
+from analysis_cache import AnalysisCache, position_key
+from uci_engine import EnginePool, UciError, score_value
+
+INPUT_FILE = 'assets/puzzles/puzzles.json'
+REPORT_FILE = 'build/verify_report.json'
+
+DEFAULT_MULTIPV = 2
+DEFAULT_NODES = 1000000
+DEFAULT_MIN_GAP = 150
+
+
+def solver_plies(moves, has_setup_move=True):
+    """Return the indices of the player's moves in a solution."""
+    first = 1 if has_setup_move else 0
+    return list(range(first, len(moves), 2))
+
+
+def check_move(analysis, expected, min_gap, mating=False):
+    """
+    Judge one solver move against an engine analysis.
+
+    The expected move is looked up among the MultiPV lines and judged by
+    its gap to the best score: ok if it is the best line and leads the next
+    by min_gap, ambiguous if it is within min_gap of the best (or the
+    runner-up is within min_gap of it), wrong if it trails the best by
+    min_gap or more or is not among the lines.
+
+    Args:
+        mating: The expected move is checkmate. Lichess accepts any mating
+            move on the final ply, so other mates do not make it ambiguous.
+
+    Returns:
+        (status, details) where status is 'ok', 'wrong' or 'ambiguous'
+    """
+    lines = [line for line in analysis['lines'] if line['pv']]
+    if not lines:
+        return 'wrong', {'expected': expected,
+                         'reason': 'engine returned no move'}
+
+    best = lines[0]
+    best_value = score_value(best['score'])
+    details = {
+        'expected': expected,
+        'best': best['pv'][0],
+        'score': best['score'],
+        'depth': analysis['depth'],
+    }
+
+    found = next((line for line in lines if line['pv'][0] == expected), None)
+    if found is not None and found['score'].get('mate') == 1:
+        mating = True
+    if mating:
+        details['mate'] = True
+        return 'ok', details
+    if found is None:
+        details['reason'] = f'not in the top {len(lines)} lines'
+        return 'wrong', details
+
+    gap = best_value - score_value(found['score'])
+    if found is not best:
+        details['expected_score'] = found['score']
+        details['gap'] = gap
+        return ('wrong' if gap >= min_gap else 'ambiguous'), details
+
+    if len(lines) > 1:
+        second_value = score_value(lines[1]['score'])
+        details['second'] = lines[1]['pv'][0]
+        details['second_score'] = lines[1]['score']
+        if best_value - second_value < min_gap:
+            return 'ambiguous', details
+
+    return 'ok', details
+
+
+def gives_mate(fen, moves, move):
+    """
+    Whether `move` checkmates after `moves` from `fen`.
+
+    Returns:
+        True or False, or None without python-chess
+    """
+    if chess is None:
+        return None
+    try:
+        board = chess.Board(fen)
+        for played in moves:
+            board.push_uci(played)
+        board.push_uci(move)
+    except ValueError:
+        return False
+    return board.is_checkmate()
+
+
+# Per-process cache connection, opened on first use in each pool worker
+_worker_cache = None
+
+
+def _get_cache(path):
+    global _worker_cache
+    if path and _worker_cache is None:
+        _worker_cache = AnalysisCache(path)
+    return _worker_cache
+
+
+def analyse_position(engine, fen, moves, settings):
+    """
+    Analyse a position, reusing a cached result when one is deep enough.
+
+    Returns:
+        (analysis, cache_hit)
+    """
+    cache = _get_cache(settings['cache'])
+    key = None
+    if cache is not None:
+        key = position_key(fen, moves)
+        analysis = cache.get(key, min_depth=settings['cache_min_depth'],
+                             min_multipv=settings['multipv'],
+                             engine=engine.name)
+        if analysis is not None:
+            return analysis, True
+
+    analysis = engine.analyse(fen, moves,
+                              multipv=settings['multipv'],
+                              nodes=settings['nodes'],
+                              movetime=settings['movetime'],
+                              depth=settings['depth'])
+    if cache is not None:
+        cache.put(key, analysis, settings['multipv'], engine.name)
+    return analysis, False
+
+
+def verify_puzzle(engine, task):
+    """
+    Check every solver move of one puzzle. Runs inside a pool worker.
+
+    Returns:
+        Result dict with the puzzle id, overall status and per-ply checks
+    """
+    puzzle, settings = task
+    moves = puzzle['moves'].split()
+    result = {'id': puzzle.get('id'), 'status': 'ok', 'plies': [],
+              'cache_hits': 0}
+
+    try:
+        engine.new_game()
+        for ply in solver_plies(moves, settings['has_setup_move']):
+            analysis, cache_hit = analyse_position(
+                engine, puzzle['fen'], moves[:ply], settings)
+            result['cache_hits'] += cache_hit
+            mating = (ply == len(moves) - 1
+                      and gives_mate(puzzle['fen'], moves[:ply], moves[ply]))
+            status, details = check_move(analysis, moves[ply],
+                                         settings['min_gap'], mating=mating)
+            details['ply'] = ply
+            details['status'] = status
+            result['plies'].append(details)
+
+            # Worst status wins: wrong > ambiguous > ok
+            if status == 'wrong':
+                result['status'] = 'wrong'
+                break
+            if status == 'ambiguous':
+                result['status'] = 'ambiguous'
+    except UciError as e:
+        result['status'] = 'error'
+        result['error'] = str(e)
+
+    return result
+
+
+def load_puzzles(args):
+    """Load the puzzles to verify and whether they carry a setup move."""
+    if args.base_puzzles:
+        from generate_puzzles import BASE_PUZZLES
+        puzzles = [dict(p, id=i + 1) for i, p in enumerate(BASE_PUZZLES)]
+        return puzzles, False
+
+    with open(args.input, 'r', encoding='utf-8') as f:
+        return json.load(f), True
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Verify puzzle solutions with a UCI engine pool')
+    parser.add_argument('--engine', required=True,
+                        help='engine command, e.g. /usr/bin/stockfish')
+    parser.add_argument('--input', default=INPUT_FILE,
+                        help=f'puzzles JSON (default: {INPUT_FILE})')
+    parser.add_argument('--base-puzzles', action='store_true',
+                        help='verify generate_puzzles.BASE_PUZZLES instead '
+                             '(no setup move)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='engine processes (default: all cores)')
+    parser.add_argument('--multipv', type=int, default=DEFAULT_MULTIPV,
+                        help=f'lines per search (default: {DEFAULT_MULTIPV})')
+    parser.add_argument('--nodes', type=int, default=None,
+                        help=f'node budget per position '
+                             f'(default: {DEFAULT_NODES} if no other limit)')
+    parser.add_argument('--movetime', type=int, default=None,
+                        help='time budget per position in ms')
+    parser.add_argument('--depth', type=int, default=None,
+                        help='depth limit per position')
+    parser.add_argument('--min-gap', type=int, default=DEFAULT_MIN_GAP,
+                        help=f'centipawns the best move must lead the second '
+                             f'by (default: {DEFAULT_MIN_GAP})')
+    parser.add_argument('--cache', default=None,
+                        help='analysis cache database (see analysis_cache.py)')
+    parser.add_argument('--cache-min-depth', type=int, default=None,
+                        help='shallowest cached result to reuse '
+                             '(default: --depth, or any depth)')
+    parser.add_argument('--limit', type=int, default=None,
+                        help='only verify the first N puzzles')
+    parser.add_argument('--report', default=REPORT_FILE,
+                        help=f'JSON report (default: {REPORT_FILE})')
+    parser.add_argument('--write-verified', default=None,
+                        help='also write the puzzles that passed to this file')
+    args = parser.parse_args()
+
+    if args.cache and chess is None:
+        print("ERROR: --cache needs python-chess to key positions")
+        print("Please run: pip install chess")
+        return 1
+
+    puzzles, has_setup_move = load_puzzles(args)
+    if args.limit:
+        puzzles = puzzles[:args.limit]
+
+    settings = {
+        'has_setup_move': has_setup_move,
+        'multipv': args.multipv,
+        'nodes': args.nodes,
+        'movetime': args.movetime,
+        'depth': args.depth,
+        'min_gap': args.min_gap,
+        'cache': args.cache,
+        'cache_min_depth': (args.cache_min_depth
+                            if args.cache_min_depth is not None
+                            else args.depth or 0),
+    }
+    if not (args.nodes or args.movetime or args.depth):
+        settings['nodes'] = DEFAULT_NODES
+
+    print(f"Verifying {len(puzzles)} puzzles with {args.engine}...")
+    start = time.perf_counter()
+    results = []
+    with EnginePool(shlex.split(args.engine), workers=args.workers) as pool:
+        print(f"  {pool.workers} engine processes")
+        tasks = ((puzzle, settings) for puzzle in puzzles)
+        for i, result in enumerate(pool.imap(verify_puzzle, tasks), start=1):
+            results.append(result)
+            if i % 100 == 0:
+                print(f"  Verified {i}/{len(puzzles)}...", end='\r')
+    elapsed = time.perf_counter() - start
+
+    counts = Counter(r['status'] for r in results)
+    print(f"\n✓ Verified {len(results)} puzzles in {elapsed:.1f}s "
+          f"({len(results) / max(elapsed, 1e-9):.1f} puzzles/s)")
+    for status in ('ok', 'ambiguous', 'wrong', 'error'):
+        print(f"  {status}: {counts.get(status, 0)}")
+    if args.cache:
+        hits = sum(r['cache_hits'] for r in results)
+        searched = sum(len(r['plies']) for r in results)
+        print(f"  Cache hits: {hits} of {searched} positions")
+
+    os.makedirs(os.path.dirname(args.report) or '.', exist_ok=True)
+    with open(args.report, 'w', encoding='utf-8') as f:
+        json.dump({'settings': settings, 'counts': dict(counts),
+                   'results': results}, f, indent=2)
+    print(f"  Report: {args.report}")
+
+    if args.write_verified:
+        passed = [p for p, r in zip(puzzles, results) if r['status'] == 'ok']
+        with open(args.write_verified, 'w', encoding='utf-8') as f:
+            json.dump(passed, f, indent=2, ensure_ascii=False)
+        print(f"  Wrote {len(passed)} verified puzzles to {args.write_verified}")
+
+    return 0 if counts.get('error', 0) == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())